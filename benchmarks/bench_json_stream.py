@@ -0,0 +1,104 @@
+"""Peak memory and time of whole-document vs streaming JSON for rankings and history
+
+    python benchmarks/bench_json_stream.py [--symbols 5000] [--days 300]
+
+Peaks are tracemalloc peaks (Python and NumPy allocations) above the memory
+held before each step, so the scored universe itself is not counted.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import make_universe
+
+import numpy as np
+
+import json_stream
+import price_store
+import rs_engine
+from process_stocks import format_ranking
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:42s} {peak / 1024 ** 2:8.1f} MB peak {elapsed:7.2f}s")
+    return result
+
+def ranked_records(n_symbols, n_days):
+    spy_bars, universe = make_universe(n_symbols, n_days)
+    matrix = rs_engine.build_price_matrix(spy_bars, universe)
+    records = rs_engine.to_stock_records(rs_engine.score_universe(matrix))
+    records.sort(key=lambda x: x['rs_score'], reverse=True)
+    for stock, rank in zip(records, rs_engine.percentile_ranks(np.array([r['rs_score'] for r in records]))):
+        stock['rs_rank'] = int(rank)
+    return matrix, records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=300)
+    args = parser.parse_args()
+
+    matrix, records = ranked_records(args.symbols, args.days)
+    header = {'last_updated': '2024-01-01T00:00:00', 'total_stocks': len(records), 'update_type': 'full_rebuild'}
+    print(f"Synthetic universe: {len(records)} ranked symbols x {args.days} days")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        whole_path = os.path.join(tmp, 'whole.json')
+        stream_path = os.path.join(tmp, 'stream.json')
+
+        def dump_rankings():
+            output = dict(header, data=[format_ranking(stock) for stock in records])
+            with open(whole_path, 'w') as f:
+                json.dump(output, f, indent=2)
+
+        print(f"rankings.json write:")
+        measure("json.dump of the formatted list", dump_rankings)
+        measure("json_stream.write_json", lambda: json_stream.write_json(
+            stream_path, header, 'data', (format_ranking(stock) for stock in records)))
+        measure("json_stream.write_ndjson", lambda: json_stream.write_ndjson(
+            os.path.join(tmp, 'rankings.ndjson'), header, (format_ranking(stock) for stock in records)))
+        with open(whole_path, 'rb') as a, open(stream_path, 'rb') as b:
+            identical = a.read() == b.read()
+        print(f"  {os.path.getsize(whole_path) / 1024 ** 2:.1f} MB, byte-identical: {identical}")
+
+        store = price_store.from_matrix(os.path.join(tmp, 'store'), matrix)
+        legacy_path = os.path.join(tmp, 'historical_data.json')
+
+        def dump_history():
+            dates = np.array(store.dates)
+            stocks = [{'s': symbol, 'h': price_store.column_bars(dates, np.array(store.closes[:, col]),
+                                                                 np.array(store.volumes[:, col]))}
+                      for col, symbol in enumerate(store.symbols)]
+            with open(os.path.join(tmp, 'whole_history.json'), 'w') as f:
+                json.dump({'u': '', 'n': len(stocks), 'd': stocks}, f, indent=2)
+
+        print(f"historical_data.json (legacy bar lists) write:")
+        measure("json.dump of the full document", dump_history)
+        measure("price_store.export_json (streamed)", lambda: price_store.export_json(store, legacy_path))
+        print(f"  {os.path.getsize(legacy_path) / 1024 ** 2:.1f} MB")
+
+        def load_whole():
+            with open(legacy_path, 'r') as f:
+                return len(json.load(f)['d'])
+
+        def scan():
+            return sum(len(stock['h']) for stock in json_stream.iter_array(legacy_path, 'd'))
+
+        print(f"historical_data.json read:")
+        measure("json.load", load_whole)
+        measure("json_stream.load (same dict, parsed incrementally)",
+                lambda: len(json_stream.load(legacy_path, 'd')['d']))
+        measure("json_stream.iter_array (one record at a time)", scan)
+        measure("price_store.convert_json (streamed, 2 passes)",
+                lambda: price_store.convert_json(legacy_path, os.path.join(tmp, 'converted')))
+
+if __name__ == "__main__":
+    main()
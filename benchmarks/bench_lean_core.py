@@ -0,0 +1,158 @@
+"""Startup, memory and end-to-end cost of the scripts with and without pandas
+
+    python benchmarks/bench_lean_core.py [--symbols 2000] [--imports 5] [--size 1000]
+
+Three comparisons, each for the NumPy-only scripts and a pandas variant:
+
+    alignment   rs_engine over a synthetic universe against the per-stock
+                DataFrame inner join it replaced (tests/baseline.py);
+                every relative return must be identical
+    import      cold `import process_stocks` / `import process_stocks_daily`
+                in a fresh interpreter, median wall time and peak RSS; the
+                pandas variant imports pandas first, as the scripts used to
+    end to end  the rebuild and the daily update against a mock_polygon.py
+                server, as subprocesses (the pandas variant again with pandas
+                imported before the script runs)
+
+It also lists what pandas and its dependencies take on disk: what CI no
+longer downloads and installs. Without pandas installed only the NumPy side
+is measured.
+"""
+import argparse
+import importlib.metadata
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import make_universe
+from mock_polygon import MockMarket, MockPolygonServer
+
+import numpy as np
+
+import rs_engine
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANDAS_DISTRIBUTIONS = ['pandas', 'python-dateutil', 'pytz', 'tzdata', 'six']
+
+def has_pandas():
+    try:
+        importlib.metadata.version('pandas')
+        return True
+    except importlib.metadata.PackageNotFoundError:
+        return False
+
+def installed_mb(name):
+    try:
+        files = importlib.metadata.distribution(name).files or []
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    return sum(os.path.getsize(path) for path in (f.locate() for f in files) if os.path.isfile(path)) / 2**20
+
+def run(code, cwd=REPO, env=None, log=None):
+    """(exit code, wall seconds, peak RSS in MB) of `python -c code`
+
+    The child reports its own VmHWM at exit: a forked child's ru_maxrss
+    starts from this (much larger) process's peak.
+    """
+    with tempfile.NamedTemporaryFile('r', suffix='.status') as status_file:
+        report = (f"import atexit; atexit.register(lambda: open({status_file.name!r}, 'w')"
+                  f".write(open('/proc/self/status').read())); ")
+        start = time.perf_counter()
+        code = subprocess.call([sys.executable, '-c', report + code], cwd=cwd, env=env,
+                               stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        elapsed = time.perf_counter() - start
+        peak = [line.split()[1] for line in status_file.read().splitlines() if line.startswith('VmHWM:')]
+    return code, elapsed, int(peak[0]) / 1024 if peak else float('nan')
+
+def script_code(script, args, preload):
+    return (f"import sys, runpy; {preload}sys.path.insert(0, {REPO!r}); "
+            f"sys.argv = [{script!r}] + {args!r}; "
+            f"runpy.run_path({os.path.join(REPO, script + '.py')!r}, run_name='__main__')")
+
+def compare_alignment(n_symbols, pandas):
+    spy_bars, universe = make_universe(n_symbols, 300)
+    start = time.perf_counter()
+    result = rs_engine.score_universe(rs_engine.build_price_matrix(spy_bars, universe))
+    engine = {record['symbol']: record for record in rs_engine.to_stock_records(result)}
+    print(f"  numpy   {time.perf_counter() - start:7.2f}s for {n_symbols} symbols")
+    if not pandas:
+        return True
+    from tests import baseline
+    start = time.perf_counter()
+    joined = {symbol: baseline.calculate_aligned_returns(bars, spy_bars)[0] for symbol, bars in universe}
+    print(f"  pandas  {time.perf_counter() - start:7.2f}s for {n_symbols} symbols")
+    differ = sum((relative is None) != (symbol not in engine) or relative is not None and
+                 any(engine[symbol][f"relative_{p}"] != relative[p] for p in rs_engine.PERIODS)
+                 for symbol, relative in joined.items())
+    print(f"  {'✅ identical' if not differ else f'❌ {differ} symbols differ'}")
+    return differ == 0
+
+def compare_imports(runs, preloads):
+    for script in ('process_stocks', 'process_stocks_daily'):
+        for name, preload in preloads.items():
+            samples = [run(f"{preload}import {script}") for _ in range(runs)]
+            if any(code for code, _, _ in samples):
+                raise SystemExit(f"❌ import {script} failed")
+            print(f"  {script:21s} {name:7s} {np.median([s[1] for s in samples]) * 1000:6.0f} ms  "
+                  f"peak {max(s[2] for s in samples):5.0f} MB")
+
+def compare_end_to_end(size, preloads):
+    market = MockMarket(size)
+    daily_session = market.as_of
+    server = MockPolygonServer(market).start()
+    env = dict(os.environ, POLYGON_BASE_URL=server.url, POLYGON_API_KEY='mock')
+    ok = True
+    try:
+        for name, preload in preloads.items():
+            workdir = tempfile.mkdtemp(prefix=f"bench_lean_core_{name}_")
+            with open(os.path.join(workdir, 'run.log'), 'w') as log:
+                market.as_of = market.dates[-2]
+                rebuild = run(script_code('process_stocks', ['--rps', '1000'], preload), workdir, env, log)
+                market.as_of = daily_session
+                daily = run(script_code('process_stocks_daily', [], preload), workdir, env, log)
+            with open(os.path.join(workdir, 'rankings.json')) as f:
+                ranked = len(json.load(f)['data'])
+            ok &= rebuild[0] == 0 and daily[0] == 0
+            print(f"  {name:7s} rebuild {rebuild[1]:6.1f}s peak {rebuild[2]:5.0f} MB   "
+                  f"daily {daily[1]:5.2f}s peak {daily[2]:5.0f} MB   {ranked} ranked"
+                  + ('' if rebuild[0] == 0 and daily[0] == 0 else f"  ❌ failed, see {workdir}/run.log"))
+            if rebuild[0] == 0 and daily[0] == 0:
+                shutil.rmtree(workdir)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=2000, help="Symbols for the alignment comparison")
+    parser.add_argument('--imports', type=int, default=5, help="Cold imports timed per script and variant")
+    parser.add_argument('--size', type=int, default=1000, help="Mock universe for the end-to-end runs")
+    args = parser.parse_args()
+
+    pandas = has_pandas()
+    preloads = {'numpy': ''}
+    if pandas:
+        preloads['pandas'] = 'import pandas; '
+        sizes = {name: installed_mb(name) for name in PANDAS_DISTRIBUTIONS}
+        print(f"pandas {importlib.metadata.version('pandas')} and dependencies installed: "
+              f"{sum(mb for mb in sizes.values() if mb):.0f} MB ("
+              + ', '.join(f"{name} {mb:.1f}" for name, mb in sizes.items() if mb) + ")")
+    else:
+        print("pandas is not installed: measuring the NumPy-only scripts")
+
+    print("\nAlignment (rs_engine against the per-stock baseline)")
+    ok = compare_alignment(args.symbols, pandas)
+    print("\nCold import")
+    compare_imports(args.imports, preloads)
+    print(f"\nEnd to end against the mock ({args.size} symbols)")
+    ok &= compare_end_to_end(args.size, preloads)
+    if not ok:
+        raise SystemExit("❌ The variants disagree or a run failed")
+
+if __name__ == "__main__":
+    main()
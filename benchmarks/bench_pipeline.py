@@ -0,0 +1,96 @@
+"""End-to-end rebuild and daily update against the mock Polygon server
+
+    python benchmarks/bench_pipeline.py [--sizes 1000 5000 20000] [--sources grouped ticker]
+                                        [--latency-ms 5] [--rate-429 0.01] [--rps 500]
+
+For each universe size a mock_polygon.py server runs in this process, with
+its last session held back one day. Each source then runs process_stocks.py
+in a fresh directory, and process_stocks_daily.py picks up the held-back
+day. Both run as subprocesses with POLYGON_BASE_URL pointing at the mock.
+Wall time and peak RSS come from the child process; request counts and
+stage times come from its run_report.json. The ticker source ranks at most
+the 5000 most liquid tickers, as in production.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_polygon import MockMarket, MockPolygonServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_script(script, args, cwd, env):
+    """(exit code, wall seconds, peak RSS in MB, run report) of one script run"""
+    with open(os.path.join(cwd, f"{script}.log"), 'a') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO, f"{script}.py")] + args,
+                                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 gives this child's own resource usage (ru_maxrss is in KB on Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+    with open(os.path.join(cwd, 'run_report.json')) as f:
+        report = json.load(f)
+    return proc.returncode, elapsed, usage.ru_maxrss / 1024, report
+
+def describe(name, code, elapsed, rss, report):
+    stages = {stage['name']: stage['seconds'] for stage in report['stages']}
+    fetch = stages.get('fetch') or 0
+    requests = report['counters'].get('requests', 0)
+    ranked = report['info'].get('ranked', 0)
+    print(f"  {name:16s} {'✅' if code == 0 else '❌'} {elapsed:7.1f}s  peak {rss:7.0f} MB  "
+          f"{requests:6d} requests ({requests / fetch if fetch else 0:6.0f}/s)  "
+          f"{ranked:6d} ranked ({ranked / elapsed:6.0f}/s)  "
+          f"429s {report['counters'].get('http_429', 0):3d}  "
+          + ' '.join(f"{name} {seconds:.1f}s" for name, seconds in stages.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--sources', nargs='+', choices=['grouped', 'ticker'], default=['grouped', 'ticker'])
+    parser.add_argument('--latency-ms', type=float, default=5.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--rate-429', type=float, default=0.01)
+    parser.add_argument('--rps', type=float, default=500, help="--rps passed to the scripts")
+    parser.add_argument('--workers', type=int, default=8, help="--workers passed to the rebuild")
+    parser.add_argument('--keep', action='store_true', help="Keep the run directories")
+    args = parser.parse_args()
+
+    failed = False
+    for size in args.sizes:
+        market = MockMarket(size)
+        daily_session = market.as_of
+        server = MockPolygonServer(market, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                   rate_429=args.rate_429).start()
+        env = dict(os.environ, POLYGON_BASE_URL=server.url, POLYGON_API_KEY='mock')
+        print(f"\n{size} symbols (+{len(market.symbols) - size} ETFs and warrants), {args.latency_ms:g}+{args.jitter_ms:g} ms "
+              f"latency, {args.rate_429:.1%} 429s, mock at {server.url}")
+        try:
+            for source in args.sources:
+                workdir = tempfile.mkdtemp(prefix=f"bench_pipeline_{size}_{source}_")
+                # The rebuild sees the market up to the session before; the daily update adds it
+                market.as_of = market.dates[-2]
+                result = run_script('process_stocks', ['--source', source, '--rps', str(args.rps),
+                                                       '--workers', str(args.workers)], workdir, env)
+                describe(f"rebuild {source}", *result)
+                market.as_of = daily_session
+                daily = run_script('process_stocks_daily', [], workdir, env)
+                describe("  daily", *daily)
+                failed |= result[0] != 0 or daily[0] != 0
+                if args.keep:
+                    print(f"  kept {workdir}")
+                else:
+                    shutil.rmtree(workdir)
+        finally:
+            server.shutdown()
+            server.server_close()
+    if failed:
+        raise SystemExit("❌ A run failed - see the logs with --keep")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Append and query latency of the rank history store
+
+    python benchmarks/bench_rank_history.py [--symbols 6000] [--days 252]
+
+Builds a history by appending one synthetic ranking per day (a few symbols
+listed or delisted along the way), checks queries against the in-memory
+arrays, then times them on the memory-mapped store.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import trading_timestamps
+
+import numpy as np
+
+import rank_history
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=6000)
+    parser.add_argument('--days', type=int, default=252)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    symbols = [f"S{i:05d}" for i in range(args.symbols + args.days)]
+    scores = rng.normal(0, 1, len(symbols))
+    dates = [rank_history.ms_to_date(t) for t in trading_timestamps(args.days)]
+    ranks = np.zeros((args.days, len(symbols)), dtype=np.uint8)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rank_history')
+        history = rank_history.RankHistory.open(path)
+        start = time.perf_counter()
+        for day, date in enumerate(dates):
+            # One listing per day: the universe grows past a column block
+            listed = np.arange(day, args.symbols + day)
+            scores += rng.normal(0, 0.1, len(symbols))
+            order = listed[np.argsort(-scores[listed], kind='stable')]
+            total = len(order)
+            day_ranks = np.minimum(((total - np.arange(total)) / total * 99).astype(int) + 1, 99)
+            ranks[day, order] = day_ranks
+            history.append(date, [symbols[i] for i in order], day_ranks, scores[order])
+        append_ms = (time.perf_counter() - start) * 1000 / args.days
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"{args.days} days x {len(history.symbols)} symbols: {size / 1024 ** 2:.1f} MB, "
+              f"append {append_ms:.2f} ms/day")
+
+        history = rank_history.RankHistory(path)
+        picks = rng.choice(len(symbols), 200, replace=False)
+        for col in picks:
+            _, got, _ = history.series(symbols[col])
+            assert np.array_equal(got, ranks[:, col]), symbols[col]
+        then, now = ranks[-21].astype(int), ranks[-1].astype(int)
+        both = (then > 0) & (now > 0)
+        best = np.max((now - then)[both])
+        movers = history.top_movers(20, 20)
+        assert movers[0][3] == best and len(movers) == 20
+        print("✅ Series and movers match the in-memory ranks")
+
+        sample = [symbols[col] for col in picks]
+        print(f"  open                     {best_of(lambda: rank_history.RankHistory(path)):8.3f} ms")
+        per_symbol = best_of(lambda: [history.series(symbol) for symbol in sample]) / len(sample)
+        print(f"  series (full year)       {per_symbol:8.3f} ms/symbol")
+        per_symbol = best_of(lambda: [history.series(symbol, 60) for symbol in sample]) / len(sample)
+        print(f"  series (60 days)         {per_symbol:8.3f} ms/symbol")
+        per_symbol = best_of(lambda: [history.crossings(symbol, 90) for symbol in sample]) / len(sample)
+        print(f"  crossings (RS 90)        {per_symbol:8.3f} ms/symbol")
+        print(f"  top movers (20 days)     {best_of(lambda: history.top_movers(20, 20)):8.3f} ms")
+
+if __name__ == "__main__":
+    main()
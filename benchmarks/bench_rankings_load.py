@@ -0,0 +1,89 @@
+"""Size and load time of rankings.json vs its columnar and compressed companions
+
+    python benchmarks/bench_rankings_load.py [--symbols 10000]
+
+"Load" means getting numeric columns a dashboard can sort and filter: for
+rankings.json that includes parsing "58.3%" / "83k" strings back to numbers.
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+from synthetic import make_universe
+
+import numpy as np
+
+import json_stream
+import rankings_artifacts
+import rs_engine
+from process_stocks import format_ranking
+
+def parse_volume(text):
+    scale = {'M': 1e6, 'k': 1e3}.get(text[-1])
+    return float(text[:-1]) * scale if scale else float(text)
+
+def load_json(raw):
+    rows = json.loads(raw)['data']
+    return {
+        'symbol': [row['symbol'] for row in rows],
+        'rs_rank': np.array([row['rs_rank'] for row in rows]),
+        'rs_score': np.array([row['rs_score'] for row in rows]),
+        'avg_volume': np.array([parse_volume(row['avg_volume']) for row in rows]),
+        'relative_3m': np.array([float(row['relative_3m'][:-1]) / 100 for row in rows]),
+        'relative_12m': np.array([float(row['relative_12m'][:-1]) / 100 for row in rows])
+    }
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=10000)
+    args = parser.parse_args()
+
+    spy_bars, universe = make_universe(args.symbols, 300)
+    records = rs_engine.to_stock_records(rs_engine.score_universe(rs_engine.build_price_matrix(spy_bars, universe)))
+    records.sort(key=lambda x: x['rs_score'], reverse=True)
+    for stock, rank in zip(records, rs_engine.percentile_ranks(np.array([r['rs_score'] for r in records]))):
+        stock['rs_rank'] = int(rank)
+    header = {'last_updated': '2024-01-01T00:00:00', 'total_stocks': len(records), 'update_type': 'full_rebuild'}
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            json_stream.write_json('rankings.json', header, 'data', (format_ranking(s) for s in records))
+            rankings_artifacts.write_all(header, records)
+            problems = rankings_artifacts.verify()
+
+            with open('rankings.json', 'rb') as f:
+                raw = f.read()
+            with open(rankings_artifacts.GZIP_PATH, 'rb') as f:
+                compressed = f.read()
+
+            print(f"{len(records)} ranked symbols")
+            rows = [
+                ('rankings.json', len(raw), best_of(lambda: load_json(raw))),
+                ('rankings.json.gz', len(compressed), best_of(lambda: load_json(gzip.decompress(compressed)))),
+                ('rankings.bin', os.path.getsize(rankings_artifacts.BIN_PATH),
+                 best_of(lambda: rankings_artifacts.read_columns(rankings_artifacts.BIN_PATH)))
+            ]
+            for name, size, ms in rows:
+                print(f"  {name:18s} {size / 1024:8.1f} KB  load {ms:7.2f} ms")
+        finally:
+            os.chdir(cwd)
+
+    if problems:
+        raise SystemExit(f"❌ Manifest check failed: {problems}")
+    print("✅ Manifest checksums and rankings.bin contents verified")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Parity check and speedup of rs_engine against the per-stock baseline
+
+    python benchmarks/bench_rs_engine.py [--symbols 5000] [--days 300]
+
+The baseline is the original pandas calculate_aligned_returns() frozen in
+tests/baseline.py (tests/test_rs_engine.py runs the same check in CI).
+"""
+import argparse
+import time
+
+from synthetic import make_universe
+
+import numpy as np
+
+import rs_engine
+from tests.baseline import calculate_aligned_returns, calculate_ibd_rs_score
+
+def run_per_stock(spy_bars, universe):
+    results = {}
+    for symbol, bars in universe:
+        relative_returns, stock_returns, avg_volume = calculate_aligned_returns(bars, spy_bars)
+        if relative_returns is not None:
+            results[symbol] = (calculate_ibd_rs_score(relative_returns), relative_returns,
+                               stock_returns, int(avg_volume))
+    return results
+
+def run_matrix(spy_bars, universe):
+    matrix = rs_engine.build_price_matrix(spy_bars, universe)
+    aligned = time.perf_counter()
+    result = rs_engine.score_universe(matrix)
+    return matrix, result, aligned
+
+def check_parity(expected, records):
+    """Return the number of mismatching fields (exact float comparison)"""
+    mismatches = 0
+    if set(expected) != {r['symbol'] for r in records}:
+        print(f"Symbol sets differ: {len(expected)} per-stock vs {len(records)} matrix")
+        mismatches += 1
+    for record in records:
+        score, relative_returns, stock_returns, avg_volume = expected.get(record['symbol'], (None, {}, {}, None))
+        checks = [
+            ('rs_score', score, record['rs_score']),
+            ('avg_volume', avg_volume, record['avg_volume']),
+            ('stock_return_3m', stock_returns.get('3m'), record['stock_return_3m']),
+            ('stock_return_12m', stock_returns.get('12m'), record['stock_return_12m'])
+        ]
+        checks += [(f"relative_{p}", relative_returns.get(p), record[f"relative_{p}"]) for p in rs_engine.PERIODS]
+        for field, want, got in checks:
+            if want != got:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"  {record['symbol']} {field}: per-stock {want} vs matrix {got}")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=300)
+    args = parser.parse_args()
+
+    spy_bars, universe = make_universe(args.symbols, args.days)
+    print(f"Synthetic universe: {args.symbols} symbols x {args.days} days")
+
+    start = time.perf_counter()
+    expected = run_per_stock(spy_bars, universe)
+    per_stock = time.perf_counter() - start
+    print(f"Per-stock calculate_aligned_returns: {per_stock:.2f}s")
+
+    start = time.perf_counter()
+    matrix, result, aligned = run_matrix(spy_bars, universe)
+    done = time.perf_counter()
+    print(f"Matrix engine: {done - start:.3f}s "
+          f"(align {aligned - start:.3f}s, score {done - aligned:.3f}s)")
+    print(f"Speedup: {per_stock / (done - start):.1f}x end to end, "
+          f"{per_stock / (done - aligned):.0f}x scoring only")
+
+    records = rs_engine.to_stock_records(result)
+    mismatches = check_parity(expected, records)
+
+    # Ranks: same as main()'s stable sort + percentile loop
+    ranks = rs_engine.percentile_ranks(np.array([r['rs_score'] for r in records]))
+    by_score = sorted(records, key=lambda x: x['rs_score'], reverse=True)
+    loop_ranks = {r['symbol']: min(int(((len(by_score) - i) / len(by_score)) * 99) + 1, 99)
+                  for i, r in enumerate(by_score)}
+    mismatches += sum(loop_ranks[r['symbol']] != rank for r, rank in zip(records, ranks))
+    print(f"Ranked {len(ranks)} symbols, RS >= 90: {int(np.sum(ranks >= 90))}")
+
+    if mismatches:
+        raise SystemExit(f"❌ Parity check failed: {mismatches} mismatching fields")
+    print(f"✅ Parity: all {len(expected)} symbols identical to calculate_aligned_returns")
+
+if __name__ == "__main__":
+    main()
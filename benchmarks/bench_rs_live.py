@@ -0,0 +1,117 @@
+"""Intraday refresh cost of rs_live.py, and parity with the daily rolling state
+
+    python benchmarks/bench_rs_live.py [--sizes 5000 20000] [--refreshes 20]
+
+For each universe size a mock_polygon.py market is turned into a price
+matrix. Parity: anchors built from every session but the last, scored on the
+last session's closes, must equal the rolling state's score() after
+apply_day() of that session, for every symbol that traded on it. Timing: a
+mock server serves the live snapshot; each refresh fetches and parses it,
+maps the quotes to columns, rescores and re-ranks the universe and builds
+the rankings rows. The median and worst refresh are reported per step.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from mock_polygon import MockMarket, MockPolygonServer
+
+import numpy as np
+
+import json_stream
+import rs_engine
+import rs_live
+import rs_state
+from polygon_client import PolygonClient
+
+def market_matrix(market):
+    """rs_engine matrix of every mock symbol against SPY"""
+    symbols = [symbol for symbol in market.symbols if symbol != 'SPY']
+    cols = [market.column[symbol] for symbol in symbols]
+    return {
+        'calendar': market.range_t,
+        'benchmark': market.closes[:, market.column['SPY']],
+        'symbols': symbols,
+        'closes': market.closes[:, cols],
+        'volumes': market.volumes[:, cols]
+    }
+
+def rows_of(matrix, stop):
+    return dict(matrix, calendar=matrix['calendar'][:stop], benchmark=matrix['benchmark'][:stop],
+                closes=matrix['closes'][:stop], volumes=matrix['volumes'][:stop])
+
+def parity(matrix):
+    """Symbols compared and the largest difference against the rolling state"""
+    state = rs_state.RollingState.from_matrix(rows_of(matrix, -1))
+    anchors = rs_live.LiveAnchors(state)
+    # The state stores float32 closes; feed the live path the same values
+    prices = matrix['closes'][-1].astype(np.float32).astype(np.float64)
+    live = anchors.score(prices, matrix['benchmark'][-1])
+
+    state.apply_day(matrix['calendar'][-1], matrix['benchmark'][-1], matrix['closes'][-1], matrix['volumes'][-1])
+    expected = state.score()
+    traded = ~np.isnan(prices)
+    if not np.array_equal(live['valid'] & traded, expected['valid']):
+        return int(expected['valid'].sum()), float('inf')
+    cols = np.flatnonzero(expected['valid'])
+    worst = max(np.max(np.abs(live[key][period][cols] - expected[key][period][cols]), initial=0.0)
+                for key in ('relative', 'stock') for period in rs_engine.PERIODS)
+    worst = max(worst, np.max(np.abs(live['rs_score'][cols] - expected['rs_score'][cols]), initial=0.0))
+    return len(cols), float(worst)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--refreshes', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Mock snapshot latency")
+    args = parser.parse_args()
+
+    ok = True
+    for size in args.sizes:
+        market = MockMarket(size)
+        matrix = market_matrix(market)
+        compared, worst = parity(matrix)
+        ok &= worst == 0.0
+        print(f"\n{size} symbols: parity with apply_day() + score() on {compared} symbols: "
+              f"{'✅ identical' if worst == 0.0 else f'❌ max difference {worst:g}'}")
+
+        anchors = rs_live.LiveAnchors(rs_state.RollingState.from_matrix(matrix))
+        server = MockPolygonServer(market, latency_ms=args.latency_ms).start()
+        client = PolygonClient('mock', server.url, requests_per_second=1000)
+        output = os.path.join(tempfile.mkdtemp(prefix='bench_rs_live_'), 'rankings_live.json')
+        steps = {'fetch': [], 'map': [], 'score+rank': [], 'rows': [], 'write': []}
+        try:
+            for _ in range(args.refreshes):
+                start = time.perf_counter()
+                quotes, spy, _ = rs_live.fetch_snapshot(client, server.url)
+                fetched = time.perf_counter()
+                prices = anchors.prices(quotes)
+                mapped = time.perf_counter()
+                result = anchors.score(prices, spy)
+                order, ranks = rs_live.ranked(result)
+                scored = time.perf_counter()
+                rows = rs_live.live_rows(result, order, ranks)
+                built = time.perf_counter()
+                json_stream.write_json(output, {'update_type': 'intraday_live'}, 'data', rows)
+                written = time.perf_counter()
+                for name, seconds in zip(steps, (fetched - start, mapped - fetched, scored - mapped,
+                                                 built - scored, written - built)):
+                    steps[name].append(seconds)
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+            os.remove(output)
+            os.rmdir(os.path.dirname(output))
+
+        total = [sum(parts) for parts in zip(*steps.values())]
+        print(f"  {len(order)} ranked, {args.refreshes} refreshes: median {np.median(total) * 1000:.0f} ms, "
+              f"worst {max(total) * 1000:.0f} ms (fetch includes building the mock response)")
+        for name, seconds in steps.items():
+            print(f"    {name:10s} median {np.median(seconds) * 1000:7.1f} ms  worst {max(seconds) * 1000:7.1f} ms")
+    if not ok:
+        raise SystemExit("❌ Live scores diverge from the rolling state")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Scaling of rs_parallel scoring with 1, 2, 4 and 8 worker processes
+
+    python benchmarks/bench_rs_parallel.py [--symbols 20000] [--days 300] [--benchmarks 1 4]
+
+1 worker scores every benchmark in one in-process pass; more workers shard the
+columns over shared memory (pool start-up included). Every run is checked
+against the in-process result. Speedups are bounded by the cores available
+(os.cpu_count() is printed).
+"""
+import argparse
+import os
+import time
+
+from synthetic import random_walk_closes, trading_timestamps
+
+import numpy as np
+
+import rs_engine
+import rs_parallel
+
+def synthetic_matrix(n_symbols, n_days, rng):
+    closes = random_walk_closes(rng, n_days, n_symbols + 1)
+    # A few missing bars, as the aligned matrix has for gappy symbols
+    closes[rng.random(closes.shape) < 0.002] = np.nan
+    closes[:, 0] = random_walk_closes(rng, n_days, 1)[:, 0]
+    return {
+        'calendar': trading_timestamps(n_days),
+        'benchmark': closes[:, 0].copy(),
+        'symbols': [f"S{j:06d}" for j in range(n_symbols)],
+        'bar_counts': np.full(n_symbols, n_days),
+        'closes': closes[:, 1:],
+        'volumes': rng.integers(0, 5_000_000, (n_days, n_symbols)).astype(np.float64)
+    }
+
+def same(a, b):
+    fields = ['valid', 'rs_score', 'avg_volume']
+    return (all(np.array_equal(a[f], b[f]) for f in fields) and
+            all(np.array_equal(a[k][p], b[k][p]) for k in ('relative', 'stock') for p in rs_engine.PERIODS))
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=300)
+    parser.add_argument('--benchmarks', type=int, nargs='+', default=[1, 4],
+                        help="Benchmark series counts to score against")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    matrix = synthetic_matrix(args.symbols, args.days, rng)
+    print(f"{args.symbols} symbols x {args.days} days, {os.cpu_count()} CPUs")
+    ok = True
+    for n_benchmarks in args.benchmarks:
+        benchmarks = {f"B{i}": random_walk_closes(rng, args.days, 1)[:, 0] for i in range(n_benchmarks)}
+        baseline = None
+        for workers in args.workers:
+            elapsed, results = best_of(lambda: rs_parallel.score_benchmarks(matrix, benchmarks, workers))
+            if baseline is None:
+                baseline, expected = elapsed, results
+            match = all(same(expected[name], results[name]) for name in benchmarks)
+            ok &= match
+            print(f"  {n_benchmarks} benchmark(s), {workers} worker(s): {elapsed * 1000:8.1f} ms  "
+                  f"speedup {baseline / elapsed:4.2f}x  {'✅' if match else '❌'}")
+    if not ok:
+        raise SystemExit("❌ Parallel results differ from the in-process score")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Replay of a year of daily RS ranks against the per-day paths
+
+    python benchmarks/bench_rs_replay.py [--symbols 5000] [--days 252] [--check-days 252]
+
+Builds a synthetic matrix with --days of lookback before the replayed year
+(gaps, late listings and zero volumes included), replays it with
+rs_replay.replay(), and checks --check-days evenly spaced days against
+score_universe() on each day's window: returns, scores, average volume and
+ranks must be identical. The per-day loop is timed over the checked days and
+scaled to the year; the baseline calculate_aligned_returns() (one DataFrame
+join per symbol and day, tests/baseline.py, needs pandas) is timed on a
+sample and scaled the same way.
+"""
+import argparse
+import time
+
+from synthetic import random_walk_closes, trading_timestamps
+
+import numpy as np
+
+import rs_engine
+import rs_replay
+
+def synthetic_matrix(n_symbols, n_dates, rng):
+    closes = random_walk_closes(rng, n_dates, n_symbols + 1)
+    closes[:, 1:][rng.random((n_dates, n_symbols)) < 0.002] = np.nan
+    # Late listings and early delistings
+    for j in rng.choice(n_symbols, n_symbols // 10, replace=False):
+        closes[:rng.integers(1, n_dates), j + 1] = np.nan
+    for j in rng.choice(n_symbols, n_symbols // 50, replace=False):
+        closes[rng.integers(n_dates // 2, n_dates):, j + 1] = np.nan
+    volumes = rng.integers(0, 5_000_000, (n_dates, n_symbols)).astype(np.float64)
+    volumes[rng.random(volumes.shape) < 0.01] = 0
+    return {
+        'calendar': trading_timestamps(n_dates),
+        'benchmark': closes[:, 0].copy(),
+        'symbols': [f"S{j:05d}" for j in range(n_symbols)],
+        'closes': closes[:, 1:],
+        'volumes': volumes
+    }
+
+def legacy_seconds(matrix, row, samples=20):
+    """Seconds per symbol of calculate_aligned_returns() + calculate_ibd_rs_score() on one day"""
+    from tests import baseline
+    window = rs_replay.window_rows(matrix, row)
+    spy = [{'t': int(t), 'c': float(c)} for t, c in zip(window['calendar'], window['benchmark'])]
+    start = time.perf_counter()
+    for col in range(samples):
+        bars = [{'t': int(t), 'c': float(c), 'v': float(v)}
+                for t, c, v in zip(window['calendar'], window['closes'][:, col], window['volumes'][:, col])
+                if not np.isnan(c)]
+        relative, _, _ = baseline.calculate_aligned_returns(bars, spy)
+        baseline.calculate_ibd_rs_score(relative)
+    return (time.perf_counter() - start) / samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=252, help="Days replayed (the same again is lookback)")
+    parser.add_argument('--check-days', type=int, default=252, help="Days checked against score_universe()")
+    parser.add_argument('--skip-legacy', action='store_true', help="Do not time calculate_aligned_returns()")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    n_dates = args.days + rs_engine.MIN_BARS
+    matrix = synthetic_matrix(args.symbols, n_dates, rng)
+    print(f"{args.symbols} symbols, {args.days} replayed days after {rs_engine.MIN_BARS} days of lookback")
+
+    start = time.perf_counter()
+    result = rs_replay.replay(matrix, args.days)
+    replay_seconds = time.perf_counter() - start
+    print(f"  replay          {replay_seconds:8.2f}s  ({int(result['valid'].sum())} symbol-days ranked)")
+
+    first_row = n_dates - args.days
+    checked = np.unique(np.linspace(0, args.days - 1, min(args.check_days, args.days)).astype(int))
+    divergent = 0
+    scoring = 0.0
+    for i in checked:
+        start = time.perf_counter()
+        expected = rs_replay.score_day(matrix, first_row + i)
+        scoring += time.perf_counter() - start
+        divergent += bool(rs_replay.compare_day(result, i, expected))
+    per_day = scoring / len(checked)
+    print(f"  score_universe  {per_day * args.days:8.2f}s  per-day loop ({per_day * 1000:.0f} ms/day, "
+          f"{len(checked)} days checked: {'✅ identical' if not divergent else f'❌ {divergent} days differ'})")
+
+    if not args.skip_legacy:
+        per_symbol = legacy_seconds(matrix, n_dates - 1)
+        print(f"  aligned_returns {per_symbol * args.symbols * args.days:8.0f}s  per symbol and day "
+              f"(estimated from {per_symbol * 1000:.1f} ms per join)")
+    if divergent:
+        raise SystemExit("❌ Replay diverges from the per-day path")
+
+if __name__ == "__main__":
+    main()
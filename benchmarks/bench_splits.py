@@ -0,0 +1,114 @@
+"""Split and bad-bar detection on a synthetic store: accuracy, speed and repair
+
+    python benchmarks/bench_splits.py [--symbols 5000] [--days 300] [--splits 100] [--bad-bars 50]
+                                      [--crashes 50] [--unlisted 0.1]
+
+Injects splits (history before the split day moved to the old basis, volumes
+scaled the other way), single bad prints and crashes (a real 50-90% drop
+with the volume up 3-6x afterwards, which looks like a split by price and
+volume) into a random-walk price store. The splits reference lists all but
+--unlisted of the splits. splits.find_events() + confirm() are timed over
+the whole history, and what was found, missed and falsely flagged is
+counted. The confirmed events are applied to the store in place; no crash
+may be adjusted, and the repaired closes are compared with the clean ones.
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+
+from synthetic import random_walk_closes, trading_timestamps
+
+import numpy as np
+
+import price_store
+import splits
+
+FACTORS = [2, 3, 4, 1.5, 10, 0.1, 0.2, 0.05]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=300)
+    parser.add_argument('--splits', type=int, default=100)
+    parser.add_argument('--bad-bars', type=int, default=50)
+    parser.add_argument('--crashes', type=int, default=50)
+    parser.add_argument('--unlisted', type=float, default=0.1, help="Fraction of splits missing from the reference")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    n_days, n_symbols = args.days, args.symbols
+    clean = random_walk_closes(rng, n_days, n_symbols + 1).astype(np.float32)
+    clean[:, 1:][rng.random((n_days, n_symbols)) < 0.002] = np.nan
+    volumes = rng.integers(100_000, 5_000_000, (n_days, n_symbols + 1)).astype(np.uint64)
+    symbols = ['SPY'] + [f"S{j:05d}" for j in range(n_symbols)]
+
+    calendar = trading_timestamps(n_days)
+    dates = [datetime.utcfromtimestamp(t / 1000).strftime('%Y-%m-%d') for t in calendar]
+    cols = 1 + rng.choice(n_symbols, args.splits + args.bad_bars + args.crashes, replace=False)
+    split_cols, bad_cols, crash_cols = np.split(cols, [args.splits, args.splits + args.bad_bars])
+    # Crashes are part of the clean history: they must survive the repair
+    for col in crash_cols:
+        row = int(rng.integers(30, n_days - 15))
+        clean[row:, col] *= rng.uniform(0.1, 0.5)
+        volumes[row:row + 15, col] *= np.uint64(rng.integers(3, 7))
+
+    closes = clean.copy()
+    injected = {}
+    reference = {}
+    for i, col in enumerate(split_cols):
+        row = int(rng.integers(30, n_days - 15))
+        factor = FACTORS[i % len(FACTORS)]
+        closes[:row, col] *= factor
+        volumes[:row, col] = np.round(volumes[:row, col] / factor).astype(np.uint64)
+        injected[(symbols[col], row)] = 'split'
+        if rng.random() >= args.unlisted:
+            reference.setdefault(dates[row], {})[symbols[col]] = factor
+    for col in bad_cols:
+        row = int(rng.integers(30, n_days - 15))
+        closes[row, col] *= rng.choice([0.01, 0.1, 8.0, 100.0])
+        injected[(symbols[col], row)] = 'bad_bar'
+    listed = sum(len(symbols) for symbols in reference.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = price_store.PriceStore.create(tmp, symbols, calendar, closes, volumes)
+        store = price_store.PriceStore(tmp, mode='r+')
+
+        start = time.perf_counter()
+        events = splits.find_events(store.closes, store.volumes, store.symbols, store.dates)
+        events = splits.confirm(events, splits.references_for(events, lambda date: reference.get(date, {})))
+        elapsed = time.perf_counter() - start
+        found = {(event['symbol'], event['row']): event for event in events}
+        hits = sum(1 for key, kind in injected.items() if key in found and found[key]['kind'] == kind)
+        confirmed = sum(1 for key in injected if key in found and found[key]['status'] == 'confirmed')
+        false = [event for key, event in found.items() if key not in injected]
+        print(f"{n_symbols} symbols x {n_days} days: scanned in {elapsed * 1000:.0f} ms")
+        print(f"  injected {args.splits} splits ({listed} in the reference) + {args.bad_bars} bad bars: "
+              f"{hits} found with the right kind, {confirmed} confirmed, {len(injected) - hits} missed")
+        crashes = {symbols[col] for col in crash_cols}
+        crash_events = [event for event in false if event['symbol'] in crashes]
+        print(f"  {args.crashes} crashes on heavy volume: {len(crash_events)} listed "
+              f"({sum(1 for event in crash_events if event['kind'] == 'split')} as split candidates, "
+              f"{sum(1 for event in crash_events if event['source'] == 'volume')} with the volume agreeing), "
+              f"{sum(1 for event in crash_events if event['status'] == 'confirmed')} confirmed")
+        other = [event for event in false if event['symbol'] not in crashes]
+        print(f"  {len(other)} other events flagged "
+              f"({sum(1 for event in other if event['status'] == 'confirmed')} confirmed)"
+              + ''.join(f", {event['symbol']} {event['kind']} x{1 / event['ratio']:.2f}" for event in other[:5]))
+
+        applied = splits.apply(store, events)
+        # Columns whose injected event is still pending keep their old basis
+        left = {symbols.index(symbol) for (symbol, row) in injected
+                if (symbol, row) not in {(event['symbol'], event['row']) for event in applied}}
+        repaired = np.asarray(store.closes)
+        both = ~np.isnan(repaired) & ~np.isnan(clean)
+        both[:, sorted(left)] = False
+        error = np.abs(repaired[both] / clean[both] - 1).max()
+        dropped = int((np.isnan(repaired) & ~np.isnan(clean)).sum())
+        print(f"  applied {len(applied)}: max relative error vs the clean closes {error:.2e} "
+              f"({len(left)} columns left pending), {dropped} bars dropped")
+        if any(event['symbol'] in crashes for event in applied):
+            raise SystemExit("❌ A crash was adjusted as a split")
+
+if __name__ == "__main__":
+    main()
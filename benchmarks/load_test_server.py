@@ -0,0 +1,168 @@
+"""Load test for rankings_server.py over keep-alive connections
+
+    python benchmarks/load_test_server.py [--connections 32] [--seconds 10] [--symbols 10000]
+    python benchmarks/load_test_server.py --url http://127.0.0.1:8080   # a running server
+
+Without --url it writes a synthetic rankings.json to a temp directory,
+starts the server on it, and halfway through replaces rankings.json to
+check that the reload happens under load without failed requests.
+Requests mix /symbol, /top, /screen and conditional /health calls.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+from synthetic import make_universe  # noqa: F401 (puts the repo on sys.path)
+from bench_screener import synthetic_rows
+
+import numpy as np
+
+import json_stream
+import rankings_delta
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCREENS = [
+    "rs_rank >= 90 and raw_volume > 500k order by relative_3m desc limit 25",
+    "relative_12m > 300% order by relative_12m desc limit 25",
+    "raw_volume > 100k order by rs_score desc limit 50"
+]
+
+def write_rankings(path, rows):
+    header = {'last_updated': time.strftime('%Y-%m-%dT%H:%M:%S'), 'total_stocks': len(rows),
+              'update_type': 'full_rebuild'}
+    header['version'] = rankings_delta.snapshot_version(
+        {row['symbol']: rankings_delta.as_values(row) for row in rows})
+    json_stream.write_json(path, header, 'data', rows)
+    return header['version']
+
+async def request(reader, writer, path, etag=None):
+    lines = [f"GET {path} HTTP/1.1", "Host: localhost"]
+    if etag:
+        lines.append(f"If-None-Match: {etag}")
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(':') for line in head[1:] if line)}
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(head[0].split(' ')[1]), headers.get('etag'), body
+
+async def client(host, port, symbols, deadline, stats, seen_etags):
+    reader, writer = await asyncio.open_connection(host, port)
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            kind = random.choice(['symbol', 'symbol', 'symbol', 'top', 'screen', 'health'])
+            if kind == 'symbol':
+                path = f"/symbol/{random.choice(symbols)}"
+            elif kind == 'top':
+                path = f"/top?n={random.choice([10, 20, 50])}"
+            elif kind == 'screen':
+                path = f"/screen?q={quote(random.choice(SCREENS))}"
+            else:
+                path = "/health"
+            start = time.perf_counter()
+            try:
+                status, etag_seen, _ = await request(reader, writer, path, etag if kind == 'top' else None)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                stats['errors'].append(repr(e))
+                return
+            stats['latency'].setdefault(kind, []).append(time.perf_counter() - start)
+            stats['status'][status] = stats['status'].get(status, 0) + 1
+            if etag_seen:
+                etag = etag_seen
+                seen_etags.add(etag_seen)
+    finally:
+        writer.close()
+
+async def wait_ready(host, port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, _, body = await request(reader, writer, '/health')
+            writer.close()
+            if status == 200:
+                return json.loads(body)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit("❌ Server did not become ready")
+
+async def run(host, port, symbols, connections, seconds, replace=None):
+    stats = {'latency': {}, 'status': {}, 'errors': []}
+    seen_etags = set()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(client(host, port, symbols, start + seconds, stats, seen_etags))
+             for _ in range(connections)]
+    if replace:
+        await asyncio.sleep(seconds / 2)
+        await asyncio.to_thread(replace)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    total = sum(stats['status'].values())
+    print(f"{total} requests in {elapsed:.1f}s over {connections} connections: {total / elapsed:,.0f} req/s")
+    for kind, latencies in sorted(stats['latency'].items()):
+        ms = np.array(latencies) * 1000
+        print(f"  {kind:7s} {len(ms):7d}  p50 {np.percentile(ms, 50):6.2f} ms  p99 {np.percentile(ms, 99):6.2f} ms")
+    print(f"  status: {dict(sorted(stats['status'].items()))}, connection errors: {len(stats['errors'])}")
+    return stats, seen_etags
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Test a running server instead of starting one")
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--symbols', type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        health = asyncio.run(wait_ready(url.hostname, url.port or 80))
+        print(f"Server at {args.url}: {health['rows']} stocks, version {health['version']}")
+        # Symbols to look up come from the server itself
+        async def fetch_symbols():
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            _, _, body = await request(reader, writer, f"/top?n=1000")
+            writer.close()
+            return [row['symbol'] for row in json.loads(body)['data']]
+        symbols = asyncio.run(fetch_symbols())
+        asyncio.run(run(url.hostname, url.port or 80, symbols, args.connections, args.seconds))
+        return
+
+    rng = np.random.default_rng(3)
+    rows = synthetic_rows(args.symbols, rng)
+    symbols = [row['symbol'] for row in rows]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rankings.json')
+        first = write_rankings(path, rows)
+        port = random.randint(20000, 40000)
+        server = subprocess.Popen([sys.executable, os.path.join(REPO, 'rankings_server.py'),
+                                   '--port', str(port), '--rankings', path, '--poll', '0.2'], cwd=tmp)
+        try:
+            asyncio.run(wait_ready('127.0.0.1', port))
+
+            def replace():
+                for row in rows:
+                    row['rs_score'] = round(row['rs_score'] + 0.01, 4)
+                replace.version = write_rankings(path, rows)
+
+            _, etags = asyncio.run(run('127.0.0.1', port, symbols, args.connections, args.seconds, replace))
+            health = asyncio.run(wait_ready('127.0.0.1', port))
+        finally:
+            server.terminate()
+            server.wait()
+
+    swapped = f'"{first}"' in etags and f'"{replace.version}"' in etags and health['version'] == replace.version
+    print(f"{'✅' if swapped else '❌'} Reload under load: served {first} then {replace.version}")
+    if not swapped:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Local stand-in for the Polygon endpoints the scripts use
+
+    python benchmarks/mock_polygon.py [--symbols 5000] [--port 8765] [--latency-ms 20] [--rate-429 0.01]
+    POLYGON_BASE_URL=http://127.0.0.1:8765 POLYGON_API_KEY=mock python process_stocks.py --rps 100
+
+Serves generated daily bars for a universe of --symbols stocks plus SPY,
+the benchmark ETFs and a warrant for every WARRANT_EVERY-th stock:
+
+    /v3/reference/tickers                       active=true|false, sort, order; paged
+                                                by `limit`, with next_url
+    /v2/aggs/ticker/<T>/range/1/day/<from>/<to> bars in the range, 404 for unknown tickers
+    /v2/aggs/grouped/locale/us/market/stocks/<date>
+                                                every symbol's bar that day
+    /v3/reference/splits                        execution_date=<date>: that day's splits
+    /v2/snapshot/locale/us/markets/stocks/tickers
+                                                live prices of the session after
+                                                --as-of, moving on every request
+
+The calendar is every weekday up to --as-of (default: the session the daily
+update would fetch today), so both scripts run against it with the real
+clock. Prices are seeded random walks; a few symbols list late, delist
+early or miss days, and one in SPLIT_EVERY splits in the last SPLIT_DAYS
+sessions (always including the last one). Bars are split-adjusted as of
+--as-of, as Polygon's are as of the request: history before a split that
+has not happened yet is on the old basis. Every request waits --latency-ms (plus up to
+--jitter-ms) and a --rate-429 fraction is answered 429 with Retry-After.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from synthetic import random_walk_closes
+
+ETFS = ['SPY', 'QQQ', 'IWM', 'DIA', 'XLB', 'XLC', 'XLE', 'XLF', 'XLI', 'XLK',
+        'XLP', 'XLRE', 'XLU', 'XLV', 'XLY']
+HISTORY_DAYS = 330          # Sessions generated (the rebuild asks for ~450 calendar days)
+WARRANT_EVERY = 25
+RANGE_OPEN_HOURS = 5        # Range bars are stamped at midnight ET (05:00 UTC)
+GROUPED_CLOSE_HOURS = 21    # Grouped bars at the 16:00 ET close
+UNTRADED_EVERY = 20         # Every 20th symbol has not traded yet in the live snapshot
+SPLIT_EVERY = 200
+SPLIT_DAYS = 30
+SPLIT_FACTORS = [2, 3, 4, 10, 0.1, 0.05]    # Price factors: 2-for-1 ... 1-for-20
+
+def last_session(now=None):
+    """The weekday the daily update fetches: yesterday, or Friday at weekends"""
+    day = (now or datetime.now()) - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.strftime('%Y-%m-%d')
+
+def weekdays_until(end, count):
+    days = []
+    day = datetime.strptime(end, '%Y-%m-%d')
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.strftime('%Y-%m-%d'))
+        day -= timedelta(days=1)
+    return days[::-1]
+
+def symbol_name(i):
+    """AAAA, AAAB, ... (four letters never collide with the 3-letter ETFs' names)"""
+    letters = []
+    for _ in range(4):
+        i, r = divmod(i, 26)
+        letters.append(chr(ord('A') + r))
+    return ''.join(reversed(letters))
+
+class MockMarket:
+    """Generated closes/volumes (sessions x symbols) and the JSON bodies built from them"""
+
+    def __init__(self, n_symbols, as_of=None, days=HISTORY_DAYS, seed=0):
+        rng = np.random.default_rng(seed)
+        self.as_of = as_of or last_session()
+        self.dates = weekdays_until(self.as_of, days)
+        self.row = {date: i for i, date in enumerate(self.dates)}
+        self.date_array = np.array(self.dates)
+        midnights = np.array([datetime.strptime(d, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+                              for d in self.dates], dtype=np.int64) * 1000
+        self.range_t = midnights + RANGE_OPEN_HOURS * 3600 * 1000
+        self.grouped_t = midnights + GROUPED_CLOSE_HOURS * 3600 * 1000
+
+        stocks = [symbol_name(i) for i in range(n_symbols)]
+        warrants = [symbol + 'W' for symbol in stocks[::WARRANT_EVERY]]
+        self.symbols = ETFS + stocks + warrants
+        self.types = dict({symbol: 'ETF' for symbol in ETFS}, **{symbol: 'CS' for symbol in stocks},
+                          **{symbol: 'WARRANT' for symbol in warrants})
+        self.column = {symbol: j for j, symbol in enumerate(self.symbols)}
+        closes = np.round(random_walk_closes(rng, days, len(self.symbols)), 4)
+        volumes = rng.integers(1_000, 5_000_000, (days, len(self.symbols))).astype(np.float64)
+        # Late listings, delistings and scattered missing days
+        first = len(ETFS)
+        self.delisted = {}
+        for j in first + np.flatnonzero(rng.random(n_symbols) < 0.08):
+            closes[:rng.integers(1, days), j] = np.nan
+        for j in first + np.flatnonzero(rng.random(n_symbols) < 0.02):
+            end = rng.integers(days // 2, days)
+            closes[end:, j] = np.nan
+            self.delisted[self.symbols[j]] = self.dates[end]
+        closes[:, first:][rng.random((days, len(self.symbols) - first)) < 0.002] = np.nan
+        # Warrants swing far harder than their stocks
+        closes[:, first + n_symbols:] = np.round(random_walk_closes(rng, days, len(warrants)) ** 2 / 100, 4)
+        self.closes = closes
+        self.volumes = volumes
+        # Splits of stocks that trade through the split day; closes/volumes above are adjusted
+        self.split_row = np.full(len(self.symbols), days, dtype=np.int64)
+        self.split_factor = np.ones(len(self.symbols))
+        candidates = [j for j in range(first, first + n_symbols) if not np.isnan(closes[days - SPLIT_DAYS:, j]).any()]
+        picks = rng.choice(candidates, min(len(candidates), max(n_symbols // SPLIT_EVERY, 1)), replace=False)
+        for i, j in enumerate(picks):
+            self.split_row[j] = days - 1 if i == 0 else rng.integers(days - SPLIT_DAYS, days)
+            self.split_factor[j] = SPLIT_FACTORS[i % len(SPLIT_FACTORS)]
+        self.splits = {self.symbols[j]: (self.dates[self.split_row[j]], float(self.split_factor[j])) for j in picks}
+        self.updated = {symbol: f"{self.dates[rng.integers(0, days)]}T00:00:00Z" for symbol in self.symbols}
+        self.live_rng = np.random.default_rng(seed + 1)
+        self.live = None
+        self.live_lock = threading.Lock()
+
+    def ticker_record(self, symbol):
+        kind = self.types[symbol]
+        record = {'ticker': symbol, 'name': f"{symbol} {'ETF' if kind == 'ETF' else 'Inc.'}",
+                  'market': 'stocks', 'locale': 'us', 'type': kind, 'active': symbol not in self.delisted,
+                  'primary_exchange': 'ARCX' if kind == 'ETF' else 'XNAS', 'currency_name': 'usd',
+                  'last_updated_utc': self.updated[symbol]}
+        if symbol in self.delisted:
+            record['delisted_utc'] = f"{self.delisted[symbol]}T00:00:00Z"
+        return record
+
+    def tickers(self, active=True, sort='ticker', order='asc'):
+        """Every listing record matching the query, in the requested order"""
+        records = [self.ticker_record(symbol) for symbol in self.symbols if (symbol not in self.delisted) == active]
+        return sorted(records, key=lambda record: record.get(sort) or '', reverse=order == 'desc')
+
+    def visible_rows(self):
+        return self.row[self.as_of] + 1 if self.as_of in self.row else len(self.dates)
+
+    def basis(self, rows, cols):
+        """Factor from adjusted to as-served prices: splits after --as-of are not applied yet"""
+        pending = (self.split_row[cols] >= self.visible_rows()) & (rows < self.split_row[cols])
+        return np.where(pending, self.split_factor[cols], 1.0)
+
+    def split_records(self, date):
+        return [{'ticker': symbol, 'execution_date': day, 'split_from': round(1 / factor) if factor < 1 else 1,
+                 'split_to': factor if factor >= 1 else 1}
+                for symbol, (day, factor) in self.splits.items() if day == date and date <= self.as_of]
+
+    def range_bars(self, symbol, start, end):
+        j = self.column[symbol]
+        dates = self.date_array[:self.visible_rows()]
+        rows = np.flatnonzero((dates >= start) & (dates <= end) & ~np.isnan(self.closes[:len(dates), j]))
+        basis = self.basis(rows, np.full(len(rows), j))
+        closes = np.round(self.closes[rows, j] * basis, 4)
+        volumes = np.round(self.volumes[rows, j] / basis)
+        return [{'v': float(v), 'o': float(c), 'c': float(c), 'h': float(c), 'l': float(c), 't': int(self.range_t[i]),
+                 'n': 1} for i, c, v in zip(rows, closes, volumes)]
+
+    def grouped_bars(self, date):
+        i = self.row.get(date)
+        if i is None or i >= self.visible_rows():
+            return []
+        t = int(self.grouped_t[i])
+        basis = self.basis(i, np.arange(len(self.symbols)))
+        closes = np.round(self.closes[i] * basis, 4)
+        volumes = np.round(self.volumes[i] / basis)
+        return [{'T': symbol, 'v': float(volumes[j]), 'o': float(closes[j]), 'c': float(closes[j]),
+                 'h': float(closes[j]), 'l': float(closes[j]), 't': t}
+                for j, symbol in enumerate(self.symbols) if not np.isnan(closes[j])]
+
+    def snapshot(self):
+        """All-tickers snapshot records: the last visible close moved by one more random step"""
+        with self.live_lock:
+            row = self.visible_rows() - 1
+            if self.live is None or self.live[0] != row:
+                self.live = (row, self.closes[row] * self.basis(row, np.arange(len(self.symbols))))
+            self.live[1][:] *= np.exp(self.live_rng.normal(0, 0.002, len(self.symbols)))
+            prices = self.live[1].copy()
+        previous_closes = self.closes[row] * self.basis(row, np.arange(len(self.symbols)))
+        updated = time.time_ns()
+        records = []
+        for j, symbol in enumerate(self.symbols):
+            if np.isnan(prices[j]):
+                continue
+            previous = float(previous_closes[j])
+            record = {'ticker': symbol, 'updated': updated, 'prevDay': {'c': previous, 'v': float(self.volumes[row, j])},
+                      'day': {'o': 0, 'h': 0, 'l': 0, 'c': 0, 'v': 0}, 'todaysChange': 0, 'todaysChangePerc': 0}
+            if j % UNTRADED_EVERY != UNTRADED_EVERY - 1 or symbol in ETFS:
+                price = round(float(prices[j]), 4)
+                volume = float(self.volumes[row, j]) / 2
+                record['day'] = {'o': previous, 'h': max(previous, price), 'l': min(previous, price),
+                                 'c': price, 'v': volume}
+                record['min'] = {'c': price, 'v': volume / 100, 't': updated // 1_000_000}
+                record['lastTrade'] = {'p': price, 's': 100, 't': updated}
+                record['todaysChange'] = round(price - previous, 4)
+                record['todaysChangePerc'] = round((price / previous - 1) * 100, 4)
+            records.append(record)
+        return records
+
+class MockPolygonServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, market, port=0, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, retry_after=0.1, seed=0):
+        super().__init__(('127.0.0.1', port), MockHandler)
+        self.market = market
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+
+        delay = server.latency_ms + server.random.uniform(0, server.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        if 'apikey' not in params:
+            server.count('401')
+            return self.send_json(401, {'status': 'ERROR', 'error': 'API key missing'})
+        if server.rate_429 and server.random.random() < server.rate_429:
+            server.count('429')
+            return self.send_json(429, {'status': 'ERROR', 'error': 'rate limited'},
+                                  {'Retry-After': f"{server.retry_after:g}"} if server.retry_after else None)
+
+        market = server.market
+        if parts[:3] == ['v3', 'reference', 'tickers']:
+            server.count('tickers')
+            limit = min(int(params.get('limit', 100)), 1000)
+            offset = int(params.get('cursor', 0))
+            query = {'active': params.get('active', 'true'), 'sort': params.get('sort', 'ticker'),
+                     'order': params.get('order', 'asc')}
+            records = market.tickers(query['active'] == 'true', query['sort'], query['order'])
+            body = {'status': 'OK', 'results': records[offset:offset + limit]}
+            body['count'] = len(body['results'])
+            if offset + limit < len(records):
+                body['next_url'] = (f"http://{self.headers.get('Host')}/v3/reference/tickers?cursor={offset + limit}"
+                                    f"&limit={limit}&market=stocks&" + '&'.join(f"{k}={v}" for k, v in query.items()))
+            return self.send_json(200, body)
+        if parts[:3] == ['v2', 'aggs', 'ticker'] and len(parts) == 9 and parts[4] == 'range':
+            server.count('range')
+            symbol, start, end = parts[3], parts[7], parts[8]
+            if symbol not in market.column:
+                return self.send_json(404, {'status': 'NOT_FOUND', 'message': 'ticker not found'})
+            bars = market.range_bars(symbol, start, end)
+            return self.send_json(200, {'ticker': symbol, 'status': 'OK', 'adjusted': True,
+                                        'resultsCount': len(bars), 'results': bars})
+        if parts[:6] == ['v2', 'aggs', 'grouped', 'locale', 'us', 'market'] and len(parts) == 8:
+            server.count('grouped')
+            bars = market.grouped_bars(parts[7])
+            body = {'status': 'OK', 'adjusted': True, 'resultsCount': len(bars)}
+            if bars:
+                body['results'] = bars
+            return self.send_json(200, body)
+        if parts[:3] == ['v3', 'reference', 'splits']:
+            server.count('splits')
+            return self.send_json(200, {'status': 'OK', 'results': market.split_records(params.get('execution_date'))})
+        if parts == ['v2', 'snapshot', 'locale', 'us', 'markets', 'stocks', 'tickers']:
+            server.count('snapshot')
+            return self.send_json(200, {'status': 'OK', 'tickers': market.snapshot()})
+        server.count('404')
+        self.send_json(404, {'status': 'NOT_FOUND', 'message': 'unknown endpoint'})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--as-of', help="Last session served (default: the session the daily update fetches)")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument('--retry-after', type=float, default=0.1,
+                        help="Retry-After seconds on injected 429s (0 omits the header)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    market = MockMarket(args.symbols, args.as_of, seed=args.seed)
+    server = MockPolygonServer(market, args.port, args.latency_ms, args.jitter_ms, args.rate_429,
+                               args.retry_after, args.seed)
+    print(f"🚀 Mock Polygon on {server.url}: {len(market.symbols)} symbols, "
+          f"{market.dates[0]} .. {market.as_of} (generated in {time.perf_counter() - start:.1f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped after {server.stats}")
+
+if __name__ == "__main__":
+    main()
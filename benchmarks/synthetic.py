@@ -0,0 +1,53 @@
+"""Synthetic Polygon-style bars for offline benchmarks"""
+import os
+import sys
+
+import numpy as np
+
+# Benchmarks run from the repo root or this directory; make the scripts importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DAY_MS = 86400000
+START_MS = 1_672_722_000_000  # 2023-01-03 05:00 UTC (midnight ET)
+
+def trading_timestamps(n_days, start_ms=START_MS):
+    """n_days weekday timestamps in ms, like daily aggregate 't' values"""
+    stamps = []
+    t = start_ms
+    while len(stamps) < n_days:
+        if (t // DAY_MS + 3) % 7 < 5:  # 1970-01-01 was a Thursday (weekday 3)
+            stamps.append(t)
+        t += DAY_MS
+    return np.array(stamps, dtype=np.int64)
+
+def random_walk_closes(rng, n_days, n_symbols):
+    """dates x symbols geometric random walk with per-symbol drift/volatility"""
+    drift = rng.normal(0.0003, 0.001, n_symbols)
+    vol = rng.uniform(0.01, 0.05, n_symbols)
+    steps = rng.normal(drift, vol, (n_days, n_symbols))
+    start = rng.uniform(2, 300, n_symbols)
+    return start * np.exp(np.cumsum(steps, axis=0))
+
+def make_universe(n_symbols, n_days=300, seed=0, gap_fraction=0.05):
+    """Return (spy_bars, [(symbol, bars), ...]) with a few missing bars per symbol
+
+    gap_fraction of the symbols miss a handful of random days, which exercises
+    the inner-join alignment in calculate_aligned_returns.
+    """
+    rng = np.random.default_rng(seed)
+    stamps = trading_timestamps(n_days)
+    closes = random_walk_closes(rng, n_days, n_symbols + 1)
+    volumes = rng.integers(0, 5_000_000, (n_days, n_symbols + 1))
+
+    spy_bars = [{'t': int(t), 'c': float(c), 'v': int(v)}
+                for t, c, v in zip(stamps, closes[:, 0], volumes[:, 0])]
+
+    universe = []
+    for j in range(1, n_symbols + 1):
+        keep = np.ones(n_days, dtype=bool)
+        if rng.random() < gap_fraction:
+            keep[rng.choice(n_days, size=rng.integers(1, 10), replace=False)] = False
+        bars = [{'t': int(stamps[i]), 'c': float(closes[i, j]), 'v': int(volumes[i, j])}
+                for i in np.flatnonzero(keep)]
+        universe.append((f"S{j:05d}", bars))
+    return spy_bars, universe
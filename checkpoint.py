@@ -0,0 +1,130 @@
+"""Append-only checkpoint of a full rebuild's fetched bars
+
+The first line is a header with everything needed to finish the run the same
+way (source, date range, ticker universe, SPY bars). Every following line is
+one finished fetch: a ticker's range bars or a grouped day's bars, or null
+when the fetch returned nothing. Lines are buffered and appended (with fsync)
+every `every` records, so a crash loses at most the last batch. A torn last
+line from a killed process is dropped when the file is resumed.
+
+Scoring the whole universe takes well under a second with rs_engine, so only
+fetch results are checkpointed; a resumed run rescores from them.
+
+Only the finished keys are kept in memory. Bars are read back from the file
+when a run is resumed, and each is dropped once get() has handed it out.
+"""
+import json
+import os
+import threading
+
+VERSION = 1
+DEFAULT_PATH = os.path.join('.cache', 'rebuild_checkpoint.jsonl')
+DEFAULT_EVERY = 100
+
+def pack_bars(bars, fields):
+    """Bar dicts as lists of the given fields (None stays None)"""
+    if bars is None:
+        return None
+    return [[bar.get(field) for field in fields] for bar in bars]
+
+def unpack_bars(rows, fields):
+    if rows is None:
+        return None
+    return [dict(zip(fields, row)) for row in rows]
+
+class Checkpoint:
+    """Finished fetches of one rebuild, keyed by ticker or date"""
+
+    def __init__(self, path, header, loaded=None, every=DEFAULT_EVERY):
+        self.path = path
+        self.header = header
+        self.fields = header['fields']
+        self.loaded = loaded if loaded is not None else {}   # Packed bars read back on resume
+        self.done = set(self.loaded)
+        self.every = max(1, every)
+        self.buffer = []
+        self.failed = []   # Keys whose fetch failed this run (retried by --resume)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def start(cls, path, header, every=DEFAULT_EVERY):
+        """Begin a new checkpoint, replacing any previous one"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = dict(header, checkpoint=VERSION)
+        with open(path, 'w') as f:
+            f.write(json.dumps(header, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path, header, every=every)
+
+    @classmethod
+    def resume(cls, path, every=DEFAULT_EVERY):
+        """Reopen a checkpoint, or None if there is no usable one"""
+        if not os.path.exists(path):
+            return None
+        loaded = {}
+        good = 0
+        header = None
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if header is None:
+                    if record.get('checkpoint') != VERSION:
+                        print(f"⚠️  {path} is not a version {VERSION} checkpoint")
+                        return None
+                    header = record
+                else:
+                    loaded[record['k']] = record['b']
+                good += len(line)
+        if header is None:
+            return None
+        # Drop a torn tail so new records start on a clean line
+        if good < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+        return cls(path, header, loaded, every)
+
+    def get(self, key):
+        """Bars of a fetch finished before the resume (handed out once)"""
+        with self.lock:
+            rows = self.loaded.pop(key)
+        return unpack_bars(rows, self.fields)
+
+    def record(self, key, bars):
+        """Add a finished fetch (thread-safe)"""
+        rows = pack_bars(bars, self.fields)
+        line = json.dumps({'k': key, 'b': rows}, separators=(',', ':'))
+        with self.lock:
+            self.done.add(key)
+            self.buffer.append(line)
+            if len(self.buffer) >= self.every:
+                self._write()
+
+    def fail(self, key):
+        with self.lock:
+            self.failed.append(key)
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if not self.buffer:
+            return
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(self.buffer) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.buffer = []
+
+    def remove(self):
+        with self.lock:
+            self.buffer = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
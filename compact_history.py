@@ -0,0 +1,252 @@
+"""Date-keyed compact history format for historical_data.json (format 2)
+
+The legacy file keeps every 5th bar of older history, which the daily update
+then indexed positionally, so "63 days ago" pointed ~250 trading days back.
+Format 2 stores only the closes the RS lookbacks can actually need, keyed by
+trading date:
+
+    f      format version (2)
+    u      last update
+    base   trading date of the rebuild that wrote the file
+    r      trading days of history the rebuild fetched
+    dates  ascending trading dates (YYYY-MM-DD) that have stored values
+    p      trading-day position of each date (base = 0, one per trading day)
+    s      SPY closes aligned with dates
+    n      number of stocks
+    d      per stock: s symbol, n aligned bars up to base, c closes aligned
+           with dates, v volumes aligned with the last len(v) dates
+
+For each lookback L the dates cover positions -L .. -L + horizon, so daily
+updates can run for `horizon` trading days before the next rebuild. The
+newest 20 trading days form the rolling volume window, and each daily update
+appends one date. Closes up to the base are as-of closes (the last close on
+or before that date); appended days hold the raw bar or null.
+
+    python compact_history.py verify historical_data.json rankings.json
+"""
+import argparse
+import json
+from datetime import datetime
+
+import numpy as np
+
+import json_stream
+import rs_engine
+
+FORMAT_VERSION = 2
+ANCHOR_HORIZON = 10   # Trading days of daily updates supported after a rebuild
+WINDOW_DAYS = rs_engine.VOLUME_DAYS
+
+def is_compact(historical):
+    return isinstance(historical, dict) and historical.get('f') == FORMAT_VERSION
+
+def trading_date(timestamp):
+    return datetime.utcfromtimestamp(int(timestamp) / 1000).strftime('%Y-%m-%d')
+
+def forward_fill(closes):
+    """As-of closes: each NaN takes the last non-NaN value above it (per column)"""
+    rows = np.where(~np.isnan(closes), np.arange(len(closes))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return closes[rows, np.arange(closes.shape[1])[None, :]]
+
+def clean(values):
+    """JSON-ready list: NaN becomes null"""
+    return [None if np.isnan(x) else float(x) for x in values]
+
+def build(matrix, horizon=ANCHOR_HORIZON):
+    """Build a format-2 history from an rs_engine matrix dict (rows up to the base date)"""
+    if not 0 <= horizon < min(rs_engine.PERIODS.values()):
+        raise ValueError(f"horizon must be between 0 and {min(rs_engine.PERIODS.values()) - 1}")
+
+    n_dates = len(matrix['calendar'])
+    base = n_dates - 1
+    wanted = set(range(max(base - WINDOW_DAYS + 1, 0), n_dates))
+    for days in rs_engine.PERIODS.values():
+        wanted.update(r for r in range(base - days, base - days + horizon + 1) if 0 <= r <= base)
+    rows = np.array(sorted(wanted), dtype=np.int64)
+    window = rows[rows > base - WINDOW_DAYS]
+
+    filled = forward_fill(matrix['closes'])[rows]
+    counts = (~np.isnan(matrix['closes'])).sum(axis=0)
+
+    stocks = []
+    for col, symbol in enumerate(matrix['symbols']):
+        stocks.append({
+            's': symbol,
+            'n': int(counts[col]),
+            'c': clean(filled[:, col]),
+            'v': [None if np.isnan(matrix['closes'][r, col]) else float(matrix['volumes'][r, col])
+                  for r in window]
+        })
+
+    return {
+        'f': FORMAT_VERSION,
+        'u': datetime.now().isoformat(),
+        'base': trading_date(matrix['calendar'][base]),
+        'r': n_dates,
+        'dates': [trading_date(matrix['calendar'][r]) for r in rows],
+        'p': [int(r - base) for r in rows],
+        's': clean(matrix['benchmark'][rows]),
+        'n': len(stocks),
+        'd': stocks
+    }
+
+def append_day(historical, date, daily_data, benchmark='SPY'):
+    """Add one trading day of grouped bars ({symbol: bar}); re-running a day replaces it"""
+    if date in historical['dates']:
+        if date != historical['dates'][-1]:
+            raise ValueError(f"{date} is older than the newest stored day {historical['dates'][-1]}")
+        drop_last_day(historical)
+
+    historical['dates'].append(date)
+    historical['p'].append(historical['p'][-1] + 1)
+    historical['s'].append(daily_data[benchmark]['c'] if benchmark in daily_data else None)
+    for stock in historical['d']:
+        bar = daily_data.get(stock['s'])
+        stock['c'].append(bar['c'] if bar else None)
+        stock['v'].append(bar.get('v', 0) if bar else None)
+        # Keep the rolling volume window at 20 trading days
+        del stock['v'][:-WINDOW_DAYS]
+    historical['u'] = datetime.now().isoformat()
+
+def drop_last_day(historical):
+    historical['dates'].pop()
+    historical['p'].pop()
+    historical['s'].pop()
+    for stock in historical['d']:
+        stock['c'].pop()
+        stock['v'].pop()
+
+def as_array(values):
+    return np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+
+def score(historical, date=None):
+    """Score every stock at a stored date (default: newest) by trading-date lookups
+
+    Returns a dict in rs_engine.score_universe() shape. On days after the base,
+    only stocks with a bar that day are valid, as in the daily update.
+    """
+    dates = historical['dates']
+    idx = len(dates) - 1 if date is None else dates.index(date)
+    positions = historical['p']
+    by_position = {p: i for i, p in enumerate(positions)}
+    current_pos = positions[idx]
+    stocks = historical['d']
+
+    closes = np.array([as_array(stock['c']) for stock in stocks]).reshape(len(stocks), len(dates))
+    benchmark = as_array(historical['s'])
+    current = closes[:, idx]
+    current_benchmark = benchmark[idx]
+
+    # Aligned bars so far: bars up to the base plus appended days with a bar
+    appended = (np.array(positions) > 0) & (np.arange(len(dates)) <= idx)
+    bar_count = np.array([stock['n'] for stock in stocks], dtype=np.int64)
+    bar_count += (~np.isnan(closes[:, appended])).sum(axis=1)
+
+    valid = ~np.isnan(current) & (bar_count >= rs_engine.MIN_BARS)
+    if np.isnan(current_benchmark):
+        valid[:] = False
+
+    relative = {}
+    stock_returns = {}
+    for period, days in rs_engine.PERIODS.items():
+        anchor = by_position.get(current_pos - days)
+        if anchor is None:
+            print(f"⚠️  No stored anchor for {period} at {dates[idx]} - run a full rebuild")
+            valid[:] = False
+            old = np.zeros(len(stocks))
+            old_benchmark = 0.0
+        else:
+            old = closes[:, anchor]
+            old_benchmark = benchmark[anchor]
+        has_period = valid & (bar_count > days) & ~np.isnan(old)
+        stock_return = rs_engine.period_return(current, old)
+        benchmark_return = rs_engine.period_return(current_benchmark, old_benchmark)
+        stock_returns[period] = np.where(has_period, stock_return, 0.0)
+        relative[period] = np.where(has_period, stock_return - benchmark_return, 0.0)
+
+    # Average positive volume over the 20 trading days ending at the scored date
+    volumes = np.zeros((len(stocks), WINDOW_DAYS))
+    for row, stock in enumerate(stocks):
+        v = as_array(stock['v'])
+        end = len(v) - (len(dates) - 1 - idx)
+        recent = v[max(end - WINDOW_DAYS, 0):max(end, 0)]
+        volumes[row, :len(recent)] = np.nan_to_num(recent)
+    use = volumes > 0
+    count = use.sum(axis=1)
+    avg_volume = np.where(count > 0, volumes.sum(axis=1) / np.maximum(count, 1), 0.0)
+
+    return {
+        'symbols': [stock['s'] for stock in stocks],
+        'valid': valid,
+        'relative': relative,
+        'stock': stock_returns,
+        'avg_volume': np.where(valid, avg_volume, 0.0),
+        'rs_score': rs_engine.calculate_rs_scores(relative)
+    }
+
+def save(historical, path='historical_data.json'):
+    # Compact separators: the file is read by the daily update, not by people
+    header = {k: v for k, v in historical.items() if k != 'd'}
+    json_stream.write_json(path, header, 'd', historical['d'], indent=None)
+
+def has_gaps(historical):
+    """Per stock: True if it is missing bars on trading days since the history start
+
+    For these stocks the rebuild counts lookbacks in the stock's own bars while
+    this format counts trading days, so their scores legitimately differ.
+    """
+    appended = [i for i, p in enumerate(historical['p']) if p > 0]
+    calendar_days = historical.get('r', 0) + len(appended)
+    return [stock['n'] + sum(stock['c'][i] is not None for i in appended) < calendar_days
+            for stock in historical['d']]
+
+def verify(historical, rankings, tolerance=1e-4):
+    """Compare scores at the newest stored date with a rankings.json for that date
+
+    Returns (divergences, gap_divergences): lists of (symbol, expected rs_score,
+    compact rs_score) for stocks with complete history and for stocks with
+    missing bars.
+    """
+    result = score(historical)
+    scores = {symbol: float(result['rs_score'][col])
+              for col, symbol in enumerate(result['symbols']) if result['valid'][col]}
+    gaps = dict(zip(result['symbols'], has_gaps(historical)))
+    divergences = []
+    gap_divergences = []
+    for row in rankings.get('data', []):
+        got = scores.get(row['symbol'])
+        if got is None or abs(round(got, 4) - row['rs_score']) > tolerance:
+            target = gap_divergences if gaps.get(row['symbol']) else divergences
+            target.append((row['symbol'], row['rs_score'], got))
+    return divergences, gap_divergences
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact (format 2) history tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    check = commands.add_parser('verify', help="Check a compact history against rankings for its newest date")
+    check.add_argument('history_path', nargs='?', default='historical_data.json')
+    check.add_argument('rankings_path', nargs='?', default='rankings.json')
+    args = parser.parse_args()
+
+    with open(args.history_path, 'r') as f:
+        historical = json.load(f)
+    if not is_compact(historical):
+        raise SystemExit(f"❌ {args.history_path} is not a format {FORMAT_VERSION} history")
+    with open(args.rankings_path, 'r') as f:
+        rankings = json.load(f)
+
+    divergences, gap_divergences = verify(historical, rankings)
+    checked = len(rankings.get('data', []))
+    if gap_divergences:
+        print(f"ℹ️  {len(gap_divergences)} stocks with missing bars differ (lookbacks counted "
+              f"by trading date, not by the stock's own bars)")
+    if divergences:
+        print(f"❌ {len(divergences)} of {checked} stocks differ at {historical['dates'][-1]}:")
+        for symbol, want, got in divergences[:20]:
+            print(f"   {symbol:6s} rankings {want} vs compact {got}")
+        raise SystemExit(1)
+    print(f"✅ {checked - len(gap_divergences)} of {checked} stocks match at {historical['dates'][-1]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""On-disk cache of Polygon API responses (SQLite)
+
+Responses are keyed by endpoint URL and query parameters (without the API
+key) and stored zlib-compressed with a per-endpoint TTL:
+
+    grouped daily bars for a past date     until the next market open
+    ticker range ending before today       until the next market open
+    ticker range ending today              RANGE_TTL (or the next open, if sooner)
+    reference tickers pages                TICKERS_TTL
+    live snapshots                         never served again, except offline
+    anything else                          DEFAULT_TTL
+
+Bars are requested split-adjusted, so even a closed day's bars change when
+a split takes effect, which happens at a market open. 404s and responses
+without results (a holiday, or a transient empty answer) are kept for
+EMPTY_TTL at most.
+
+When the cache grows past max_bytes the least recently used entries are
+evicted. In offline mode expired entries are still served and misses never
+touch the network.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from zoneinfo import ZoneInfo
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+DEFAULT_PATH = os.path.join('.cache', 'polygon.sqlite')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+RANGE_TTL = 12 * 3600
+TICKERS_TTL = 24 * 3600
+GROUPED_TODAY_TTL = 15 * 60
+SNAPSHOT_TTL = 0
+DEFAULT_TTL = 3600
+EMPTY_TTL = 15 * 60
+EMPTY_MAX_BYTES = 1024   # Larger bodies are not parsed to check for results
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = (9, 30)
+
+GROUPED_RE = re.compile(r'/v2/aggs/grouped/locale/\w+/market/\w+/(\d{4}-\d{2}-\d{2})$')
+RANGE_RE = re.compile(r'/v2/aggs/ticker/[^/]+/range/\d+/\w+/[^/]+/(\d{4}-\d{2}-\d{2})$')
+
+def offline_miss():
+    """Response returned for a cache miss when the network must not be used"""
+    return CachedResponse(504, b'{"status": "ERROR", "error": "offline cache miss"}')
+
+def cache_key(url, params=None):
+    """Canonical URL with sorted query parameters and the API key removed"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != 'apikey']
+    query += [(k, str(v)) for k, v in (params or {}).items() if k != 'apikey']
+    return f"{parts.path}?{urlencode(sorted(query))}"
+
+def until_next_open(now=None):
+    """Seconds until the next weekday market open (holidays are not skipped, which only expires early)"""
+    now = now or datetime.now(MARKET_TZ)
+    local = now.astimezone(MARKET_TZ)
+    market_open = local.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if market_open <= local:
+        market_open += timedelta(days=1)
+    while market_open.weekday() >= 5:
+        market_open += timedelta(days=1)
+    return (market_open - local).total_seconds()
+
+def endpoint_policy(url, today=None, now=None):
+    """(endpoint name, TTL in seconds) for a request URL"""
+    path = urlsplit(url).path
+    today = today or datetime.now().strftime('%Y-%m-%d')
+
+    match = GROUPED_RE.search(path)
+    if match:
+        return 'grouped', until_next_open(now) if match.group(1) < today else GROUPED_TODAY_TTL
+    match = RANGE_RE.search(path)
+    if match:
+        return 'range', until_next_open(now) if match.group(1) < today else min(RANGE_TTL, until_next_open(now))
+    if path.startswith('/v3/reference/tickers'):
+        return 'tickers', TICKERS_TTL
+    if path.startswith('/v2/snapshot/'):
+        return 'snapshot', SNAPSHOT_TTL
+    return 'other', DEFAULT_TTL
+
+def has_results(content):
+    """False for small bodies without a non-empty 'results' list (large ones are assumed to have them)"""
+    if len(content) > EMPTY_MAX_BYTES:
+        return True
+    try:
+        return bool(json.loads(content).get('results'))
+    except (ValueError, AttributeError):
+        return False
+
+class CachedResponse:
+    """The parts of requests.Response the scripts use, served from the cache"""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'X-Cache': 'HIT'}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+class ResponseCache:
+    """Thread-safe SQLite response store with TTLs and LRU size eviction"""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL
+            )""")
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.db.commit()
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url, params=None):
+        """Cached response for a request, or None on a miss / expired entry"""
+        key = cache_key(url, params)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute('SELECT status, body, expires FROM responses WHERE key = ?',
+                                  (key,)).fetchone()
+            if row is None or (not self.offline and row[2] is not None and row[2] < now):
+                self.misses += 1
+                return None
+            self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self.db.commit()
+            self.hits += 1
+        return CachedResponse(row[0], zlib.decompress(row[1]))
+
+    def put(self, url, params, status, content):
+        """Store a response according to its endpoint's TTL"""
+        endpoint, ttl = endpoint_policy(url)
+        if status != 200 or not has_results(content):
+            ttl = min(ttl, EMPTY_TTL)
+        key = cache_key(url, params)
+        body = zlib.compress(content, 6)
+        now = time.time()
+        expires = now + ttl
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (key, endpoint, status, body, len(body), now, expires, now))
+            self.db.commit()
+            self.total_bytes += len(body)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self.total_bytes = total
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are 10% under the limit
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self.db.executemany('DELETE FROM responses WHERE key = ?', doomed)
+        self.db.commit()
+        self.total_bytes = total - freed
+
+    def purge_expired(self):
+        with self.lock:
+            cursor = self.db.execute('DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?',
+                                     (time.time(),))
+            self.db.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT endpoint, COUNT(*), COALESCE(SUM(size), 0) FROM responses GROUP BY endpoint'
+            ).fetchall()
+        return {endpoint: {'entries': count, 'bytes': size} for endpoint, count, size in rows}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def add_cache_arguments(parser):
+    """--cache / --cache-max-mb / --offline options shared by both scripts"""
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_PATH, default=os.environ.get('POLYGON_CACHE'),
+                        help=f"Cache API responses in this SQLite file (default when given: {DEFAULT_PATH}; "
+                             "or $POLYGON_CACHE)")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="Evict least recently used responses past this size")
+    parser.add_argument('--offline', action='store_true',
+                        help="Serve everything from the cache (expired entries included), never the network")
+
+def cache_from_args(args):
+    """ResponseCache for parsed add_cache_arguments() options, or None"""
+    path = args.cache or (DEFAULT_PATH if args.offline else None)
+    if not path:
+        return None
+    cache = ResponseCache(path, max_bytes=args.cache_max_mb * 1024 ** 2, offline=args.offline)
+    print(f"Response cache: {path}{' (offline)' if args.offline else ''}")
+    return cache
@@ -0,0 +1,225 @@
+"""Run instrumentation: stage timings, counters and latency histograms
+
+Both scripts record into the process-wide `metrics` and write a report at
+the end of every run (including failed ones):
+
+    metrics.stage('fetch')              ends the previous stage, starts 'fetch'
+    with metrics.span('align'):         timed block, summed per name
+    metrics.count('http_429')           counters (floats allowed: seconds waited)
+    metrics.observe('grouped', secs)    latency sample of an endpoint
+
+run_report.json holds the full report; one summary line per run is appended
+to run_reports.jsonl so stage times can be compared across runs:
+
+    python instrumentation.py show [run_report.json]
+    python instrumentation.py history [run_reports.jsonl] [--runs 10]
+
+PolygonClient counts requests, retries, 404/429/5xx responses, connection
+errors, cache hits and the seconds spent waiting on the rate limiter or
+backing off, and times every network request per endpoint (range, grouped,
+tickers, snapshot).
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_VERSION = 1
+REPORT_PATH = 'run_report.json'
+LOG_PATH = 'run_reports.jsonl'
+# Latency histogram bucket upper bounds in milliseconds (the last bucket is open)
+BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+def latency_summary(samples):
+    """count, mean/percentiles/max in ms and bucket counts of latency samples (seconds)"""
+    ms = sorted(s * 1000 for s in samples)
+    buckets = [0] * (len(BUCKETS_MS) + 1)
+    bound = 0
+    for value in ms:
+        while bound < len(BUCKETS_MS) and value > BUCKETS_MS[bound]:
+            bound += 1
+        buckets[bound] += 1
+    return {
+        'count': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 2) if ms else 0.0,
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p90_ms': round(percentile(ms, 90), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'max_ms': round(ms[-1], 2) if ms else 0.0,
+        'buckets_ms': [[le, n] for le, n in zip(BUCKETS_MS + [None], buckets)]
+    }
+
+class Metrics:
+    """Thread-safe collector for one run"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, script=None):
+        self.script = script
+        self.started = datetime.now()
+        self.clock = time.perf_counter()
+        self.lock = threading.Lock()
+        self.stages = []
+        self.current = None
+        self.spans = {}
+        self.counters = {}
+        self.latency = {}
+        self.info = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.clock
+
+    def stage(self, name=None):
+        """End the running stage and start `name` (None just ends it)"""
+        now = self.elapsed()
+        if self.current is not None:
+            stage_name, start = self.current
+            self.stages.append({'name': stage_name, 'start': round(start, 3), 'seconds': round(now - start, 3)})
+        self.current = (name, now) if name else None
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, {'count': 0, 'seconds': 0.0, 'max': 0.0})
+            span['count'] += 1
+            span['seconds'] += seconds
+            span['max'] = max(span['max'], seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.latency.setdefault(name, []).append(seconds)
+
+    def set(self, **info):
+        self.info.update(info)
+
+    def report(self):
+        with self.lock:
+            counters = {name: round(value, 3) if isinstance(value, float) else value
+                        for name, value in sorted(self.counters.items())}
+            spans = {name: {'count': span['count'], 'seconds': round(span['seconds'], 3),
+                            'max': round(span['max'], 3)} for name, span in sorted(self.spans.items())}
+            latency = {name: latency_summary(samples) for name, samples in sorted(self.latency.items())}
+        return {
+            'version': REPORT_VERSION,
+            'script': self.script,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(self.elapsed(), 3),
+            'stages': list(self.stages),
+            'spans': spans,
+            'counters': counters,
+            'latency': latency,
+            'info': self.info
+        }
+
+    def finish(self, path=REPORT_PATH, log_path=LOG_PATH):
+        """Close the running stage, write the report and append its summary; returns the report"""
+        self.stage(None)
+        report = self.report()
+        if path:
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(report, f, indent=2)
+            os.replace(tmp, path)
+        if log_path:
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(summary_line(report), separators=(',', ':')) + '\n')
+        print_summary(report)
+        return report
+
+def summary_line(report):
+    """The part of a report kept in the run log"""
+    stages = {}
+    for stage in report['stages']:
+        stages[stage['name']] = round(stages.get(stage['name'], 0) + stage['seconds'], 3)
+    return {'script': report['script'], 'started': report['started'], 'seconds': report['seconds'],
+            'stages': stages, 'counters': report['counters'], 'info': report['info']}
+
+def print_summary(report):
+    stages = ' | '.join(f"{stage['name']} {stage['seconds']:.1f}s" for stage in report['stages'])
+    print(f"\n⏱️  {report['seconds']:.1f}s total: {stages or 'no stages'}")
+    counters = report['counters']
+    if counters:
+        print("   " + ', '.join(f"{name} {value:g}" for name, value in counters.items()))
+    for name, summary in report['latency'].items():
+        print(f"   {name}: {summary['count']} requests, p50 {summary['p50_ms']:.0f} ms, "
+              f"p99 {summary['p99_ms']:.0f} ms, max {summary['max_ms']:.0f} ms")
+
+def read_log(path=LOG_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_history(entries, runs=10):
+    """Stage seconds of the last runs per script, with the change against the run before"""
+    for script in sorted({entry['script'] for entry in entries}, key=str):
+        recent = [entry for entry in entries if entry['script'] == script][-runs:]
+        stages = list(dict.fromkeys(name for entry in recent for name in entry['stages']))
+        print(f"\n{script}: last {len(recent)} runs")
+        print(f"{'started':19s} | {'total':>8s} | " + ' | '.join(f"{name:>8s}" for name in stages))
+        for entry in recent:
+            cells = [f"{entry['stages'][name]:7.1f}s" if name in entry['stages'] else f"{'-':>8s}"
+                     for name in stages]
+            print(f"{entry['started']:19s} | {entry['seconds']:7.1f}s | " + ' | '.join(cells))
+        if len(recent) > 1 and recent[-2]['seconds']:
+            change = (recent[-1]['seconds'] / recent[-2]['seconds'] - 1) * 100
+            print(f"{'📈' if change > 10 else '📉' if change < -10 else '➡️ '} latest run {change:+.0f}% vs the one before")
+
+def add_report_arguments(parser):
+    """--report / --report-log options shared by both scripts"""
+    parser.add_argument('--report', default=REPORT_PATH,
+                        help=f"Write the run report (stage timings, counters, latencies) here "
+                             f"(default: {REPORT_PATH}; '' to skip)")
+    parser.add_argument('--report-log', default=LOG_PATH,
+                        help=f"Append a one-line summary of the run here (default: {LOG_PATH}; '' to skip)")
+
+# Process-wide collector used by the scripts and PolygonClient
+metrics = Metrics()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run report tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help="Summarize a run report")
+    show.add_argument('path', nargs='?', default=REPORT_PATH)
+    history = commands.add_parser('history', help="Stage times of recent runs from the run log")
+    history.add_argument('path', nargs='?', default=LOG_PATH)
+    history.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        with open(args.path) as f:
+            report = json.load(f)
+        print(f"{report['script']} started {report['started']}")
+        print_summary(report)
+        for name, span in report['spans'].items():
+            print(f"   span {name}: {span['count']}x, {span['seconds']:.2f}s (max {span['max']:.3f}s)")
+    else:
+        entries = read_log(args.path)
+        if not entries:
+            raise SystemExit(f"❌ No runs in {args.path}")
+        print_history(entries, args.runs)
+
+if __name__ == "__main__":
+    main()
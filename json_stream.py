@@ -0,0 +1,208 @@
+"""Streaming read/write of JSON documents built around one large array
+
+rankings.json ('data') and historical_data.json ('d') are an object of a few
+small header fields plus one array with a record per symbol. These helpers
+parse and write such documents one record at a time, so memory is bounded by
+a single record instead of the whole file (for writes, when the records come
+from a generator, as the scripts' rankings rows do):
+
+    iter_array(path, 'd')           records of the top-level array 'd'
+    read_fields(path, skip='d')     every other top-level field
+    write_json(path, header, 'd', records, indent=2)
+    write_ndjson(path, header, records) / iter_ndjson(path)
+
+write_json() output is byte-identical to json.dump() with the same indent (or
+compact separators when indent is None) for a dict whose array key comes last.
+"""
+import json
+import os
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+class _Scanner:
+    """Incremental tokenizer over a text file, refilled in chunks"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.pos > self.chunk_size:
+            # Drop consumed text so the buffer never grows with the file
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+        return bool(chunk)
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or '' at end of file"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A value not yet followed by a delimiter may be cut short (12 of 12.5)
+                if self.eof or (end < len(self.buf) and self.buf[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """Iterate the keys of the top-level object, leaving the scanner at each value
+
+        The caller must consume the value (value() or elements()) before advancing.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+    def elements(self):
+        """Yield the elements of the array at the current position one at a time"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+def iter_array(path, key):
+    """Yield the records of a top-level array field without loading the file"""
+    with open(path, 'r') as f:
+        scanner = _Scanner(f)
+        for name in scanner.items():
+            if name == key:
+                yield from scanner.elements()
+                return
+            scanner.value()
+
+def read_fields(path, skip):
+    """Every top-level field except the array `skip`, which is scanned record by record"""
+    fields = {}
+    with open(path, 'r') as f:
+        scanner = _Scanner(f)
+        for name in scanner.items():
+            if name == skip and scanner.peek() == '[':
+                for _ in scanner.elements():
+                    pass
+            else:
+                fields[name] = scanner.value()
+    return fields
+
+def load(path, key):
+    """json.load() equivalent that parses the array `key` incrementally, in one pass
+
+    The result holds every record, so memory is that of the whole document;
+    use iter_array() and read_fields() when the records can be consumed as they
+    are parsed.
+    """
+    document = {}
+    with open(path, 'r') as f:
+        scanner = _Scanner(f)
+        for name in scanner.items():
+            if name == key and scanner.peek() == '[':
+                document[name] = list(scanner.elements())
+            else:
+                document[name] = scanner.value()
+    return document
+
+def _encode(value, indent, level):
+    """json.dumps(value, indent=indent) nested `level` deep, with a fast path for flat dicts"""
+    pad = ' ' * (indent * (level + 1))
+    if isinstance(value, dict) and not any(isinstance(v, (dict, list)) for v in value.values()):
+        if not value:
+            return '{}'
+        inner = ',\n'.join(f"{pad}{json.dumps(str(k))}: {json.dumps(v)}" for k, v in value.items())
+        return '{\n' + inner + '\n' + ' ' * (indent * level) + '}'
+    return json.dumps(value, indent=indent).replace('\n', '\n' + ' ' * (indent * level))
+
+def write_json(path, header, key, records, indent=2):
+    """Write {**header, key: [records...]} streaming the records; returns the record count
+
+    Written to a temporary file and renamed into place, so readers never see
+    a partial document.
+    """
+    tmp = path + '.tmp'
+    count = 0
+    with open(tmp, 'w') as f:
+        if indent is None:
+            head = json.dumps(dict(header, **{key: []}), separators=(',', ':'))
+            f.write(head[:-2])
+            for record in records:
+                f.write(',' if count else '')
+                f.write(json.dumps(record, separators=(',', ':')))
+                count += 1
+            f.write(']}')
+        else:
+            pad = ' ' * indent
+            head = json.dumps(dict(header, **{key: None}), indent=indent)
+            f.write(head[:-len('null\n}')])
+            for record in records:
+                f.write(',\n' if count else '[\n')
+                f.write(pad * 2 + _encode(record, indent, 2))
+                count += 1
+            f.write(f"\n{pad}]\n}}" if count else '[]\n}')
+    os.replace(tmp, path)
+    return count
+
+def write_ndjson(path, header, records):
+    """Header object on the first line, then one record per line; returns the record count"""
+    tmp = path + '.tmp'
+    count = 0
+    with open(tmp, 'w') as f:
+        f.write(json.dumps(header, separators=(',', ':')) + '\n')
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+def iter_ndjson(path):
+    """(header, record iterator) of an NDJSON file written by write_ndjson()"""
+    f = open(path, 'r')
+    header = json.loads(f.readline())
+
+    def records():
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return header, records()
@@ -0,0 +1,146 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import endpoint_policy, offline_miss
+from instrumentation import metrics
+
+API_KEY = os.environ.get('POLYGON_API_KEY')
+BASE_URL = os.environ.get('POLYGON_BASE_URL', "https://api.polygon.io")
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker of a client"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            metrics.count('rate_limit_wait_s', wait)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while (all workers back off together)"""
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            # Restart from an empty bucket so workers don't burst after the pause
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+class PolygonClient:
+    """Shared HTTP session with rate limiting, 429 backoff and a worker pool"""
+
+    def __init__(self, api_key=API_KEY, base_url=BASE_URL, requests_per_second=5,
+                 max_workers=8, max_retries=6, timeout=30, cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = TokenBucket(requests_per_second)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, params=None):
+        """GET a Polygon URL, retrying 429s and connection errors with backoff
+
+        Served from the response cache when one is attached. Returns the final
+        response (which may still be a 429 once retries run out).
+        """
+        if not url.startswith('http'):
+            url = f"{self.base_url}{url}"
+        params = dict(params or {})
+        
+        if self.cache is not None:
+            cached = self.cache.get(url, params)
+            if cached is not None:
+                metrics.count('cache_hits')
+                return cached
+            metrics.count('cache_misses')
+            if self.cache.offline:
+                return offline_miss()
+        
+        response = self._fetch(url, dict(params, apikey=self.api_key))
+        # 404s are cached briefly too (EMPTY_TTL), so a re-run does not ask again
+        if self.cache is not None and response.status_code in (200, 404):
+            self.cache.put(url, params, response.status_code, response.content)
+        return response
+
+    def _fetch(self, url, params):
+        """Network GET with rate limiting and retries"""
+        endpoint = endpoint_policy(url)[0]
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            if attempt:
+                metrics.count('retries')
+            metrics.count('requests')
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.count('connection_errors')
+                if attempt == self.max_retries:
+                    raise
+                metrics.count('backoff_s', delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            metrics.observe(endpoint, time.perf_counter() - start)
+
+            if response.status_code != 429:
+                if response.status_code == 404:
+                    metrics.count('http_404')
+                elif response.status_code >= 500:
+                    metrics.count('http_5xx')
+                return response
+            metrics.count('http_429')
+
+            # Honour Retry-After when the API sends it, otherwise back off exponentially
+            retry_after = response.headers.get('Retry-After')
+            try:
+                wait = float(retry_after)
+            except (TypeError, ValueError):
+                wait = delay + random.uniform(0, delay / 2)
+            metrics.count('backoff_s', wait)
+            self.limiter.pause(wait)
+            delay = min(delay * 2, 60)
+
+        return response
+
+    def map(self, fn, items):
+        """Apply fn to every item on the worker pool, yielding results in input order"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(fn, items)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
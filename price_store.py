@@ -0,0 +1,413 @@
+"""Columnar, memory-mapped daily price store
+
+Layout of a store directory:
+
+    meta.json     version, benchmark symbol, secondary benchmarks, row count,
+                  last update
+    symbols.json  column order (the symbol index)
+    dates.i64     int64 bar timestamps in ms, one per row (shared date axis)
+    close.f32     float32 closes, rows x symbols, NaN where a symbol has no bar
+    volume.u64    uint64 volumes, rows x symbols
+
+Rows are dates, so appending a trading day writes one contiguous row to the
+end of each file. Opening a store maps the files without reading them.
+Rewriting a whole store (rebuild, trim) builds it in a sibling `<path>.new`
+directory and swaps it in, so a crash leaves either the old or the new store.
+
+Convert from / export to the historical_data.json format with:
+
+    python price_store.py convert historical_data.json price_store
+    python price_store.py export price_store historical_data.json
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+import compact_history
+import json_stream
+import rs_engine
+
+STORE_VERSION = 1
+DEFAULT_PATH = 'price_store'
+BENCHMARK = 'SPY'
+RECENT_VOLUME_BARS = 30  # Bars per symbol exported with volume (same as the rebuild)
+
+class PriceStore:
+    """A dates x symbols price store opened with np.memmap"""
+
+    def __init__(self, path=DEFAULT_PATH, mode='r'):
+        self.path = path
+        self.mode = mode
+        self._recover(path)
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported price store version: {self.meta.get('version')}")
+        with open(os.path.join(path, 'symbols.json'), 'r') as f:
+            self.symbols = json.load(f)
+        self.index = {symbol: col for col, symbol in enumerate(self.symbols)}
+        self._map()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self):
+        rows = self.meta['rows']
+        width = len(self.symbols)
+        memmap_mode = 'r+' if self.mode == 'r+' else 'r'
+        if rows == 0:
+            self.dates = np.empty(0, dtype=np.int64)
+            self.closes = np.empty((0, width), dtype=np.float32)
+            self.volumes = np.empty((0, width), dtype=np.uint64)
+            return
+        self.dates = np.memmap(self._file('dates.i64'), dtype=np.int64, mode=memmap_mode, shape=(rows,))
+        self.closes = np.memmap(self._file('close.f32'), dtype=np.float32, mode=memmap_mode,
+                                shape=(rows, width))
+        self.volumes = np.memmap(self._file('volume.u64'), dtype=np.uint64, mode=memmap_mode,
+                                 shape=(rows, width))
+
+    @classmethod
+    def create(cls, path, symbols, dates, closes, volumes, benchmark=BENCHMARK, meta=None):
+        """Write a new store (replacing any existing one) and open it for appends
+
+        meta holds extra meta.json keys (secondary benchmarks, adjustments, ...).
+        The store is written to a sibling directory, meta.json last, and
+        swapped in; whatever else was in the old directory (the rolling RS
+        state derived from the old bars) goes with it.
+        """
+        path = os.path.normpath(path)
+        closes = np.asarray(closes, dtype=np.float32).reshape(len(dates), len(symbols))
+        volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64)).reshape(len(dates), len(symbols))
+
+        new = path + '.new'
+        if os.path.exists(new):
+            shutil.rmtree(new)
+        os.makedirs(new)
+        _write_file(os.path.join(new, 'dates.i64'), np.asarray(dates, dtype=np.int64))
+        _write_file(os.path.join(new, 'close.f32'), closes)
+        _write_file(os.path.join(new, 'volume.u64'), volumes.astype(np.uint64))
+        with open(os.path.join(new, 'symbols.json'), 'w') as f:
+            json.dump(list(symbols), f)
+        cls._write_meta(new, dict(meta or {},
+                                  version=STORE_VERSION,
+                                  benchmark=benchmark,
+                                  rows=len(dates),
+                                  updated=datetime.now().isoformat()))
+        cls._swap_in(path, new)
+        return cls(path, mode='r+')
+
+    @staticmethod
+    def _swap_in(path, new):
+        """Replace the store directory with a complete one built next to it"""
+        old = path + '.old'
+        if os.path.exists(old):
+            shutil.rmtree(old)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(new, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @staticmethod
+    def _recover(path):
+        """Finish a swap a crash interrupted between its two renames"""
+        path = os.path.normpath(path)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            return
+        # A .new store is complete once it has meta.json; otherwise the old one is put back
+        for candidate in (path + '.new', path + '.old'):
+            if os.path.exists(os.path.join(candidate, 'meta.json')):
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+                os.replace(candidate, path)
+                shutil.rmtree(path + '.old', ignore_errors=True)
+                return
+
+    @staticmethod
+    def _write_meta(path, meta):
+        # Write then rename so a crash never leaves a half-written row count
+        tmp = os.path.join(path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    @staticmethod
+    def exists(path=DEFAULT_PATH):
+        PriceStore._recover(path)
+        return os.path.exists(os.path.join(path, 'meta.json'))
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    @property
+    def benchmark(self):
+        return self.meta.get('benchmark', BENCHMARK)
+
+    def last_date(self):
+        """Trading date (YYYY-MM-DD) of the newest row, or None"""
+        if self.rows == 0:
+            return None
+        return datetime.utcfromtimestamp(int(self.dates[-1]) / 1000).strftime('%Y-%m-%d')
+
+    def append_day(self, timestamp, bars_by_symbol):
+        """Append one trading day from {symbol: bar} (grouped-daily results)
+
+        Symbols not in the index are ignored; a row for a date already stored
+        as the last row replaces it, so re-running a day is idempotent.
+        Returns True if a new row was added, False if the last row was replaced.
+        """
+        if self.mode != 'r+':
+            raise ValueError("Price store opened read-only")
+
+        closes = np.full(len(self.symbols), np.nan, dtype=np.float32)
+        volumes = np.zeros(len(self.symbols), dtype=np.uint64)
+        for symbol, bar in bars_by_symbol.items():
+            col = self.index.get(symbol)
+            if col is not None and bar.get('c') is not None:
+                closes[col] = bar['c']
+                volumes[col] = max(int(bar.get('v', 0)), 0)
+
+        appended = not (self.rows and same_day(int(self.dates[-1]), timestamp))
+        if not appended:
+            self.dates[-1] = timestamp
+            self.closes[-1] = closes
+            self.volumes[-1] = volumes
+            self._flush()
+        else:
+            self._write_row((('dates.i64', np.array([timestamp], dtype=np.int64)),
+                             ('close.f32', closes), ('volume.u64', volumes)))
+            self.meta['rows'] += 1
+
+        # The row count is only bumped once every file holds the row
+        self.meta['updated'] = datetime.now().isoformat()
+        self._write_meta(self.path, self.meta)
+        self._map()
+        return appended
+
+    def _write_row(self, parts):
+        """Write [(file name, row values)] at the row meta.json counts next, cutting off anything past it
+
+        A run killed between these writes and the meta update leaves orphan
+        rows past meta's row count; writing at the offset instead of
+        appending keeps the next day from landing behind them.
+        """
+        for name, values in parts:
+            data = values.tobytes()
+            with open(self._file(name), 'r+b') as f:
+                f.seek(self.rows * len(data))
+                f.write(data)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+    def trim(self, keep_rows):
+        """Drop all but the newest keep_rows rows (rewrites the store, meta.json keys kept)"""
+        if self.rows <= keep_rows:
+            return
+        dates = np.array(self.dates[-keep_rows:])
+        closes = np.array(self.closes[-keep_rows:])
+        volumes = np.array(self.volumes[-keep_rows:])
+        self._release()
+        trimmed = PriceStore.create(self.path, self.symbols, dates, closes, volumes, self.benchmark, self.meta)
+        self.meta = trimmed.meta
+        self._map()
+
+    def _flush(self):
+        for array in (self.dates, self.closes, self.volumes):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def _release(self):
+        self._flush()
+        self.dates = self.closes = self.volumes = None
+
+    @property
+    def secondary(self):
+        """Secondary benchmark symbols stored alongside the stocks"""
+        return self.meta.get('secondary', [])
+
+    def scored_columns(self):
+        """Columns of the ranked stocks: everything but the benchmark (unless the
+        rebuild ranked it) and secondary benchmarks kept only as benchmarks"""
+        skip = set(self.meta.get('unscored', []))
+        if not self.meta.get('benchmark_scored'):
+            skip.add(self.benchmark)
+        return [col for col, symbol in enumerate(self.symbols) if symbol not in skip]
+
+    def matrix(self, rows=None):
+        """rs_engine matrix dict for the newest rows (all rows by default)
+
+        The benchmark column becomes the benchmark series and the calendar;
+        the scored_columns() are the scored symbols. Secondary benchmarks are
+        in 'secondary' as {symbol: closes} with gaps carried forward.
+        """
+        start = 0 if rows is None else max(self.rows - rows, 0)
+        bench_col = self.index[self.benchmark]
+        cols = self.scored_columns()
+
+        closes = np.asarray(self.closes[start:], dtype=np.float64)
+        volumes = np.asarray(self.volumes[start:], dtype=np.float64)
+        symbol_closes = closes[:, cols]
+        # Days without a benchmark close drop out, as in the inner join
+        symbol_closes[np.isnan(closes[:, bench_col])] = np.nan
+        return {
+            'calendar': np.array(self.dates[start:]),
+            'benchmark': closes[:, bench_col],
+            'symbols': [self.symbols[col] for col in cols],
+            'bar_counts': (~np.isnan(symbol_closes)).sum(axis=0),
+            'closes': symbol_closes,
+            'volumes': volumes[:, cols],
+            'secondary': {symbol: rs_engine.fill_forward(closes[:, self.index[symbol]])
+                          for symbol in self.secondary}
+        }
+
+def _write_file(path, array):
+    with open(path, 'wb') as f:
+        np.ascontiguousarray(array).tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+def same_day(ts_a, ts_b):
+    """True when two bar timestamps (ms) fall on the same UTC date"""
+    return ts_a // 86400000 == ts_b // 86400000
+
+def from_matrix(path, matrix, benchmark=BENCHMARK, secondary=None):
+    """Create a store from an rs_engine matrix dict (benchmark stored as column 0)
+
+    When the benchmark is also one of the scored symbols it is stored once and
+    flagged in meta.json so matrix() keeps scoring it. secondary maps other
+    benchmark symbols to (closes, volumes) on the calendar; those not among
+    the scored symbols get their own unscored columns.
+    """
+    n_dates = len(matrix['calendar'])
+    symbols = list(matrix['symbols'])
+    secondary = secondary or {}
+    keep = [col for col, symbol in enumerate(symbols) if symbol != benchmark]
+    benchmark_volumes = matrix.get('benchmark_volumes', np.zeros(n_dates))
+    unscored = [symbol for symbol in secondary if symbol not in symbols and symbol != benchmark]
+
+    closes = np.column_stack([matrix['benchmark'], matrix['closes'][:, keep]] +
+                             [secondary[symbol][0] for symbol in unscored])
+    volumes = np.column_stack([benchmark_volumes, matrix['volumes'][:, keep]] +
+                              [secondary[symbol][1] for symbol in unscored])
+    meta = {}
+    if len(keep) != len(symbols):
+        meta['benchmark_scored'] = True
+    if secondary:
+        meta['secondary'] = list(secondary)
+        meta['unscored'] = unscored
+    return PriceStore.create(path, [benchmark] + [symbols[col] for col in keep] + unscored,
+                             matrix['calendar'], closes, volumes, benchmark, meta)
+
+def convert_json(json_path, store_path, benchmark=BENCHMARK):
+    """Build a store from a historical_data.json file ('s' = SPY bars, 'd' = stocks)
+
+    Streams the stock records twice (date axis, then columns), so memory holds
+    the store arrays and one stock at a time rather than the parsed file.
+    """
+    spy = json_stream.read_fields(json_path, skip='d').get('s', [])
+
+    # The JSON keeps every 5th bar per symbol, so symbols with gaps sample
+    # different days than SPY: the date axis is the union of all timestamps
+    timestamps = {bar['t'] for bar in spy}
+    symbols = []
+    n_records = 0
+    for stock in json_stream.iter_array(json_path, 'd'):
+        n_records += 1
+        if stock['s'] != benchmark:
+            symbols.append(stock['s'])
+            timestamps.update(bar['t'] for bar in stock.get('h', []))
+    calendar = np.array(sorted(timestamps), dtype=np.int64)
+
+    closes = np.full((len(calendar), len(symbols) + 1), np.nan, dtype=np.float32)
+    volumes = np.zeros((len(calendar), len(symbols) + 1), dtype=np.uint64)
+    closes[:, 0], volumes[:, 0] = rs_engine.align_bars(calendar, spy)
+    col = 1
+    for stock in json_stream.iter_array(json_path, 'd'):
+        if stock['s'] != benchmark:
+            closes[:, col], volumes[:, col] = rs_engine.align_bars(calendar, stock.get('h', []))
+            col += 1
+
+    meta = {'benchmark_scored': True} if len(symbols) != n_records else {}
+    return PriceStore.create(store_path, [benchmark] + symbols, calendar, closes, volumes, benchmark, meta)
+
+def column_bars(dates, closes, volumes, recent_volume_bars=RECENT_VOLUME_BARS):
+    """One column as historical_data.json bars; only the newest bars carry volume"""
+    rows = np.flatnonzero(~np.isnan(closes))
+    bars = []
+    for i, row in enumerate(rows):
+        # str() of a float32 is its shortest round-trip repr (e.g. 12.34, not 12.34000015)
+        bar = {'t': int(dates[row]), 'c': float(str(closes[row]))}
+        if i >= len(rows) - recent_volume_bars:
+            bar['v'] = int(volumes[row])
+        bars.append(bar)
+    return bars
+
+def export_json(store, json_path):
+    """Write a store back out in the historical_data.json format; returns the stock count
+
+    Stock records are built column by column as they are written.
+    """
+    dates = np.array(store.dates)
+    bench_col = store.index[store.benchmark]
+    now = datetime.now().isoformat()
+    columns = store.scored_columns()
+
+    def stocks():
+        for col in columns:
+            yield {
+                's': store.symbols[col],
+                'h': column_bars(dates, np.array(store.closes[:, col]), np.array(store.volumes[:, col])),
+                'u': now
+            }
+
+    header = {
+        'u': now,
+        's': column_bars(dates, np.array(store.closes[:, bench_col]), np.array(store.volumes[:, bench_col])),
+        'n': len(columns)
+    }
+    return json_stream.write_json(json_path, header, 'd', stocks())
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar price store tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="historical_data.json -> price store")
+    convert.add_argument('json_path', nargs='?', default='historical_data.json')
+    convert.add_argument('store_path', nargs='?', default=DEFAULT_PATH)
+
+    export = commands.add_parser('export', help="price store -> historical_data.json")
+    export.add_argument('store_path', nargs='?', default=DEFAULT_PATH)
+    export.add_argument('json_path', nargs='?', default='historical_data.json')
+    export.add_argument('--compact', action='store_true',
+                        help="Write the date-keyed compact format instead of the legacy bar lists")
+
+    info = commands.add_parser('info', help="Show store dimensions")
+    info.add_argument('store_path', nargs='?', default=DEFAULT_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        store = convert_json(args.json_path, args.store_path)
+        print(f"✅ Converted {len(store.symbols)} symbols x {store.rows} days to '{args.store_path}'")
+    elif args.command == 'export' and args.compact:
+        output = compact_history.build(PriceStore(args.store_path).matrix())
+        compact_history.save(output, args.json_path)
+        print(f"✅ Exported {output['n']} stocks to '{args.json_path}' (compact format)")
+    elif args.command == 'export':
+        count = export_json(PriceStore(args.store_path), args.json_path)
+        print(f"✅ Exported {count} stocks to '{args.json_path}'")
+    else:
+        store = PriceStore(args.store_path)
+        print(f"Symbols: {len(store.symbols)} (benchmark {store.benchmark})")
+        print(f"Days: {store.rows}, last: {store.last_date()}")
+        print(f"Updated: {store.meta.get('updated')}")
+
+if __name__ == "__main__":
+    main()
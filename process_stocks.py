@@ -1,188 +1,232 @@
-import requests
-import json
+import argparse
 import os
-import time
 from datetime import datetime, timedelta
-import pandas as pd
 import numpy as np
 
+import compact_history
+from checkpoint import Checkpoint, DEFAULT_EVERY, DEFAULT_PATH as CHECKPOINT_PATH, pack_bars, unpack_bars
+import http_cache
+from instrumentation import add_report_arguments, metrics
+import json_stream
+import price_store
+import rank_history
+import rankings_artifacts
+import rankings_delta
+import rs_engine
+import rs_parallel
+import splits
+import universe
+from polygon_client import PolygonClient
+
 API_KEY = os.environ.get('POLYGON_API_KEY')
-BASE_URL = "https://api.polygon.io"
+BASE_URL = os.environ.get('POLYGON_BASE_URL', "https://api.polygon.io")
 
-def get_all_tickers():
-    """Get all active US stock tickers"""
-    print("Fetching all active US stock tickers...")
-    url = f"{BASE_URL}/v3/reference/tickers"
-    params = {
-        'market': 'stocks',
-        'active': 'true',
-        'limit': 1000,
-        'apikey': API_KEY
-    }
-    
-    all_tickers = []
-    page_count = 0
-    
-    while True:
-        try:
-            response = requests.get(url, params=params)
-            if response.status_code != 200:
-                print(f"API Error: {response.status_code} - {response.text}")
-                break
-                
-            data = response.json()
-            page_count += 1
-            print(f"Processing page {page_count}...")
-            
-            if 'results' in data:
-                # Filter for US stocks only, exclude complex symbols
-                us_stocks = []
-                for ticker in data['results']:
-                    symbol = ticker.get('ticker', '')
-                    if (ticker.get('market') == 'stocks' and 
-                        ticker.get('locale') == 'us' and
-                        len(symbol) <= 6 and  # Allow 6-character symbols
-                        not symbol.endswith('.') and  # Avoid most preferreds
-                        symbol.replace('.', '').isalnum()):  # Allow numbers in symbols
-                        us_stocks.append(symbol)
-                
-                all_tickers.extend(us_stocks)
-                print(f"Added {len(us_stocks)} tickers, total: {len(all_tickers)}")
-            
-            # Check for next page
-            if 'next_url' not in data:
-                break
-            url = data['next_url'] + f"&apikey={API_KEY}"
-            
-            # Rate limiting - be conservative
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"Error fetching tickers: {e}")
-            break
-    
-    print(f"Found {len(all_tickers)} total US stocks")
-    return all_tickers
+BAR_FIELDS = ('t', 'c', 'v')          # Range bar fields kept in the checkpoint
+GROUPED_FIELDS = ('T', 't', 'c', 'v')
+
+# Named groups for --benchmarks (SPY is always the primary benchmark)
+BENCHMARK_SETS = {
+    'broad': ['QQQ', 'IWM', 'DIA'],
+    'sectors': ['XLB', 'XLC', 'XLE', 'XLF', 'XLI', 'XLK', 'XLP', 'XLRE', 'XLU', 'XLV', 'XLY']
+}
+
+def get_all_tickers(client, universe_path=universe.DEFAULT_PATH, types=universe.RANKED_TYPES, full_refresh=None):
+    """Active US tickers of the ranked security types, from the refreshed universe index"""
+    print("Refreshing the ticker universe...")
+    try:
+        with metrics.span('universe'):
+            return universe.load_tradable(client, BASE_URL, universe_path, types, full_refresh)
+    except Exception as e:
+        print(f"Error fetching tickers: {e}")
+        return []
 
-def get_stock_data(ticker, start_date, end_date):
+def get_stock_data(ticker, start_date, end_date, client):
     """Get historical data for a single stock"""
+    return fetch_stock_data(ticker, start_date, end_date, client)[0]
+
+def fetch_stock_data(ticker, start_date, end_date, client):
+    """(bars or None, final): final is False when the request failed and is worth retrying"""
     url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/day/{start_date}/{end_date}"
-    params = {'apikey': API_KEY}
     
     try:
-        response = requests.get(url, params=params)
+        # The client backs off and retries on 429s before giving up
+        response = client.get(url)
         if response.status_code == 200:
             data = response.json()
             if 'results' in data and len(data['results']) > 200:  # Need sufficient data
-                return data['results']
-        elif response.status_code == 429:  # Rate limited
-            print(f"Rate limited for {ticker}, waiting...")
-            time.sleep(2)
-            return get_stock_data(ticker, start_date, end_date)  # Retry
+                return data['results'], True
+            return None, True
+        elif response.status_code == 429:
+            print(f"Rate limited for {ticker}, retries exhausted")
         else:
-            if response.status_code != 404:  # Don't log 404s (delisted stocks)
-                print(f"Error for {ticker}: {response.status_code}")
+            if response.status_code == 404:  # Don't log 404s (delisted stocks)
+                return None, True
+            print(f"Error for {ticker}: {response.status_code}")
     except Exception as e:
         print(f"Exception for {ticker}: {e}")
     
-    return None
+    return None, False
 
-def get_sp500_benchmark(start_date, end_date):
+def get_sp500_benchmark(start_date, end_date, client):
     """Get S&P 500 benchmark data using SPY ETF"""
     print("Fetching S&P 500 benchmark data...")
-    return get_stock_data('SPY', start_date, end_date)
+    return get_stock_data('SPY', start_date, end_date, client)
 
-def calculate_aligned_returns(stock_prices, sp500_prices):
-    """Calculate stock returns relative to S&P 500 benchmark"""
-    if not stock_prices or not sp500_prices:
-        return None, None, None
-    
-    if len(stock_prices) < 252 or len(sp500_prices) < 252:  # Need at least 1 year
-        return None, None, None
-    
-    # Sort by timestamp
-    stock_prices = sorted(stock_prices, key=lambda x: x['t'])
-    sp500_prices = sorted(sp500_prices, key=lambda x: x['t'])
-    
-    # Create dataframes for alignment
-    stock_df = pd.DataFrame(stock_prices)
-    stock_df['date'] = pd.to_datetime(stock_df['t'], unit='ms')
-    stock_df = stock_df.set_index('date')
-    
-    spy_df = pd.DataFrame(sp500_prices)
-    spy_df['date'] = pd.to_datetime(spy_df['t'], unit='ms')
-    spy_df = spy_df.set_index('date')
-    
-    # Align dates (only trading days where both have data)
-    aligned = stock_df.join(spy_df, rsuffix='_spy', how='inner')
-    
-    if len(aligned) < 252:  # Need sufficient aligned data
-        return None, None, None
-    
-    # Get current prices
-    current_stock = aligned['c'].iloc[-1]
-    current_spy = aligned['c_spy'].iloc[-1]
-    
-    # Calculate returns for IBD periods
-    periods = {
-        '3m': 63,   # ~3 months
-        '6m': 126,  # ~6 months  
-        '9m': 189,  # ~9 months
-        '12m': 252  # ~12 months
-    }
+def parse_benchmarks(text):
+    """Secondary benchmark symbols from 'QQQ,IWM,sectors' (set names expand)"""
+    symbols = []
+    for item in (text or '').split(','):
+        item = item.strip()
+        for symbol in BENCHMARK_SETS.get(item.lower(), [item.upper()] if item else []):
+            if symbol != 'SPY' and symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
+
+def get_grouped_daily(date, client):
+    """Get every US stock's bar for one trading day (one request)"""
+    return fetch_grouped_daily(date, client)[0]
+
+def fetch_grouped_daily(date, client):
+    """(bars, final): final is False when the request failed and is worth retrying"""
+    url = f"{BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/{date}"
     
-    stock_returns = {}
-    relative_returns = {}
-    
-    for period, days in periods.items():
-        if len(aligned) > days:
-            # Stock return
-            old_stock = aligned['c'].iloc[-(days+1)]
-            if old_stock > 0:
-                stock_return = (current_stock - old_stock) / old_stock
-            else:
-                stock_return = 0
-            
-            # S&P 500 return
-            old_spy = aligned['c_spy'].iloc[-(days+1)]
-            if old_spy > 0:
-                spy_return = (current_spy - old_spy) / old_spy
-            else:
-                spy_return = 0
-            
-            # Relative performance (stock return - benchmark return)
-            relative_return = stock_return - spy_return
-            
-            stock_returns[period] = stock_return
-            relative_returns[period] = relative_return
-        else:
-            stock_returns[period] = 0
-            relative_returns[period] = 0
+    try:
+        response = client.get(url, params={'adjusted': 'true'})
+        if response.status_code == 200:
+            return response.json().get('results', []), True
+        print(f"Error for grouped daily {date}: {response.status_code}")
+    except Exception as e:
+        print(f"Exception for grouped daily {date}: {e}")
     
-    # Calculate average volume (last 20 days)
-    recent_volumes = [float(p['v']) for p in stock_prices[-20:] if p['v'] > 0]
-    avg_volume = sum(recent_volumes) / len(recent_volumes) if recent_volumes else 0
+    return [], False
+
+def fetch_liquidity(dates, client):
+    """{symbol: (last close, median daily dollar volume)} from grouped-daily snapshots
     
-    return relative_returns, stock_returns, avg_volume
+    Days a symbol did not trade count as zero dollar volume.
+    """
+    days = [results for results in client.map(lambda date: get_grouped_daily(date, client), dates) if results]
+    dollar_volume = {}
+    last_close = {}
+    for row, results in enumerate(days):
+        for bar in results:
+            symbol = bar.get('T')
+            if 'c' not in bar:
+                continue
+            dollar_volume.setdefault(symbol, np.zeros(len(days)))[row] = bar['c'] * bar.get('v', 0)
+            last_close[symbol] = bar['c']
+    return {symbol: (last_close[symbol], float(np.median(values))) for symbol, values in dollar_volume.items()}
+
+def select_liquid(tickers, liquidity, max_tickers=None, min_price=0.0, min_dollar_volume=0.0):
+    """The most liquid tickers passing the price and dollar volume floors, in their original order"""
+    passing = [t for t in tickers if t in liquidity
+               and liquidity[t][0] >= min_price and liquidity[t][1] >= min_dollar_volume]
+    if max_tickers is not None and len(passing) > max_tickers:
+        keep = set(sorted(passing, key=lambda t: (-liquidity[t][1], t))[:max_tickers])
+        passing = [t for t in passing if t in keep]
+    return passing
 
-def calculate_ibd_rs_score(relative_returns):
-    """Calculate IBD-style RS score using the discovered formula
+def prefilter_tickers(tickers, sp500_data, client, args):
+    """Pick the per-ticker fetch set by liquidity from the last --prefilter-days sessions"""
+    dates = sorted({bar_date(bar['t']) for bar in sp500_data})[-args.prefilter_days:] if args.prefilter_days else []
+    liquidity = {}
+    if dates:
+        print(f"Prefiltering {len(tickers)} tickers on {len(dates)} grouped-daily snapshots "
+              f"({dates[0]} .. {dates[-1]})...")
+        with metrics.span('prefilter'):
+            liquidity = fetch_liquidity(dates, client)
+    if not liquidity:
+        if dates:
+            print("⚠️  No grouped-daily snapshots - falling back to the first tickers alphabetically")
+        return tickers[:args.max_tickers]
+    
+    selected = select_liquid(tickers, liquidity, args.max_tickers, args.min_price, args.min_dollar_volume)
+    traded = sum(1 for t in tickers if t in liquidity)
+    floor = min(liquidity[t][1] for t in selected) if selected else 0
+    print(f"Selected {len(selected)} of {len(tickers)} tickers ({traded} traded): "
+          f"median dollar volume >= ${floor:,.0f}")
+    metrics.set(prefilter={'tickers': len(tickers), 'traded': traded, 'selected': len(selected),
+                           'dollar_volume_floor': round(floor)})
+    return selected
+
+def fetch_all(client, fetch, keys, checkpoint=None):
+    """Run fetch(key) -> (result, final) for every key on the client's workers
     
-    Formula: RS = 2×(3-month relative) + (6-month relative) + (9-month relative) + (12-month relative)
-    Where relative = (stock return - S&P 500 return)
+    Yields results in key order. Keys already in the checkpoint are replayed
+    from it; new final results are recorded as soon as they arrive, failed
+    ones are left for --resume.
     """
-    if not relative_returns:
-        return 0
-    
-    # IBD RS Score with 3-month period weighted 2x
-    rs_score = (
-        2 * relative_returns.get('3m', 0) +
-        1 * relative_returns.get('6m', 0) +
-        1 * relative_returns.get('9m', 0) +
-        1 * relative_returns.get('12m', 0)
-    )
-    
-    return rs_score
+    def run(key):
+        if checkpoint is None:
+            return fetch(key)[0]
+        if key in checkpoint.done:
+            return checkpoint.get(key)
+        result, final = fetch(key)
+        if final:
+            checkpoint.record(key, result)
+        else:
+            checkpoint.fail(key)
+        return result
+    
+    return client.map(run, keys)
+
+def bar_date(timestamp):
+    """Trading date (YYYY-MM-DD) of a daily bar timestamp in ms"""
+    return datetime.utcfromtimestamp(timestamp / 1000).strftime('%Y-%m-%d')
+
+def fetch_grouped_history(sp500_data, tickers, client, checkpoint=None, benchmarks=()):
+    """Assemble per-ticker daily history from one grouped-daily call per trading day
+    
+    The SPY range bars define the trading calendar, so only real trading days
+    are requested. Bars are collected into dates x symbols arrays to keep
+    memory flat, then expanded back into bar lists one ticker at a time.
+    
+    Returns (sp500_bars, {benchmark: bars}, tickers_with_data, iterator of bar lists).
+    """
+    dates = sorted({bar_date(bar['t']) for bar in sp500_data})
+    print(f"Fetching grouped daily bars for {len(dates)} trading days...")
+    
+    wanted = set(tickers) | {'SPY'} | set(benchmarks)
+    columns = {}
+    timestamps = np.zeros(len(dates), dtype=np.int64)
+    closes = np.full((len(dates), len(wanted)), np.nan)
+    volumes = np.zeros((len(dates), len(wanted)))
+    
+    def fetch(date):
+        results, final = fetch_grouped_daily(date, client)
+        # Every date is a SPY trading day, so an empty day is a failed fetch too.
+        # Only keep the universe's bars (this is what gets checkpointed)
+        return [bar for bar in results if bar.get('T') in wanted], final and bool(results)
+    
+    for row, results in enumerate(fetch_all(client, fetch, dates, checkpoint)):
+        if row % 50 == 0:
+            print(f"Progress: {row}/{len(dates)} trading days")
+        for bar in results:
+            symbol = bar.get('T')
+            if 'c' not in bar:
+                continue
+            col = columns.setdefault(symbol, len(columns))
+            closes[row, col] = bar['c']
+            volumes[row, col] = bar.get('v', 0)
+            timestamps[row] = bar['t']
+    
+    def bars_for(symbol):
+        col = columns[symbol]
+        rows = np.flatnonzero(~np.isnan(closes[:, col]))
+        return [{'t': int(timestamps[r]), 'c': float(closes[r, col]), 'v': float(volumes[r, col])}
+                for r in rows]
+    
+    # Grouped bars carry their own timestamps, so rebuild SPY from them too to
+    # keep the stock/benchmark join on identical keys
+    sp500_bars = bars_for('SPY') if 'SPY' in columns else []
+    benchmark_bars = {symbol: bars_for(symbol) for symbol in benchmarks if symbol in columns}
+    
+    # Same sufficiency rule as get_stock_data (more than 200 bars)
+    counts = (~np.isnan(closes)).sum(axis=0)
+    with_data = [t for t in tickers if t in columns and counts[columns[t]] > 200]
+    print(f"Got grouped history for {len(with_data)} of {len(tickers)} tickers")
+    
+    return sp500_bars, benchmark_bars, with_data, (bars_for(t) for t in with_data)
 
 def format_volume(volume):
     """Format volume as XXXk or XXXm"""
@@ -197,114 +241,260 @@ def format_return(return_val):
     """Format return as percentage"""
     return f"{return_val*100:.1f}%"
 
+def format_ranking(stock):
+    """One rankings.json record"""
+    record = {
+        'symbol': stock['symbol'],
+        'rs_rank': stock['rs_rank'],
+        'rs_score': round(stock['rs_score'], 4),
+        'avg_volume': format_volume(stock['avg_volume']),
+        'raw_volume': stock['avg_volume'],
+        'relative_3m': format_return(stock['relative_3m']),
+        'relative_12m': format_return(stock['relative_12m']),
+        'stock_return_3m': format_return(stock['stock_return_3m']),
+        'stock_return_12m': format_return(stock['stock_return_12m'])
+    }
+    # Secondary benchmark columns (rs_engine.add_benchmark_ranks), in benchmark order
+    for key, value in stock.items():
+        if key.startswith('rs_rank_'):
+            score_key = 'rs_score_' + key[len('rs_rank_'):]
+            record[key] = value
+            record[score_key] = round(stock[score_key], 4)
+    return record
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Full rebuild of IBD-style RS rankings")
+    parser.add_argument('--rps', type=float, default=float(os.environ.get('POLYGON_RPS', 5)),
+                        help="Maximum API requests per second (default: $POLYGON_RPS or 5)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Number of concurrent fetch workers (default: 8)")
+    parser.add_argument('--source', choices=['ticker', 'grouped'], default='ticker',
+                        help="'ticker': one range request per ticker (the --max-tickers most liquid); "
+                             "'grouped': one grouped-daily request per trading day (whole universe)")
+    parser.add_argument('--max-tickers', type=int, default=5000,
+                        help="Tickers fetched by the ticker source, by median dollar volume (default: 5000)")
+    parser.add_argument('--min-price', type=float, default=0.0,
+                        help="Ticker source: skip tickers whose last close is below this")
+    parser.add_argument('--min-dollar-volume', type=float, default=0.0,
+                        help="Ticker source: skip tickers whose median daily dollar volume is below this")
+    parser.add_argument('--prefilter-days', type=int, default=5,
+                        help="Grouped-daily snapshots the ticker source ranks liquidity on "
+                             "(0: first --max-tickers tickers alphabetically)")
+    parser.add_argument('--store', default=price_store.DEFAULT_PATH,
+                        help="Price store directory for daily updates (default: price_store)")
+    parser.add_argument('--universe', default=universe.DEFAULT_PATH,
+                        help="Ticker universe index, refreshed incrementally (default: universe.json)")
+    parser.add_argument('--types', default=','.join(universe.RANKED_TYPES),
+                        help="Security types to rank (default: %(default)s; add ETF to rank funds)")
+    parser.add_argument('--refresh-universe', action='store_true',
+                        help="List every active ticker again instead of an incremental refresh")
+    parser.add_argument('--benchmarks', default='',
+                        help="Secondary benchmarks to rank against besides SPY: symbols and/or "
+                             f"sets ({', '.join(BENCHMARK_SETS)}), e.g. QQQ,IWM,sectors")
+    parser.add_argument('--score-workers', type=int,
+                        help="Score across this many processes (default: in-process; opt-in for very "
+                             "large universes on several cores)")
+    http_cache.add_cache_arguments(parser)
+    parser.add_argument('--ndjson', action='store_true',
+                        help="Also write rankings.ndjson (header line, then one stock per line)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the run recorded in the checkpoint, skipping finished fetches")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH,
+                        help=f"Append-only checkpoint of fetched bars (default: {CHECKPOINT_PATH})")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_EVERY,
+                        help=f"Fetches between checkpoint writes (default: {DEFAULT_EVERY})")
+    parser.add_argument('--rank-history', default=rank_history.DEFAULT_PATH,
+                        help="Append-only daily rank/score history directory (default: rank_history)")
+    parser.add_argument('--history-json', action='store_true',
+                        help="Also write historical_data.json in the compact date-keyed format")
+    add_report_arguments(parser)
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    metrics.reset('process_stocks')
+    try:
+        run(args)
+    finally:
+        # Failed and interrupted runs get a report too
+        metrics.finish(args.report, args.report_log)
+
+def run(args):
     print("=== IBD-Style Relative Strength Stock Processor (FULL REBUILD) ===")
     print("Using discovered formula: RS = 2×(3m relative) + 6m + 9m + 12m relative performance vs S&P 500")
     
-    if not API_KEY:
+    if not API_KEY and not args.offline:
         print("ERROR: POLYGON_API_KEY not found!")
         print("Set it with: export POLYGON_API_KEY='your_key_here'")
         return
     
-    # Date range for historical data (need extra buffer for alignment)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=450)  # Extra buffer for weekends/holidays
-    
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
+    checkpoint = Checkpoint.resume(args.checkpoint, args.checkpoint_every) if args.resume else None
+    if args.resume and checkpoint is None:
+        print(f"No checkpoint at {args.checkpoint} - starting a new run")
+    
+    client = PolygonClient(API_KEY, BASE_URL, requests_per_second=args.rps, max_workers=args.workers,
+                           cache=http_cache.cache_from_args(args))
+    
+    if checkpoint is not None:
+        # Finish the checkpointed run exactly: same dates, universe and benchmark bars
+        header = checkpoint.header
+        source = header['source']
+        start_date_str, end_date_str = header['start'], header['end']
+        sp500_data = unpack_bars(header['spy'], BAR_FIELDS)
+        benchmark_data = {symbol: unpack_bars(bars, BAR_FIELDS)
+                          for symbol, bars in header.get('benchmarks', {}).items()}
+        tickers = header['tickers']
+        print(f"Resuming {source} run from {header['created']}: "
+              f"{len(checkpoint.done)} fetches already done")
+        if source != args.source:
+            print(f"⚠️  Using the checkpoint's --source {source}")
+        if args.benchmarks and list(benchmark_data) != parse_benchmarks(args.benchmarks):
+            print(f"⚠️  Using the checkpoint's benchmarks: {', '.join(benchmark_data) or 'SPY only'}")
+    else:
+        source = args.source
+        
+        # Date range for historical data (need extra buffer for alignment)
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=450)  # Extra buffer for weekends/holidays
+        
+        start_date_str = start_date.strftime('%Y-%m-%d')
+        end_date_str = end_date.strftime('%Y-%m-%d')
     
     print(f"Fetching data from {start_date_str} to {end_date_str}")
+    print(f"Rate limit: {args.rps:g} requests/second across {args.workers} workers")
+    metrics.set(source=source, start=start_date_str, end=end_date_str, rps=args.rps, workers=args.workers)
+    metrics.stage('fetch')
+    
+    if checkpoint is None:
+        # Get S&P 500 benchmark first
+        sp500_data = get_sp500_benchmark(start_date_str, end_date_str, client)
+        if not sp500_data:
+            print("ERROR: Failed to get S&P 500 benchmark data!")
+            return
+        
+        print(f"Got {len(sp500_data)} days of S&P 500 benchmark data")
+        
+        # Secondary benchmarks: one range request each, whatever the source
+        benchmark_data = {}
+        secondary = parse_benchmarks(args.benchmarks)
+        if secondary:
+            print(f"Fetching secondary benchmarks: {', '.join(secondary)}")
+            def fetch_benchmark(symbol):
+                return fetch_stock_data(symbol, start_date_str, end_date_str, client)
+            for symbol, bars in zip(secondary, fetch_all(client, fetch_benchmark, secondary)):
+                if bars:
+                    benchmark_data[symbol] = bars
+                else:
+                    print(f"⚠️  No data for benchmark {symbol} - skipping it")
+        
+        # Get all tickers
+        tickers = get_all_tickers(client, args.universe, universe.parse_types(args.types),
+                                  True if args.refresh_universe else None)
+        if not tickers:
+            print("Failed to get tickers!")
+            return
+        
+        if source == 'ticker':
+            # One 450-day fetch per ticker: spend them on the most liquid names
+            tickers = prefilter_tickers(tickers, sp500_data, client, args)
+        
+        checkpoint = Checkpoint.start(args.checkpoint, {
+            'created': datetime.now().isoformat(),
+            'source': source,
+            'start': start_date_str,
+            'end': end_date_str,
+            'fields': GROUPED_FIELDS if source == 'grouped' else BAR_FIELDS,
+            'spy': pack_bars(sp500_data, BAR_FIELDS),
+            'benchmarks': {symbol: pack_bars(bars, BAR_FIELDS) for symbol, bars in benchmark_data.items()},
+            'tickers': tickers
+        }, args.checkpoint_every)
     
-    # Get S&P 500 benchmark first
-    sp500_data = get_sp500_benchmark(start_date_str, end_date_str)
-    if not sp500_data:
-        print("ERROR: Failed to get S&P 500 benchmark data!")
-        return
-    
-    print(f"Got {len(sp500_data)} days of S&P 500 benchmark data")
-    
-    # Get all tickers
-    tickers = get_all_tickers()
-    if not tickers:
-        print("Failed to get tickers!")
-        return
-    
-    # Limit to reasonable number for processing time
-    tickers = tickers[:5000]  # Process top 5000 stocks
-    print(f"Processing {len(tickers)} stocks...")
-    
-    all_stock_data = []
-    historical_stocks = []  # Store historical data for daily updates
-    processed = 0
-    failed = 0
-    
-    for i, ticker in enumerate(tickers):
-        try:
-            # Progress indicator
-            if i % 100 == 0:
-                print(f"Progress: {i}/{len(tickers)} ({i/len(tickers)*100:.1f}%) - Processed: {processed}, Failed: {failed}")
-            
-            # Get historical data
-            stock_prices = get_stock_data(ticker, start_date_str, end_date_str)
+    try:
+        if source == 'grouped':
+            # ~300 requests for the whole universe instead of one per ticker
+            sp500_data, grouped_benchmarks, tickers, fetched = fetch_grouped_history(
+                sp500_data, tickers, client, checkpoint, list(benchmark_data))
+            if checkpoint.failed:
+                # A missing session shifts every symbol's 63/126/189/252-bar lookbacks: write nothing
+                metrics.count('failed_fetches', len(checkpoint.failed))
+                missing = sorted(checkpoint.failed)
+                raise SystemExit(f"❌ Grouped daily bars missing for {len(missing)} trading days "
+                                 f"({', '.join(missing[:5])}{', ...' if len(missing) > 5 else ''}) - "
+                                 f"nothing written; rerun with --resume to retry only those")
+            if not sp500_data:
+                print("ERROR: SPY missing from grouped daily data!")
+                return
+            # Same timestamps as the grouped SPY bars
+            benchmark_data = grouped_benchmarks
+        else:
+            def fetch(ticker):
+                return fetch_stock_data(ticker, start_date_str, end_date_str, client)
             
-            if stock_prices:
-                result = calculate_aligned_returns(stock_prices, sp500_data)
-                if result[0] is not None:  # Check if we got valid data
-                    relative_returns, stock_returns, avg_volume = result
-                    rs_score = calculate_ibd_rs_score(relative_returns)
-                    
-                    all_stock_data.append({
-                        'symbol': ticker,
-                        'rs_score': rs_score,
-                        'avg_volume': int(avg_volume),
-                        'relative_3m': relative_returns['3m'],
-                        'relative_6m': relative_returns['6m'], 
-                        'relative_9m': relative_returns['9m'],
-                        'relative_12m': relative_returns['12m'],
-                        'stock_return_3m': stock_returns['3m'],
-                        'stock_return_12m': stock_returns['12m']
-                    })
-                    
-                    # Store ultra-minimal historical data (only what we need for RS calculations)
-                    # Only store every 5th day to reduce size, plus recent 30 days for volume calc
-                    minimal_history = []
-                    
-                    # Get every 5th day for older data (for RS calculation periods)
-                    older_data = stock_prices[:-30:5]  # Every 5th day, excluding recent 30
-                    for price in older_data:
-                        minimal_history.append({
-                            't': price['t'],
-                            'c': price['c']  # Only closing price, no volume for old data
-                        })
-                    
-                    # Get all recent 30 days (for volume calculation)
-                    recent_data = stock_prices[-30:]
-                    for price in recent_data:
-                        minimal_history.append({
-                            't': price['t'],
-                            'c': price['c'],
-                            'v': price['v']  # Include volume for recent data
-                        })
-                    
-                    historical_stocks.append({
-                        's': ticker,  # Shorter field name
-                        'h': minimal_history,  # Shorter field name
-                        'u': datetime.now().isoformat()  # Shorter field name
-                    })
-                    
-                    processed += 1
+            # Fetch concurrently (rate limited by the client), but consume results in
+            # ticker order so the rankings match a serial run exactly
+            fetched = fetch_all(client, fetch, tickers, checkpoint)
+        
+        print(f"Processing {len(tickers)} stocks...")
+        
+        # Fetch stage: align each stock onto the SPY calendar as it arrives
+        calendar, sp500_closes = rs_engine.benchmark_series(sp500_data)
+        symbols = []
+        columns = []
+        bar_counts = []
+        
+        for i, ticker in enumerate(tickers):
+            try:
+                # Progress indicator
+                if i % 100 == 0:
+                    print(f"Progress: {i}/{len(tickers)} ({i/len(tickers)*100:.1f}%) - Fetched: {len(symbols)}")
+                
+                # Get historical data
+                stock_prices = next(fetched)
+                
+                if stock_prices and len(stock_prices) >= rs_engine.MIN_BARS:
+                    with metrics.span('align'):
+                        stock_prices = sorted(stock_prices, key=lambda x: x['t'])
+                        columns.append(rs_engine.align_bars(calendar, stock_prices))
+                    symbols.append(ticker)
+                    bar_counts.append(len(stock_prices))
                 else:
-                    failed += 1
-            else:
-                failed += 1
-            
-            # Rate limiting - respect API limits (5 calls per second = 0.2 seconds between calls)
-            time.sleep(0.2)
-            
-        except Exception as e:
-            print(f"Error processing {ticker}: {e}")
-            failed += 1
+                    metrics.count('skipped_symbols')
+                
+            except Exception as e:
+                print(f"Error processing {ticker}: {e}")
+                metrics.count('skipped_symbols')
+                continue
+    finally:
+        # Whatever was fetched survives a crash or Ctrl-C
+        checkpoint.flush()
+    
+    # Score stage: the whole universe at once
+    metrics.stage('score')
+    print(f"Scoring {len(symbols)} stocks...")
+    matrix = rs_engine.matrix_from_columns(calendar, sp500_closes, symbols, columns, bar_counts)
+    # Every benchmark in one pass over the matrix: the stock-side returns are shared
+    benchmarks = {'SPY': sp500_closes}
+    for symbol, bars in benchmark_data.items():
+        if len(bars) < rs_engine.MIN_BARS:
+            print(f"⚠️  Benchmark {symbol} has only {len(bars)} bars - skipping it")
             continue
+        benchmarks[symbol] = rs_engine.align_benchmark(calendar, sorted(bars, key=lambda x: x['t']))
+    results = rs_parallel.score_benchmarks(matrix, benchmarks, args.score_workers)
+    # The bars are split-adjusted as of today, so anything left is a bad print or an unexplained jump
+    with metrics.span('split_scan'):
+        events = splits.confirm(splits.find_events(matrix['closes'], matrix['volumes'], symbols, calendar))
+    splits.report(events)
+    metrics.set(flagged=[event['symbol'] for event in events])
+    result = results.pop('SPY')
+    all_stock_data = rs_engine.add_benchmark_ranks(rs_engine.to_stock_records(result), results)
+    
+    processed = len(all_stock_data)
+    failed = len(tickers) - processed
+    metrics.count('unranked_symbols', len(symbols) - processed)
+    metrics.set(tickers=len(tickers), ranked=processed, benchmarks=['SPY'] + list(results))
+    
+    if client.cache is not None:
+        print(f"Response cache: {client.cache.hits} hits, {client.cache.misses} misses")
     
     print(f"\nProcessing complete!")
     print(f"Successfully processed: {processed} stocks")
@@ -312,6 +502,7 @@ def main():
     
     # Calculate percentile rankings
     if all_stock_data:
+        metrics.stage('rank')
         print("\nCalculating IBD-style RS percentile rankings...")
         
         # Sort by RS score and assign rankings
@@ -324,59 +515,86 @@ def main():
             percentile = int(((total_stocks - i) / total_stocks) * 99) + 1
             stock['rs_rank'] = min(percentile, 99)
         
-        # Format for output
-        output_data = []
-        for stock in all_stock_data:
-            output_data.append({
-                'symbol': stock['symbol'],
-                'rs_rank': stock['rs_rank'],
-                'rs_score': round(stock['rs_score'], 4),
-                'avg_volume': format_volume(stock['avg_volume']),
-                'raw_volume': stock['avg_volume'],
-                'relative_3m': format_return(stock['relative_3m']),
-                'relative_12m': format_return(stock['relative_12m']),
-                'stock_return_3m': format_return(stock['stock_return_3m']),
-                'stock_return_12m': format_return(stock['stock_return_12m'])
-            })
+        # A resumed old checkpoint can finish after daily updates went past its last bar
+        history_date = bar_date(int(calendar[-1]))
+        history_newer = rank_history.newest_after(args.rank_history, history_date)
+        if history_newer:
+            print(f"⚠️  Rank history already runs to {history_newer}, past this rebuild's "
+                  f"{history_date} - not recording the rebuild's day in it")
         
         # Save main rankings JSON file
-        output = {
+        header = {
             'last_updated': datetime.now().isoformat(),
             'formula_used': 'RS = 2×(3m relative vs S&P500) + 6m + 9m + 12m relative performance',
-            'total_stocks': len(output_data),
+            'total_stocks': len(all_stock_data),
             'benchmark': 'S&P 500 (SPY)',
-            'update_type': 'full_rebuild',
-            'data': output_data
+            'update_type': 'full_rebuild'
         }
+        if results:
+            header['benchmarks'] = ['SPY'] + list(results)
         
-        with open('rankings.json', 'w') as f:
-            json.dump(output, f, indent=2)
+        # Rows are formatted as they are written, never held as a list
+        header['version'] = rankings_delta.stream_version(
+            rankings_delta.as_values(format_ranking(s)) for s in sorted(all_stock_data, key=lambda s: s['symbol']))
         
-        print(f"✅ Successfully saved {len(output_data)} stocks to 'rankings.json'")
+        metrics.stage('write')
+        with metrics.span('write_rankings'):
+            json_stream.write_json('rankings.json', header, 'data', (format_ranking(s) for s in all_stock_data))
+            extra_files = []
+            if args.ndjson:
+                json_stream.write_ndjson('rankings.ndjson', header, (format_ranking(s) for s in all_stock_data))
+                extra_files.append('rankings.ndjson')
+        # Numeric columnar + compressed copies for dashboards, with a checksum manifest
+        with metrics.span('write_artifacts'):
+            rankings_artifacts.write_all(header, all_stock_data, extra_files=extra_files)
+        output_data = [format_ranking(s) for s in all_stock_data[:20]]
         
-        # Save ultra-minimal historical data 
-        minimal_spy_data = []
-        # SPY data: every 5th day for older data, all recent 30 days
-        older_spy = sp500_data[:-30:5]
-        recent_spy = sp500_data[-30:]
+        # A full snapshot folds every daily delta: start a new chain from it
+        rankings_delta.reset(header['version'], history_date)
+        if not history_newer:
+            with metrics.span('write_rank_history'):
+                rank_history.record(args.rank_history, history_date, all_stock_data)
         
-        for bar in older_spy:
-            minimal_spy_data.append({'t': bar['t'], 'c': bar['c']})
-        for bar in recent_spy:
-            minimal_spy_data.append({'t': bar['t'], 'c': bar['c'], 'v': bar['v']})
+        print(f"✅ Successfully saved {len(all_stock_data)} stocks to 'rankings.json'")
         
-        historical_output = {
-            'u': datetime.now().isoformat(),  # Shorter field names
-            's': minimal_spy_data,  # SPY data
-            'n': len(historical_stocks),  # Total stocks
-            'd': historical_stocks  # Stock data
+        # Save the full-resolution price history of every ranked stock for daily updates
+        valid = result['valid']
+        store_matrix = {
+            'calendar': calendar,
+            'benchmark': sp500_closes,
+            'benchmark_volumes': rs_engine.align_bars(calendar, sp500_data)[1],
+            'symbols': [symbol for symbol, ok in zip(symbols, valid) if ok],
+            'closes': matrix['closes'][:, valid],
+            'volumes': matrix['volumes'][:, valid]
         }
+        with metrics.span('write_store'):
+            store = price_store.from_matrix(args.store, store_matrix, secondary={
+                symbol: rs_engine.align_bars(calendar, sorted(benchmark_data[symbol], key=lambda x: x['t']))
+                for symbol in results})
+        print(f"✅ Price store saved to '{args.store}' ({len(store.symbols) - 1} stocks x {store.rows} days)")
+    
+    if all_stock_data and args.history_json:
+        # Date-keyed compact history: only the closes the RS lookbacks can need
+        historical_output = compact_history.build({
+            'calendar': calendar,
+            'benchmark': sp500_closes,
+            'symbols': store_matrix['symbols'],
+            'closes': store_matrix['closes'],
+            'volumes': store_matrix['volumes']
+        })
+        with metrics.span('write_history_json'):
+            compact_history.save(historical_output, 'historical_data.json')
         
-        with open('historical_data.json', 'w') as f:
-            json.dump(historical_output, f, indent=2)
-        
-        print(f"✅ Historical data saved for daily updates ({len(historical_stocks)} stocks)")
-        
+        print(f"✅ Historical data saved for daily updates ({historical_output['n']} stocks)")
+    
+    metrics.stage(None)
+    metrics.count('failed_fetches', len(checkpoint.failed))
+    if checkpoint.failed:
+        print(f"⚠️  {len(checkpoint.failed)} fetches failed - rerun with --resume to retry only those")
+    else:
+        checkpoint.remove()
+    
+    if all_stock_data:
         # Show top performers
         print(f"\n🏆 Top 20 IBD-Style RS Rankings:")
         print("Rank | Symbol | RS | 3M Rel | 12M Rel | Volume")
@@ -393,7 +611,7 @@ def main():
         print(f"   Median RS Score: {np.median(rs_scores):.3f}")
         
         # Count high RS stocks
-        high_rs_count = len([s for s in output_data if s['rs_rank'] >= 90])
+        high_rs_count = sum(1 for s in all_stock_data if s['rs_rank'] >= 90)
         print(f"   Stocks with RS ≥ 90: {high_rs_count}")
         
     else:
@@ -1,19 +1,33 @@
-import requests
-import json
+import argparse
 import os
-import time
 from datetime import datetime, timedelta
-import pandas as pd
 import numpy as np
 
+import compact_history
+import http_cache
+from instrumentation import add_report_arguments, metrics
+import json_stream
+import price_store
+import rank_history
+import rankings_artifacts
+import rankings_delta
+import rs_engine
+import rs_parallel
+import rs_state
+import splits
+from polygon_client import PolygonClient
+
 API_KEY = os.environ.get('POLYGON_API_KEY')
-BASE_URL = "https://api.polygon.io"
+BASE_URL = os.environ.get('POLYGON_BASE_URL', "https://api.polygon.io")
+
+HISTORY_DAYS = 300     # Trading days of history used for scoring
+MAX_STORE_DAYS = 400   # Trim the price store back to HISTORY_DAYS past this
 
 def load_existing_data():
     """Load existing historical data and rankings"""
     try:
-        with open('historical_data.json', 'r') as f:
-            historical = json.load(f)
+        # Parsed one stock record at a time rather than from one big string
+        historical = json_stream.load('historical_data.json', 'd')
         print(f"✅ Loaded historical data for {len(historical.get('d', []))} stocks")
         return historical
     except FileNotFoundError:
@@ -23,124 +37,64 @@ def load_existing_data():
         print(f"❌ Error loading historical data: {e}")
         return None
 
-def get_daily_data(date):
+def get_daily_data(date, client):
     """Get yesterday's closing data for all tickers using grouped daily bars"""
+    return fetch_daily_data(date, client)[0]
+
+def fetch_daily_data(date, client):
+    """(daily data, final): final is False when the request failed rather than the market being closed"""
     print(f"Fetching daily market data for {date}...")
     
     # Use grouped daily bars endpoint for efficiency - gets all stocks at once
     url = f"{BASE_URL}/v2/aggs/grouped/locale/us/market/stocks/{date}"
-    params = {'apikey': API_KEY}
     
     try:
-        response = requests.get(url, params=params)
+        # The client backs off and retries on 429s before giving up
+        response = client.get(url)
         if response.status_code == 200:
             data = response.json()
             if 'results' in data and len(data['results']) > 0:
                 # Convert to dict for easy lookup by symbol
                 daily_data = {result['T']: result for result in data['results']}
-                print(f"✅ Got daily data for {len(daily_data)} stocks")
-                return daily_data
+                print(f"✅ Got daily data for {len(daily_data)} stocks on {date}")
+                return daily_data, True
             else:
-                print("⚠️  No results in daily data response")
-                return {}
-        elif response.status_code == 429:
-            print("⚠️  Rate limited, waiting 30 seconds...")
-            time.sleep(30)
-            return get_daily_data(date)
+                print(f"⚠️  No results in daily data response for {date}")
+                return {}, True
         else:
-            print(f"❌ API Error getting daily data: {response.status_code} - {response.text}")
-            return {}
+            print(f"❌ API Error getting daily data for {date}: {response.status_code} - {response.text}")
+            return {}, False
     except Exception as e:
-        print(f"❌ Exception getting daily data: {e}")
-        return {}
+        print(f"❌ Exception getting daily data for {date}: {e}")
+        return {}, False
 
-def calculate_aligned_returns(stock_prices, sp500_prices):
-    """Calculate stock returns relative to S&P 500 benchmark"""
-    if not stock_prices or not sp500_prices:
-        return None, None, None
-    
-    if len(stock_prices) < 252 or len(sp500_prices) < 252:  # Need at least 1 year
-        return None, None, None
-    
-    # Sort by timestamp
-    stock_prices = sorted(stock_prices, key=lambda x: x['t'])
-    sp500_prices = sorted(sp500_prices, key=lambda x: x['t'])
-    
-    # Create dataframes for alignment
-    stock_df = pd.DataFrame(stock_prices)
-    stock_df['date'] = pd.to_datetime(stock_df['t'], unit='ms')
-    stock_df = stock_df.set_index('date')
-    
-    spy_df = pd.DataFrame(sp500_prices)
-    spy_df['date'] = pd.to_datetime(spy_df['t'], unit='ms')
-    spy_df = spy_df.set_index('date')
-    
-    # Align dates (only trading days where both have data)
-    aligned = stock_df.join(spy_df, rsuffix='_spy', how='inner')
-    
-    if len(aligned) < 252:  # Need sufficient aligned data
-        return None, None, None
-    
-    # Get current prices
-    current_stock = aligned['c'].iloc[-1]
-    current_spy = aligned['c_spy'].iloc[-1]
-    
-    # Calculate returns for IBD periods
-    periods = {
-        '3m': 63,   # ~3 months
-        '6m': 126,  # ~6 months  
-        '9m': 189,  # ~9 months
-        '12m': 252  # ~12 months
-    }
-    
-    stock_returns = {}
-    relative_returns = {}
-    
-    for period, days in periods.items():
-        if len(aligned) > days:
-            # Stock return
-            old_stock = aligned['c'].iloc[-(days+1)]
-            if old_stock > 0:
-                stock_return = (current_stock - old_stock) / old_stock
-            else:
-                stock_return = 0
-            
-            # S&P 500 return
-            old_spy = aligned['c_spy'].iloc[-(days+1)]
-            if old_spy > 0:
-                spy_return = (current_spy - old_spy) / old_spy
-            else:
-                spy_return = 0
-            
-            # Relative performance (stock return - benchmark return)
-            relative_return = stock_return - spy_return
-            
-            stock_returns[period] = stock_return
-            relative_returns[period] = relative_return
-        else:
-            stock_returns[period] = 0
-            relative_returns[period] = 0
-    
-    # Calculate average volume (last 20 days)
-    recent_volumes = [float(p['v']) for p in stock_prices[-20:] if p['v'] > 0]
-    avg_volume = sum(recent_volumes) / len(recent_volumes) if recent_volumes else 0
-    
-    return relative_returns, stock_returns, avg_volume
+def missing_days(last_date, target_date):
+    """Weekdays after last_date up to and including target_date (YYYY-MM-DD)"""
+    day = datetime.strptime(last_date, '%Y-%m-%d') + timedelta(days=1)
+    end = datetime.strptime(target_date, '%Y-%m-%d')
+    days = []
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day.strftime('%Y-%m-%d'))
+        day += timedelta(days=1)
+    return days
 
-def calculate_ibd_rs_score(relative_returns):
-    """Calculate IBD-style RS score using the discovered formula"""
-    if not relative_returns:
-        return 0
-    
-    # IBD RS Score with 3-month period weighted 2x
-    rs_score = (
-        2 * relative_returns.get('3m', 0) +
-        1 * relative_returns.get('6m', 0) +
-        1 * relative_returns.get('9m', 0) +
-        1 * relative_returns.get('12m', 0)
-    )
-    
-    return rs_score
+def fetch_days(dates, client):
+    """Grouped bars for each date, fetched concurrently; returns [(date, daily_data)] in order
+    
+    Market holidays (no results) are skipped. Stops at the first day whose
+    request failed so later days are never applied over a hole.
+    """
+    days = []
+    for date, (daily_data, final) in zip(dates, client.map(lambda d: fetch_daily_data(d, client), dates)):
+        if not final:
+            print(f"⚠️  Stopping at {date}: re-run to fetch it and any later days")
+            break
+        if daily_data:
+            days.append((date, daily_data))
+        else:
+            print(f"📅 {date}: no trading (market holiday)")
+    return days
 
 def format_volume(volume):
     """Format volume as XXXk or XXXm"""
@@ -155,11 +109,31 @@ def format_return(return_val):
     """Format return as percentage"""
     return f"{return_val*100:.1f}%"
 
-def update_rs_calculations(historical_data, daily_data):
+def format_ranking(stock):
+    """One rankings.json record"""
+    record = {
+        'symbol': stock['symbol'],
+        'rs_rank': stock['rs_rank'],
+        'rs_score': round(stock['rs_score'], 4),
+        'avg_volume': format_volume(stock['avg_volume']),
+        'raw_volume': stock['avg_volume'],
+        'relative_3m': format_return(stock['relative_3m']),
+        'relative_12m': format_return(stock['relative_12m']),
+        'stock_return_3m': format_return(stock['stock_return_3m']),
+        'stock_return_12m': format_return(stock['stock_return_12m'])
+    }
+    # Secondary benchmark columns (rs_engine.add_benchmark_ranks), in benchmark order
+    for key, value in stock.items():
+        if key.startswith('rs_rank_'):
+            score_key = 'rs_score_' + key[len('rs_rank_'):]
+            record[key] = value
+            record[score_key] = round(stock[score_key], 4)
+    return record
+
+def update_rs_calculations(historical_data, daily_data, workers=None):
     """Update RS calculations with new daily data"""
     print("📊 Updating RS calculations...")
     
-    updated_stocks = []
     sp500_data = historical_data.get('s', [])  # Fixed: using 's' instead of 'sp500_data'
     
     # Add new SPY data if available
@@ -179,7 +153,8 @@ def update_rs_calculations(historical_data, daily_data):
         print("⚠️  No SPY data available for today")
         return []
     
-    processed = 0
+    symbols = []
+    histories = []
     failed = 0
     
     for i, stock in enumerate(historical_data.get('d', [])):  # Fixed: using 'd' instead of 'stocks'
@@ -202,26 +177,8 @@ def update_rs_calculations(historical_data, daily_data):
                 stock['h'] = stock['h'][-300:]  # Fixed: using 'h' instead of 'price_history'
                 stock['u'] = datetime.now().isoformat()  # Fixed: using 'u' instead of 'last_updated'
                 
-                # Recalculate RS score with updated data
-                result = calculate_aligned_returns(stock['h'], sp500_data)  # Fixed: using 'h' instead of 'price_history'
-                if result[0] is not None:
-                    relative_returns, stock_returns, avg_volume = result
-                    rs_score = calculate_ibd_rs_score(relative_returns)
-                    
-                    updated_stocks.append({
-                        'symbol': symbol,
-                        'rs_score': rs_score,
-                        'avg_volume': int(avg_volume),
-                        'relative_3m': relative_returns['3m'],
-                        'relative_6m': relative_returns['6m'], 
-                        'relative_9m': relative_returns['9m'],
-                        'relative_12m': relative_returns['12m'],
-                        'stock_return_3m': stock_returns['3m'],
-                        'stock_return_12m': stock_returns['12m']
-                    })
-                    processed += 1
-                else:
-                    failed += 1
+                symbols.append(symbol)
+                histories.append((symbol, stock['h']))
             else:
                 # No new data for this stock - skip or use old calculation
                 failed += 1
@@ -231,22 +188,209 @@ def update_rs_calculations(historical_data, daily_data):
             failed += 1
             continue
     
+    # Recalculate RS scores for every updated stock in one vectorized pass
+    matrix = rs_engine.build_price_matrix(sp500_data, histories)
+    updated_stocks = rs_engine.to_stock_records(rs_parallel.score_universe(matrix, workers))
+    processed = len(updated_stocks)
+    failed += len(symbols) - processed
+    metrics.count('skipped_symbols', failed)
+    
     print(f"📊 Daily update complete: {processed} updated, {failed} failed")
     return updated_stocks
 
+def update_from_store(store, days, verify=False, workers=None, split_lookup=None, history_path=None):
+    """Append trading days of grouped bars ([(date, daily_data)], oldest first) to
+    the price store and rescore every stock
+    
+    Scores come from the rolling RS state, which is advanced by one day in
+    constant time per symbol. The state is rebuilt from the store when it is
+    missing or out of step (first run after a rebuild, or a re-run day), or
+    when a split was adjusted in the stored history (split_lookup(date)
+    returns the splits Polygon lists for a date; only those are applied).
+    With history_path, each caught-up day before the newest gets its own
+    rank history row (the caller records the newest with the rankings).
+    """
+    print("📊 Updating RS calculations from price store...")
+    
+    state = rs_state.load_for_store(store, HISTORY_DAYS)
+    applied = 0
+    
+    for i, (date, daily_data) in enumerate(days):
+        if store.benchmark not in daily_data:
+            print(f"⚠️  No {store.benchmark} data available for {date}")
+            continue
+        
+        # One row per trading day; appending never rewrites the existing history
+        with metrics.span('store_append'):
+            appended = store.append_day(daily_data[store.benchmark]['t'], daily_data)
+        applied += 1
+        if store.rows > MAX_STORE_DAYS:
+            store.trim(HISTORY_DAYS)
+        
+        # New bars on a post-split basis next to pre-split history
+        with metrics.span('split_check'):
+            adjusted = splits.check_recent(store, split_lookup)
+        if adjusted:
+            metrics.count('split_adjustments', len(adjusted))
+            state = None
+        
+        if state is not None and appended:
+            row = store.matrix(1)
+            with metrics.span('state_apply_day'):
+                state.apply_day(row['calendar'][0], row['benchmark'][0], row['closes'][0], row['volumes'][0])
+            print(f"⚡ Applied {date} to rolling RS state")
+        else:
+            state = None
+        
+        if history_path and i < len(days) - 1:
+            if state is None:
+                with metrics.span('state_rebuild'):
+                    state = rs_state.RollingState.from_store(store, HISTORY_DAYS)
+            with metrics.span('write_rank_history'):
+                record_ranks(history_path, date, state.score())
+    
+    if not applied:
+        return []
+    print(f"✅ Price store now holds {store.rows} days (last: {store.last_date()})")
+    
+    if state is None:
+        print("🔄 Rebuilding rolling RS state from price store...")
+        with metrics.span('state_rebuild'):
+            state = rs_state.RollingState.from_store(store, HISTORY_DAYS)
+    rs_state.save_for_store(state, store)
+    
+    result = state.score()
+    if verify:
+        with metrics.span('verify'):
+            verify_state(store, result, workers)
+    updated_stocks = rs_engine.to_stock_records(result)
+    if store.secondary:
+        with metrics.span('score_secondary'):
+            rs_engine.add_benchmark_ranks(updated_stocks, score_secondary(store, result, workers))
+    
+    failed = len(result['symbols']) - len(updated_stocks)
+    metrics.count('skipped_symbols', failed)
+    print(f"📊 Daily update complete: {len(updated_stocks)} updated, {failed} failed")
+    return updated_stocks
+
+def record_ranks(path, date, result):
+    """Append a day's rank history row from a score_universe()-shaped result"""
+    if rank_history.newest_after(path, date):
+        return
+    stocks = rs_engine.to_stock_records(result)
+    ranks = rs_engine.percentile_ranks(np.array([stock['rs_score'] for stock in stocks]))
+    for stock, rank in zip(stocks, ranks):
+        stock['rs_rank'] = int(rank)
+    rank_history.record(path, date, stocks)
+
+def score_secondary(store, result, workers=None):
+    """Scores against the store's secondary benchmarks for the stocks in result
+    
+    The rolling state only tracks SPY, so these are recomputed from the stored
+    history in one pass over the matrix for all secondary benchmarks.
+    """
+    matrix = store.matrix(HISTORY_DAYS)
+    benchmarks = {symbol: closes for symbol, closes in matrix['secondary'].items()
+                  if np.count_nonzero(~np.isnan(closes)) >= rs_engine.MIN_BARS}
+    results = rs_parallel.score_benchmarks(matrix, benchmarks, workers)
+    for secondary in results.values():
+        # Rank exactly the stocks the rolling state scored (same column order)
+        secondary['valid'] = result['valid']
+    print(f"📊 Rescored against {', '.join(results)}")
+    return results
+
+def update_compact_history(historical_data, days):
+    """Append trading days ([(date, daily_data)], oldest first) to a compact (format 2)
+    history and score by trading-date lookups"""
+    print("📊 Updating RS calculations from compact history...")
+    
+    applied = 0
+    for date, daily_data in days:
+        if 'SPY' not in daily_data:
+            print(f"⚠️  No SPY data available for {date}")
+            continue
+        compact_history.append_day(historical_data, date, daily_data)
+        applied += 1
+    if not applied:
+        return []
+    
+    updated_stocks = rs_engine.to_stock_records(compact_history.score(historical_data))
+    
+    failed = len(historical_data['d']) - len(updated_stocks)
+    metrics.count('skipped_symbols', failed)
+    print(f"📊 Daily update complete: {len(updated_stocks)} updated, {failed} failed")
+    return updated_stocks
+
+def verify_state(store, result, workers=None):
+    """Recompute from the price store from scratch and report any divergence"""
+    print("🔍 Verifying rolling state against a full recompute...")
+    matrix = store.matrix(HISTORY_DAYS)
+    expected = rs_parallel.score_universe(matrix, workers)
+    expected['valid'] &= ~np.isnan(matrix['closes'][-1])
+    
+    divergences = rs_state.compare_results(expected, result)
+    if not divergences:
+        print(f"✅ Verified: rolling state matches full recompute for {int(result['valid'].sum())} stocks")
+        return True
+    
+    print(f"❌ {len(divergences)} divergences between rolling state and full recompute:")
+    for symbol, field, want, got in divergences[:20]:
+        print(f"   {symbol:6s} {field}: recompute {want} vs rolling {got}")
+    return False
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Daily incremental update of IBD-style RS rankings")
+    parser.add_argument('--store', default=price_store.DEFAULT_PATH,
+                        help="Price store directory written by process_stocks.py (default: price_store); "
+                             "historical_data.json is used when it does not exist")
+    parser.add_argument('--verify', action='store_true',
+                        help="Recompute every score from the full price store history and "
+                             "report divergences from the rolling state")
+    parser.add_argument('--score-workers', type=int,
+                        help="Processes for full recomputes (default: in-process; opt-in for very "
+                             "large universes on several cores)")
+    http_cache.add_cache_arguments(parser)
+    parser.add_argument('--ndjson', action='store_true',
+                        help="Also write rankings.ndjson (header line, then one stock per line)")
+    parser.add_argument('--rank-history', default=rank_history.DEFAULT_PATH,
+                        help="Append-only daily rank/score history directory (default: rank_history)")
+    parser.add_argument('--delta-only', action='store_true',
+                        help="Only write the day's delta (deltas/), leaving rankings.json at the last "
+                             "full snapshot: readers then need the delta chain (--latest) to see the day")
+    add_report_arguments(parser)
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    metrics.reset('process_stocks_daily')
+    try:
+        run(args)
+    finally:
+        # Failed and interrupted runs get a report too
+        metrics.finish(args.report, args.report_log)
+
+def run(args):
     print("=== IBD-Style RS Daily Update ===")
     print("Performing incremental update with yesterday's data...")
     
-    if not API_KEY:
+    if not API_KEY and not args.offline:
         print("❌ ERROR: POLYGON_API_KEY not found!")
         return
     
-    # Load existing historical data
-    historical_data = load_existing_data()
-    if not historical_data:
-        print("❌ Cannot proceed without historical data. Run process_stocks.py first.")
-        return
+    client = PolygonClient(API_KEY, BASE_URL, cache=http_cache.cache_from_args(args))
+    
+    # Load existing history: the price store if there is one, else the legacy JSON
+    metrics.stage('load')
+    store = None
+    historical_data = None
+    if price_store.PriceStore.exists(args.store):
+        store = price_store.PriceStore(args.store, mode='r+')
+        print(f"✅ Opened price store for {len(store.symbols)} symbols x {store.rows} days")
+    else:
+        historical_data = load_existing_data()
+        if not historical_data:
+            print("❌ Cannot proceed without historical data. Run process_stocks.py first.")
+            return
     
     # Get yesterday's date (markets are usually 1 day behind)
     yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
@@ -259,21 +403,51 @@ def main():
         yesterday_dt = yesterday_dt - timedelta(days=2)  # Get Friday
     
     yesterday = yesterday_dt.strftime('%Y-%m-%d')
-    print(f"📅 Getting data for: {yesterday}")
     
-    # Get daily data for all stocks
-    daily_data = get_daily_data(yesterday)
-    if not daily_data:
+    # Catch up on every trading day since the newest stored one (missed runs)
+    if store:
+        last_date = store.last_date()
+    elif compact_history.is_compact(historical_data):
+        last_date = historical_data['dates'][-1]
+    else:
+        last_date = None
+    dates = missing_days(last_date, yesterday) if last_date else []
+    if not dates:
+        dates = [yesterday]
+    if len(dates) > 1:
+        print(f"📅 Catching up {len(dates)} days since {last_date}: {dates[0]} .. {dates[-1]}")
+    else:
+        print(f"📅 Getting data for: {dates[0]}")
+    
+    # Get daily data for all stocks, one grouped request per day
+    metrics.stage('fetch')
+    metrics.set(dates=dates)
+    days = fetch_days(dates, client)
+    if not days:
         print("❌ No daily data available - market might be closed or API issue")
         return
+    data_date = days[-1][0]
+    metrics.set(data_date=data_date, days_applied=len(days))
     
     # Update calculations
-    updated_stocks = update_rs_calculations(historical_data, daily_data)
+    metrics.stage('score')
+    if store:
+        updated_stocks = update_from_store(store, days, verify=args.verify, workers=args.score_workers,
+                                           split_lookup=splits.reference_lookup(client, BASE_URL, [d for d, _ in days]),
+                                           history_path=args.rank_history)
+    elif compact_history.is_compact(historical_data):
+        updated_stocks = update_compact_history(historical_data, days)
+    else:
+        print("⚠️  Legacy historical_data.json keeps every 5th older bar, so lookbacks are "
+              "approximate - run process_stocks.py to rebuild it")
+        updated_stocks = update_rs_calculations(historical_data, days[-1][1], args.score_workers)
     if not updated_stocks:
         print("❌ No stocks were updated")
         return
     
     # Sort and assign new rankings
+    metrics.stage('rank')
+    metrics.set(ranked=len(updated_stocks))
     print("🏆 Calculating new RS rankings...")
     updated_stocks.sort(key=lambda x: x['rs_score'], reverse=True)
     
@@ -283,46 +457,62 @@ def main():
         percentile = int(((total_stocks - i) / total_stocks) * 99) + 1
         stock['rs_rank'] = min(percentile, 99)
     
-    # Format for output
-    output_data = []
-    for stock in updated_stocks:
-        output_data.append({
-            'symbol': stock['symbol'],
-            'rs_rank': stock['rs_rank'],
-            'rs_score': round(stock['rs_score'], 4),
-            'avg_volume': format_volume(stock['avg_volume']),
-            'raw_volume': stock['avg_volume'],
-            'relative_3m': format_return(stock['relative_3m']),
-            'relative_12m': format_return(stock['relative_12m']),
-            'stock_return_3m': format_return(stock['stock_return_3m']),
-            'stock_return_12m': format_return(stock['stock_return_12m'])
-        })
-    
     # Save updated rankings
-    output = {
+    header = {
         'last_updated': datetime.now().isoformat(),
         'formula_used': 'RS = 2×(3m relative vs S&P500) + 6m + 9m + 12m relative performance',
-        'total_stocks': len(output_data),
+        'total_stocks': len(updated_stocks),
         'benchmark': 'S&P 500 (SPY)',
         'update_type': 'daily_incremental',
-        'data_date': yesterday,
-        'data': output_data
+        'data_date': data_date
     }
-    
-    with open('rankings.json', 'w') as f:
-        json.dump(output, f, indent=2)
-    
-    print(f"✅ Updated rankings saved - {len(output_data)} stocks")
-    
-    # Update historical data file with shorter field names structure
-    historical_data['u'] = datetime.now().isoformat()  # Fixed: using 'u' instead of 'last_updated'
-    with open('historical_data.json', 'w') as f:
-        json.dump(historical_data, f, indent=2)
-    
-    print(f"✅ Historical data updated")
+    secondary = [key[len('rs_rank_'):].upper() for key in updated_stocks[0] if key.startswith('rs_rank_')]
+    if secondary:
+        header['benchmarks'] = ['SPY'] + secondary
+    
+    history_newer = rank_history.newest_after(args.rank_history, data_date)
+    if history_newer:
+        print(f"⚠️  Rank history already runs to {history_newer}, past {data_date} - not recording the day in it")
+    
+    # Delta against the previous snapshot (rankings.json plus the deltas since);
+    # rows are formatted as they are written, never held as a list
+    metrics.stage('write')
+    with metrics.span('write_delta'):
+        header['version'] = rankings_delta.write_delta(header, (format_ranking(s) for s in updated_stocks), days)
+    if not history_newer:
+        with metrics.span('write_rank_history'):
+            rank_history.record(args.rank_history, data_date, updated_stocks)
+    
+    if args.delta_only:
+        print("✅ Delta written - rankings.json stays at the last full snapshot")
+    else:
+        with metrics.span('write_rankings'):
+            json_stream.write_json('rankings.json', header, 'data', (format_ranking(s) for s in updated_stocks))
+            extra_files = []
+            if args.ndjson:
+                json_stream.write_ndjson('rankings.ndjson', header, (format_ranking(s) for s in updated_stocks))
+                extra_files.append('rankings.ndjson')
+        # Numeric columnar + compressed copies for dashboards, with a checksum manifest
+        with metrics.span('write_artifacts'):
+            rankings_artifacts.write_all(header, updated_stocks, extra_files=extra_files)
+        print(f"✅ Updated rankings saved - {len(updated_stocks)} stocks")
+    output_data = [format_ranking(s) for s in updated_stocks[:20]]
+    
+    # The price store was appended in place; only the legacy JSON needs rewriting
+    if historical_data is not None and compact_history.is_compact(historical_data):
+        compact_history.save(historical_data, 'historical_data.json')
+        print(f"✅ Historical data updated")
+    elif historical_data is not None:
+        # Update historical data file with shorter field names structure
+        historical_data['u'] = datetime.now().isoformat()  # Fixed: using 'u' instead of 'last_updated'
+        header = {k: v for k, v in historical_data.items() if k != 'd'}
+        json_stream.write_json('historical_data.json', header, 'd', historical_data['d'])
+        
+        print(f"✅ Historical data updated")
+    metrics.stage(None)
     
     # Show top performers
-    print(f"\n🏆 Top 20 RS Rankings (Updated {yesterday}):")
+    print(f"\n🏆 Top 20 RS Rankings (Updated {data_date}):")
     print("Rank | Symbol | RS | 3M Rel | 12M Rel | Volume")
     print("-" * 55)
     for i, stock in enumerate(output_data[:20]):
@@ -330,7 +520,7 @@ def main():
     
     # Show update statistics
     rs_scores = [s['rs_score'] for s in updated_stocks]
-    high_rs_count = len([s for s in output_data if s['rs_rank'] >= 90])
+    high_rs_count = sum(1 for s in updated_stocks if s['rs_rank'] >= 90)
     
     print(f"\n📊 Daily Update Statistics:")
     print(f"   Stocks Updated: {len(updated_stocks)}")
@@ -338,7 +528,7 @@ def main():
     print(f"   Lowest RS Score: {min(rs_scores):.3f}")
     print(f"   Average RS Score: {np.mean(rs_scores):.3f}")
     print(f"   Stocks with RS ≥ 90: {high_rs_count}")
-    print(f"   Data Date: {yesterday}")
+    print(f"   Data Date: {data_date}")
     
     print(f"\n✅ Daily update completed successfully!")
 
@@ -0,0 +1,299 @@
+"""Append-only daily history of every symbol's RS rank and score
+
+Layout of a history directory:
+
+    meta.json     version, row count, allocated columns, last update
+    symbols.json  column order (a new symbol takes the next free column)
+    dates.i64     int64 trading dates as ms timestamps (UTC midnight), one per row
+    rank.u1       uint8 rs_rank, rows x capacity, 0 where a symbol was not ranked
+    score.f4      float32 rs_score, rows x capacity, NaN where not ranked
+
+Every run appends one row per trading day (a re-run of the newest day
+replaces it). Columns are allocated in blocks so new listings rarely force a
+rewrite. Queries slice the memory-mapped columns:
+
+    python rank_history.py series NVDA [--days 60]
+    python rank_history.py cross NVDA [--threshold 90]
+    python rank_history.py movers [--days 20] [--count 20] [--losers]
+    python rank_history.py info
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+HISTORY_VERSION = 1
+DEFAULT_PATH = 'rank_history'
+COLUMN_BLOCK = 1024   # Columns are allocated in multiples of this
+
+def date_to_ms(date):
+    return int(np.datetime64(date, 'D').astype('datetime64[ms]').astype(np.int64))
+
+def ms_to_date(timestamp):
+    return str(np.datetime64(int(timestamp), 'ms').astype('datetime64[D]'))
+
+class RankHistory:
+    """A dates x symbols rank/score history opened with np.memmap"""
+
+    def __init__(self, path=DEFAULT_PATH, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != HISTORY_VERSION:
+            raise ValueError(f"Unsupported rank history version: {self.meta.get('version')}")
+        with open(os.path.join(path, 'symbols.json'), 'r') as f:
+            self.symbols = json.load(f)
+        self.index = {symbol: col for col, symbol in enumerate(self.symbols)}
+        self._map()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self):
+        rows = self.meta['rows']
+        width = self.meta['capacity']
+        memmap_mode = 'r+' if self.mode == 'r+' else 'r'
+        if rows == 0:
+            self.dates = np.empty(0, dtype=np.int64)
+            self.ranks = np.empty((0, width), dtype=np.uint8)
+            self.scores = np.empty((0, width), dtype=np.float32)
+            return
+        self.dates = np.memmap(self._file('dates.i64'), dtype=np.int64, mode=memmap_mode, shape=(rows,))
+        self.ranks = np.memmap(self._file('rank.u1'), dtype=np.uint8, mode=memmap_mode, shape=(rows, width))
+        self.scores = np.memmap(self._file('score.f4'), dtype=np.float32, mode=memmap_mode,
+                                shape=(rows, width))
+
+    @classmethod
+    def create(cls, path, symbols=(), dates=(), ranks=None, scores=None, width=0):
+        """Write a new history (replacing any existing one) and open it for appends
+
+        Room is allocated for at least `width` symbols.
+        """
+        os.makedirs(path, exist_ok=True)
+        symbols = list(symbols)
+        capacity = max(-(-max(len(symbols), width) // COLUMN_BLOCK), 1) * COLUMN_BLOCK
+        padded_ranks = np.zeros((len(dates), capacity), dtype=np.uint8)
+        padded_scores = np.full((len(dates), capacity), np.nan, dtype=np.float32)
+        if len(dates):
+            padded_ranks[:, :len(symbols)] = ranks
+            padded_scores[:, :len(symbols)] = scores
+
+        np.asarray(dates, dtype=np.int64).tofile(os.path.join(path, 'dates.i64'))
+        padded_ranks.tofile(os.path.join(path, 'rank.u1'))
+        padded_scores.tofile(os.path.join(path, 'score.f4'))
+        with open(os.path.join(path, 'symbols.json'), 'w') as f:
+            json.dump(symbols, f)
+        cls._write_meta(path, {
+            'version': HISTORY_VERSION,
+            'rows': len(dates),
+            'capacity': capacity,
+            'updated': datetime.now().isoformat()
+        })
+        return cls(path, mode='r+')
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH, mode='r+'):
+        """Open a history, creating an empty one for appends if there is none"""
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            return cls(path, mode)
+        return cls.create(path)
+
+    @staticmethod
+    def _write_meta(path, meta):
+        # Write then rename so a crash never leaves a half-written row count
+        tmp = os.path.join(path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    def last_date(self):
+        """Trading date (YYYY-MM-DD) of the newest row, or None"""
+        return ms_to_date(self.dates[-1]) if self.rows else None
+
+    def append(self, date, symbols, ranks, scores):
+        """Record one day's ranks and scores (parallel sequences)
+
+        Returns True if a row was added, False if the newest day was replaced.
+        """
+        if self.mode != 'r+':
+            raise ValueError("Rank history opened read-only")
+        timestamp = date_to_ms(date)
+        if self.rows and timestamp < self.dates[-1]:
+            raise ValueError(f"{date} is older than the newest stored day {self.last_date()}")
+
+        new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.index]
+        if len(self.symbols) + len(new) > self.meta['capacity']:
+            self._grow(len(self.symbols) + len(new))
+        if new:
+            self.symbols.extend(new)
+            self.index.update((symbol, len(self.index)) for symbol in new)
+            with open(self._file('symbols.json.tmp'), 'w') as f:
+                json.dump(self.symbols, f)
+            os.replace(self._file('symbols.json.tmp'), self._file('symbols.json'))
+
+        cols = np.fromiter((self.index[symbol] for symbol in symbols), dtype=np.int64, count=len(symbols))
+        rank_row = np.zeros(self.meta['capacity'], dtype=np.uint8)
+        score_row = np.full(self.meta['capacity'], np.nan, dtype=np.float32)
+        rank_row[cols] = ranks
+        score_row[cols] = scores
+
+        appended = not (self.rows and timestamp == self.dates[-1])
+        if not appended:
+            self.ranks[-1] = rank_row
+            self.scores[-1] = score_row
+            self.ranks.flush()
+            self.scores.flush()
+        else:
+            self._write_row((('dates.i64', np.array([timestamp], dtype=np.int64)),
+                             ('rank.u1', rank_row), ('score.f4', score_row)))
+            self.meta['rows'] += 1
+
+        # The row count is only bumped once every file holds the row
+        self.meta['updated'] = datetime.now().isoformat()
+        self._write_meta(self.path, self.meta)
+        self._map()
+        return appended
+
+    def _write_row(self, parts):
+        """Write [(file name, row values)] at the row meta.json counts next, cutting off anything past it
+
+        Rows left past meta's row count by a killed run are overwritten
+        rather than appended after (see PriceStore._write_row).
+        """
+        for name, values in parts:
+            data = values.tobytes()
+            with open(self._file(name), 'r+b') as f:
+                f.seek(self.rows * len(data))
+                f.write(data)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _grow(self, width):
+        """Rewrite the files with room for at least `width` symbols"""
+        n = len(self.symbols)
+        dates = np.array(self.dates)
+        ranks = np.array(self.ranks[:, :n])
+        scores = np.array(self.scores[:, :n])
+        self.dates = self.ranks = self.scores = None
+        self.meta = RankHistory.create(self.path, self.symbols, dates, ranks, scores, width).meta
+        self._map()
+
+    def _window(self, days):
+        return 0 if days is None else max(self.rows - days, 0)
+
+    def series(self, symbol, days=None):
+        """(dates, ranks, scores) for one symbol over the newest `days` rows (all by default)
+
+        Dates are datetime64[D]; days the symbol was not ranked have rank 0 / NaN score.
+        """
+        col = self.index.get(symbol)
+        if col is None:
+            raise KeyError(symbol)
+        start = self._window(days)
+        return (np.asarray(self.dates[start:]).astype('datetime64[ms]').astype('datetime64[D]'),
+                np.asarray(self.ranks[start:, col]), np.asarray(self.scores[start:, col]))
+
+    def crossings(self, symbol, threshold=90, days=None):
+        """Dates on which a symbol's rank rose to `threshold` or above from below it
+
+        The first stored day counts when the symbol already ranked at or above it.
+        """
+        dates, ranks, _ = self.series(symbol, days)
+        above = ranks >= threshold
+        starts = above & ~np.concatenate(([False], above[:-1]))
+        return dates[starts]
+
+    def top_movers(self, days=20, count=20, losers=False):
+        """Symbols with the largest rank change over the last `days` rows
+
+        Returns a list of (symbol, rank then, rank now, change), ranked on
+        both days only, biggest gains first (or biggest drops with losers=True).
+        """
+        if self.rows < 2:
+            return []
+        then_row = max(self.rows - 1 - days, 0)
+        width = len(self.symbols)
+        now = np.asarray(self.ranks[-1, :width], dtype=np.int16)
+        then = np.asarray(self.ranks[then_row, :width], dtype=np.int16)
+        cols = np.flatnonzero((now > 0) & (then > 0))
+        change = now[cols] - then[cols]
+        key = change if losers else -change
+        if count < len(cols):
+            top = np.argpartition(key, count - 1)[:count]
+        else:
+            top = np.arange(len(cols))
+        top = top[np.lexsort((cols[top], key[top]))]
+        return [(self.symbols[cols[i]], int(then[cols[i]]), int(now[cols[i]]), int(change[i])) for i in top]
+
+def newest_after(path, date):
+    """The newest stored day when it is later than date (YYYY-MM-DD), else None
+
+    append() refuses such a day; callers check first so a run never stops
+    halfway through writing its outputs.
+    """
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    newest = RankHistory(path).last_date()
+    return newest if newest and newest > date else None
+
+def record(path, date, stocks):
+    """Append one day of ranked stock records (dicts with symbol, rs_rank, rs_score)"""
+    history = RankHistory.open(path)
+    history.append(date,
+                   [stock['symbol'] for stock in stocks],
+                   np.fromiter((stock['rs_rank'] for stock in stocks), dtype=np.uint8, count=len(stocks)),
+                   np.fromiter((stock['rs_score'] for stock in stocks), dtype=np.float32, count=len(stocks)))
+    print(f"✅ Rank history: {history.rows} days x {len(history.symbols)} symbols (last: {history.last_date()})")
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description="RS rank history queries")
+    parser.add_argument('--path', default=DEFAULT_PATH, help="Rank history directory (default: rank_history)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    series = commands.add_parser('series', help="One symbol's rank and score by date")
+    series.add_argument('symbol')
+    series.add_argument('--days', type=int)
+    cross = commands.add_parser('cross', help="Dates a symbol's rank crossed a threshold")
+    cross.add_argument('symbol')
+    cross.add_argument('--threshold', type=int, default=90)
+    movers = commands.add_parser('movers', help="Largest rank changes over N days")
+    movers.add_argument('--days', type=int, default=20)
+    movers.add_argument('--count', type=int, default=20)
+    movers.add_argument('--losers', action='store_true')
+    commands.add_parser('info', help="Show history dimensions")
+    args = parser.parse_args()
+
+    history = RankHistory(args.path)
+    if args.command == 'series':
+        dates, ranks, scores = history.series(args.symbol, args.days)
+        for date, rank, score in zip(dates, ranks, scores):
+            print(f"{date}  {rank:2d}  {score:8.4f}" if rank else f"{date}   -")
+    elif args.command == 'cross':
+        dates = history.crossings(args.symbol, args.threshold)
+        if len(dates):
+            print(f"{args.symbol} first reached RS {args.threshold} on {dates[0]}")
+            print(f"All crossings: {', '.join(str(date) for date in dates)}")
+        else:
+            print(f"{args.symbol} has not reached RS {args.threshold} in the stored history")
+    elif args.command == 'movers':
+        print(f"{'Biggest drops' if args.losers else 'Biggest gains'} over {args.days} days:")
+        for symbol, then, now, change in history.top_movers(args.days, args.count, args.losers):
+            print(f"  {symbol:6s} {then:2d} -> {now:2d} ({change:+d})")
+    else:
+        print(f"Days: {history.rows} ({ms_to_date(history.dates[0]) if history.rows else None} .. "
+              f"{history.last_date()})")
+        print(f"Symbols: {len(history.symbols)} (capacity {history.meta['capacity']})")
+        print(f"Updated: {history.meta.get('updated')}")
+
+if __name__ == "__main__":
+    main()
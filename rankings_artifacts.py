@@ -0,0 +1,211 @@
+"""Compact companions of rankings.json for dashboards
+
+Written next to rankings.json by both scripts:
+
+    rankings.bin            columnar typed arrays with numeric fields
+    rankings.json.gz        gzip of rankings.json (rankings.json.zst too when
+                            the optional zstandard package is installed)
+    rankings.manifest.json  size and sha256 of every file, row count, version
+
+rankings.bin layout (little-endian):
+
+    8 bytes   magic b'RSCOL\\x00\\x01\\x00'
+    4 bytes   uint32 length of the header JSON
+    header    {"rows", "meta" (rankings.json header fields), "columns": [
+                {"name", "dtype", "offset", "bytes"}]}, space-padded so the
+              data section starts 8-byte aligned
+    data      each column at its offset from the start of the data section,
+              8-byte aligned so it can be viewed as a typed array in place
+
+Returns and scores are plain fractions (0.583 rather than "58.3%").
+Secondary benchmark columns (rs_rank_qqq, rs_score_qqq, ...) follow when the
+rankings have them. Symbols
+are a uint32 offsets column ("symbol_offsets", rows + 1 entries) into a
+UTF-8 blob ("symbol").
+
+    python rankings_artifacts.py verify [rankings.manifest.json]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'RSCOL\x00\x01\x00'
+MANIFEST_VERSION = 1
+BIN_PATH = 'rankings.bin'
+GZIP_PATH = 'rankings.json.gz'
+ZSTD_PATH = 'rankings.json.zst'
+MANIFEST_PATH = 'rankings.manifest.json'
+
+# (name, dtype, record field)
+COLUMNS = [
+    ('rs_rank', '<u1', 'rs_rank'),
+    ('rs_score', '<f8', 'rs_score'),
+    ('avg_volume', '<f8', 'avg_volume'),
+    ('relative_3m', '<f4', 'relative_3m'),
+    ('relative_6m', '<f4', 'relative_6m'),
+    ('relative_9m', '<f4', 'relative_9m'),
+    ('relative_12m', '<f4', 'relative_12m'),
+    ('stock_return_3m', '<f4', 'stock_return_3m'),
+    ('stock_return_12m', '<f4', 'stock_return_12m')
+]
+
+def table_columns(stocks):
+    """COLUMNS plus the secondary benchmark rank/score columns of these records"""
+    extra = []
+    for field in (stocks[0] if stocks else {}):
+        if field.startswith('rs_rank_'):
+            extra.append((field, '<u1', field))
+        elif field.startswith('rs_score_'):
+            extra.append((field, '<f8', field))
+    return COLUMNS + extra
+
+def _padded(data):
+    return data + b'\x00' * (-len(data) % 8)
+
+def write_columns(path, header, stocks):
+    """Write ranked stock records (rankings order) as rankings.bin"""
+    encoded = [stock['symbol'].encode('utf-8') for stock in stocks]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+
+    arrays = [('symbol_offsets', '<u4', offsets.tobytes()),
+              ('symbol', 'utf8', b''.join(encoded))]
+    for name, dtype, field in table_columns(stocks):
+        # Scores are rounded as in rankings.json so both files hold the same value
+        values = [round(stock[field], 4) if field.startswith('rs_score') else stock[field] for stock in stocks]
+        arrays.append((name, dtype, np.array(values, dtype=dtype).tobytes()))
+
+    columns = []
+    offset = 0
+    for name, dtype, data in arrays:
+        columns.append({'name': name, 'dtype': dtype, 'offset': offset, 'bytes': len(data)})
+        offset += len(_padded(data))
+    meta = json.dumps({'rows': len(stocks), 'meta': header, 'columns': columns},
+                      separators=(',', ':')).encode('utf-8')
+    # Pad the header with JSON whitespace so the data section starts 8-byte aligned
+    meta += b' ' * (-(len(MAGIC) + 4 + len(meta)) % 8)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(meta)) + meta)
+        for _, _, data in arrays:
+            f.write(_padded(data))
+    os.replace(tmp, path)
+
+def read_columns(path):
+    """(meta, {column: array}) from rankings.bin; 'symbol' is a list of str"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a rankings column file")
+    (length,) = struct.unpack_from('<I', data, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(data[start:start + length])
+    base = start + length
+
+    columns = {}
+    for column in header['columns']:
+        begin = base + column['offset']
+        raw = data[begin:begin + column['bytes']]
+        columns[column['name']] = raw if column['dtype'] == 'utf8' else np.frombuffer(raw, dtype=column['dtype'])
+    offsets = columns.pop('symbol_offsets')
+    blob = columns['symbol']
+    columns['symbol'] = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(header['rows'])]
+    return header['meta'], columns
+
+def compress(json_path):
+    """Compressed copies of a JSON file; returns [(path, encoding)]"""
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    written = []
+    # mtime=0 keeps the output identical for identical input (clean git diffs)
+    with open(GZIP_PATH + '.tmp', 'wb') as f:
+        f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+    os.replace(GZIP_PATH + '.tmp', GZIP_PATH)
+    written.append((GZIP_PATH, 'gzip'))
+
+    try:
+        import zstandard
+    except ImportError:
+        return written
+    with open(ZSTD_PATH + '.tmp', 'wb') as f:
+        f.write(zstandard.ZstdCompressor(level=19).compress(raw))
+    os.replace(ZSTD_PATH + '.tmp', ZSTD_PATH)
+    written.append((ZSTD_PATH, 'zstd'))
+    return written
+
+def file_entry(path, **extra):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return dict(path=path, bytes=os.path.getsize(path), sha256=digest.hexdigest(), **extra)
+
+def write_all(header, stocks, json_path='rankings.json', extra_files=()):
+    """Columnar and compressed outputs for a rankings.json just written, plus the manifest"""
+    write_columns(BIN_PATH, header, stocks)
+    files = [file_entry(json_path, format='json')]
+    files += [file_entry(path, format='ndjson') for path in extra_files]
+    files.append(file_entry(BIN_PATH, format='columns'))
+    files += [file_entry(path, format='json', encoding=encoding) for path, encoding in compress(json_path)]
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'last_updated': header.get('last_updated'),
+        'update_type': header.get('update_type'),
+        'rows': len(stocks),
+        'files': files
+    }
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Wrote {', '.join(entry['path'] for entry in files[1:])} and {MANIFEST_PATH}")
+    return manifest
+
+def verify(manifest_path=MANIFEST_PATH):
+    """Problems found checking the manifest's files (empty list when all is well)"""
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(manifest_path)
+    problems = []
+    for entry in manifest['files']:
+        path = os.path.join(base, entry['path'])
+        if not os.path.exists(path):
+            problems.append(f"{entry['path']}: missing")
+        elif file_entry(path)['sha256'] != entry['sha256']:
+            problems.append(f"{entry['path']}: checksum mismatch")
+    if problems:
+        return problems
+
+    # The column file must hold the same table as rankings.json
+    with open(os.path.join(base, 'rankings.json'), 'r') as f:
+        rankings = json.load(f)['data']
+    _, columns = read_columns(os.path.join(base, BIN_PATH))
+    if columns['symbol'] != [row['symbol'] for row in rankings]:
+        problems.append(f"{BIN_PATH}: symbols differ from rankings.json")
+    elif list(columns['rs_rank']) != [row['rs_rank'] for row in rankings]:
+        problems.append(f"{BIN_PATH}: rs_rank differs from rankings.json")
+    elif list(columns['rs_score']) != [row['rs_score'] for row in rankings]:
+        problems.append(f"{BIN_PATH}: rs_score differs from rankings.json")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Rankings output tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    check = commands.add_parser('verify', help="Check checksums and that rankings.bin matches rankings.json")
+    check.add_argument('manifest_path', nargs='?', default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    problems = verify(args.manifest_path)
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        raise SystemExit(1)
+    print(f"✅ All files in {args.manifest_path} verified")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Daily rankings deltas against the last full snapshot
+
+The full rebuild writes rankings.json (the base snapshot) and starts a new
+delta chain. Each daily update writes deltas/<data date>.json.gz:
+
+    format    delta format version (1)
+    from, to  snapshot versions before and after the day
+    date      data date
+    header    rankings.json header fields after the day
+    fields    column names of the rows below (FIELDS plus any secondary
+              benchmark rank/score columns)
+    rows      rankings.json rows (as lists) that changed or were added
+    removed   symbols no longer ranked
+    bars      {date: {symbol: [close, volume]}} new bars of ranked symbols
+
+A snapshot version is a hash of the ranking rows (keyed by symbol), so it
+does not depend on row order or the update time. deltas/index.json lists
+the base snapshot and the chain in order; a client holding version V
+applies every delta from V onwards. Folded rows are keyed by symbol; ranked
+order is rs_score descending.
+
+    python rankings_delta.py info
+    python rankings_delta.py fold rankings.folded.json
+"""
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+import json_stream
+import rankings_artifacts
+
+FORMAT_VERSION = 1
+DELTA_DIR = 'deltas'
+INDEX_FILE = 'index.json'
+FIELDS = ['symbol', 'rs_rank', 'rs_score', 'avg_volume', 'raw_volume',
+          'relative_3m', 'relative_12m', 'stock_return_3m', 'stock_return_12m']
+
+def snapshot_version(rows):
+    """Version of a {symbol: row values} snapshot (16 hex digits)"""
+    return stream_version(rows[symbol] for symbol in sorted(rows))
+
+def stream_version(values):
+    """snapshot_version() of row values given in symbol order, hashed one row at a time"""
+    digest = hashlib.sha256()
+    for row in values:
+        digest.update(json.dumps(row, separators=(',', ':')).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+def as_values(row):
+    """A rankings.json row as a list, in its own field order"""
+    return list(row.values())
+
+def load_index(delta_dir=DELTA_DIR):
+    path = os.path.join(delta_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {'format': FORMAT_VERSION, 'base': None, 'deltas': []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_index(index, delta_dir=DELTA_DIR):
+    os.makedirs(delta_dir, exist_ok=True)
+    path = os.path.join(delta_dir, INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def read_delta(path):
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+def apply_delta(rows, delta):
+    """Apply a delta to {symbol: row values} in place"""
+    for symbol in delta['removed']:
+        rows.pop(symbol, None)
+    for values in delta['rows']:
+        rows[values[0]] = values
+
+def current_snapshot(rankings_path='rankings.json', delta_dir=DELTA_DIR):
+    """(rows, version, header, fields) of rankings.json with every later delta applied"""
+    rows = {}
+    header = {}
+    fields = FIELDS
+    if os.path.exists(rankings_path):
+        header = json_stream.read_fields(rankings_path, skip='data')
+        for row in json_stream.iter_array(rankings_path, 'data'):
+            rows[row['symbol']] = as_values(row)
+            fields = list(row)
+    version = snapshot_version(rows) if rows else None
+
+    for entry in load_index(delta_dir)['deltas']:
+        if entry['from'] != version:
+            continue
+        delta = read_delta(os.path.join(delta_dir, entry['path']))
+        apply_delta(rows, delta)
+        header = delta['header']
+        fields = delta['fields']
+        version = delta['to']
+    return rows, version, header, fields
+
+def write_delta(header, new_rows, days, benchmark='SPY', rankings_path='rankings.json', delta_dir=DELTA_DIR):
+    """Record the day's changes against the current snapshot; returns the new version
+
+    new_rows are rankings.json rows (dicts, any iterable); days is [(date, {symbol: bar})].
+    """
+    old_rows, old_version, _, _ = current_snapshot(rankings_path, delta_dir)
+    rows = {}
+    fields = FIELDS
+    for row in new_rows:
+        if not rows:
+            fields = list(row)
+        rows[row['symbol']] = as_values(row)
+    version = snapshot_version(rows)
+
+    universe = set(rows) | set(old_rows) | {benchmark}
+    delta = {
+        'format': FORMAT_VERSION,
+        'from': old_version,
+        'to': version,
+        'date': header.get('data_date'),
+        'header': dict(header, version=version),
+        'fields': fields,
+        'rows': [values for symbol, values in rows.items() if old_rows.get(symbol) != values],
+        'removed': sorted(set(old_rows) - set(rows)),
+        'bars': {date: {symbol: [bar['c'], bar.get('v', 0)] for symbol, bar in daily_data.items()
+                        if symbol in universe and 'c' in bar}
+                 for date, daily_data in days}
+    }
+
+    os.makedirs(delta_dir, exist_ok=True)
+    index = load_index(delta_dir)
+    # A re-run of the same day chains a second delta rather than rewriting history
+    taken = {entry['path'] for entry in index['deltas']}
+    name = f"{delta['date']}.json.gz"
+    run = 1
+    while name in taken:
+        run += 1
+        name = f"{delta['date']}-{run}.json.gz"
+    path = os.path.join(delta_dir, name)
+    # mtime=0: identical deltas are identical files
+    with open(path + '.tmp', 'wb') as f:
+        f.write(gzip.compress(json.dumps(delta, separators=(',', ':')).encode('utf-8'), 9, mtime=0))
+    os.replace(path + '.tmp', path)
+
+    index['deltas'].append({
+        'path': name,
+        'date': delta['date'],
+        'from': old_version,
+        'to': version,
+        'rows': len(delta['rows']),
+        'removed': len(delta['removed']),
+        'bytes': os.path.getsize(path),
+        'sha256': rankings_artifacts.file_entry(path)['sha256']
+    })
+    save_index(index, delta_dir)
+    print(f"✅ Delta {name}: {len(delta['rows'])} changed/added, {len(delta['removed'])} removed, "
+          f"{os.path.getsize(path) / 1024:.1f} KB")
+    return version
+
+def reset(version, date, rankings_path='rankings.json', delta_dir=DELTA_DIR):
+    """Start a new chain at a full snapshot: the rebuild folds every delta into it"""
+    for path in glob.glob(os.path.join(delta_dir, '*.json.gz')):
+        os.remove(path)
+    save_index({
+        'format': FORMAT_VERSION,
+        'base': {'path': rankings_path, 'version': version, 'date': date},
+        'deltas': []
+    }, delta_dir)
+
+def fold(out_path, rankings_path='rankings.json', delta_dir=DELTA_DIR):
+    """Write rankings.json with every delta applied to out_path; returns the version"""
+    rows, version, header, fields = current_snapshot(rankings_path, delta_dir)
+    ordered = sorted(rows.values(), key=lambda values: (-values[2], values[0]))
+    header = dict(header, version=version, total_stocks=len(ordered))
+    json_stream.write_json(out_path, header, 'data', (dict(zip(fields, values)) for values in ordered))
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="Rankings delta chain tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('info', help="Show the base snapshot and delta chain")
+    folded = commands.add_parser('fold', help="Write the base snapshot with every delta applied")
+    folded.add_argument('out_path', nargs='?', default='rankings.folded.json')
+    args = parser.parse_args()
+
+    if args.command == 'fold':
+        version = fold(args.out_path)
+        print(f"✅ Wrote {args.out_path} (version {version})")
+        return
+
+    index = load_index()
+    base = index.get('base') or {}
+    print(f"Base: {base.get('path')} {base.get('date')} version {base.get('version')}")
+    for entry in index['deltas']:
+        print(f"  {entry['path']}: {entry['from']} -> {entry['to']}, {entry['rows']} rows, "
+              f"{entry['removed']} removed, {entry['bytes'] / 1024:.1f} KB")
+
+if __name__ == "__main__":
+    main()
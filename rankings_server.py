@@ -0,0 +1,241 @@
+"""Read-only HTTP API over the rankings, reloaded when the files change
+
+    python rankings_server.py [--port 8080] [--latest] [--poll 1.0]
+
+Endpoints (GET or HEAD, JSON responses):
+
+    /rankings              the whole table (rankings.json document)
+    /symbol/<SYMBOL>       one stock's row
+    /top?n=20              the first n rows in rankings order
+    /screen?q=<query>      screener.py query, e.g.
+                           q=rs_rank >= 90 and raw_volume > 500k order by relative_3m desc limit 25
+    /health                loaded version, row count and load time
+
+The table is held in memory and swapped in one assignment when
+rankings.json (and, with --latest, deltas/index.json) changes, so a request
+sees either the old or the new snapshot. Every response carries the
+snapshot version as its ETag; a matching If-None-Match gets 304. Responses
+are gzipped for clients that accept it when that saves space.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import json_stream
+import rankings_delta
+import screener
+
+MAX_TOP = 1000
+GZIP_MIN_BYTES = 1024
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+          405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+class Snapshot:
+    """One loaded rankings table with pre-encoded rows"""
+
+    def __init__(self, header, rows, version):
+        self.header = header
+        self.rows = rows
+        self.version = version
+        self.etag = f'"{version}"'
+        self.encoded = [dumps(row) for row in rows]
+        self.by_symbol = {row['symbol']: i for i, row in enumerate(rows)}
+        self.screener = screener.Screener.from_rows(rows)
+        self.loaded_at = datetime.now().isoformat()
+        self.document = self.rows_body(range(len(rows)), header)
+        self.document_gzip = gzip.compress(self.document, 6, mtime=0)
+
+    @classmethod
+    def load(cls, rankings_path='rankings.json', latest=False):
+        if latest:
+            rows, version, header, fields = rankings_delta.current_snapshot(rankings_path)
+            ordered = sorted(rows.values(), key=lambda values: (-values[2], values[0]))
+            rows = [dict(zip(fields, values)) for values in ordered]
+            header = dict(header, version=version, total_stocks=len(rows))
+        else:
+            header = json_stream.read_fields(rankings_path, skip='data')
+            rows = list(json_stream.iter_array(rankings_path, 'data'))
+            version = header.get('version')
+        if not version:
+            # rankings.json written before snapshot versions: hash the rows instead
+            version = rankings_delta.snapshot_version({row['symbol']: rankings_delta.as_values(row)
+                                                       for row in rows})
+        return cls(header, rows, version)
+
+    def rows_body(self, rows, header=None):
+        """{...header, "data": [rows]} assembled from the pre-encoded rows"""
+        head = dumps(dict(header or {}, version=self.version, count=len(rows)))
+        return head[:-1] + b',"data":[' + b','.join(self.encoded[i] for i in rows) + b']}'
+
+def source_stamp(rankings_path, latest):
+    """Changes whenever a file the snapshot is built from is replaced"""
+    paths = [rankings_path]
+    if latest:
+        paths.append(os.path.join(rankings_delta.DELTA_DIR, rankings_delta.INDEX_FILE))
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+class RankingsServer:
+    def __init__(self, rankings_path='rankings.json', latest=False, poll=1.0):
+        self.rankings_path = rankings_path
+        self.latest = latest
+        self.poll = poll
+        self.snapshot = None
+        self.stamp = None
+        self.requests = 0
+
+    async def reload(self):
+        """Load the files if they changed since the last load; True if swapped"""
+        stamp = source_stamp(self.rankings_path, self.latest)
+        if stamp == self.stamp:
+            return False
+        try:
+            snapshot = await asyncio.to_thread(Snapshot.load, self.rankings_path, self.latest)
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving the previous snapshot; retry on the next poll
+            print(f"❌ Reload failed, still serving {self.snapshot and self.snapshot.version}: {e}")
+            return False
+        self.stamp = stamp
+        if self.snapshot is None or snapshot.version != self.snapshot.version:
+            print(f"🔄 Loaded {len(snapshot.rows)} stocks, version {snapshot.version}")
+        self.snapshot = snapshot
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            await self.reload()
+
+    def route(self, path, query, snapshot, gzip_ok):
+        """(status, body bytes, content-encoding or None)"""
+        if path == '/health':
+            return 200, dumps({'version': snapshot.version, 'rows': len(snapshot.rows),
+                               'loaded_at': snapshot.loaded_at, 'requests': self.requests}), None
+        if path in ('/rankings', '/rankings.json'):
+            if gzip_ok:
+                return 200, snapshot.document_gzip, 'gzip'
+            return 200, snapshot.document, None
+        if path.startswith('/symbol/'):
+            row = snapshot.by_symbol.get(unquote(path[len('/symbol/'):]).upper())
+            if row is None:
+                return 404, dumps({'error': 'unknown symbol'}), None
+            return 200, snapshot.encoded[row], None
+
+        params = parse_qs(query)
+        if path == '/top':
+            try:
+                n = min(int(params.get('n', ['20'])[0]), MAX_TOP)
+            except ValueError:
+                return 400, dumps({'error': 'n must be an integer'}), None
+            body = snapshot.rows_body(range(max(min(n, len(snapshot.rows)), 0)))
+        elif path == '/screen':
+            try:
+                conditions, order_by, descending, limit = screener.parse_query(params.get('q', [''])[0])
+                rows = snapshot.screener.select(conditions, order_by, descending, limit)
+            except ValueError as e:
+                return 400, dumps({'error': str(e)}), None
+            body = snapshot.rows_body(rows)
+        else:
+            return 404, dumps({'error': 'not found'}), None
+
+        if gzip_ok and len(body) >= GZIP_MIN_BYTES:
+            return 200, gzip.compress(body, 1), 'gzip'
+        return 200, body, None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b'\r\n\r\n')
+                lines = request.decode('latin-1').split('\r\n')
+                method, target, version = (lines[0].split(' ') + ['', ''])[:3]
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              if version == 'HTTP/1.1' else headers.get('connection', '').lower() == 'keep-alive')
+
+                self.requests += 1
+                # One reference per request: a reload swaps it, never mutates it
+                snapshot = self.snapshot
+                encoding = None
+                extra = {}
+                if method not in ('GET', 'HEAD'):
+                    status, body = 405, dumps({'error': 'method not allowed'})
+                    extra['Allow'] = 'GET, HEAD'
+                elif snapshot is None:
+                    status, body = 503, dumps({'error': 'rankings not loaded'})
+                else:
+                    extra['ETag'] = snapshot.etag
+                    if snapshot.etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')] \
+                            or headers.get('if-none-match') == '*':
+                        status, body = 304, b''
+                    else:
+                        url = urlsplit(target)
+                        status, body, encoding = self.route(
+                            url.path.rstrip('/') or '/', url.query, snapshot,
+                            'gzip' in headers.get('accept-encoding', ''))
+
+                head = [f"HTTP/1.1 {status} {STATUS[status]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(body)}",
+                        "Cache-Control: no-cache",
+                        "Vary: Accept-Encoding"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                if encoding:
+                    head.append(f"Content-Encoding: {encoding}")
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD' and status != 304:
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        await self.reload()
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        watcher = asyncio.create_task(self.watch())
+        print(f"🚀 Serving {self.rankings_path}{' + deltas' if self.latest else ''} on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only HTTP API over the RS rankings")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rankings', default='rankings.json', help="rankings.json path")
+    parser.add_argument('--latest', action='store_true',
+                        help="Serve rankings.json with the daily deltas since it applied")
+    parser.add_argument('--poll', type=float, default=1.0,
+                        help="Seconds between checks for changed files (default: 1.0)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(RankingsServer(args.rankings, args.latest, args.poll).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Vectorized whole-universe RS engine
+
+Aligns every symbol against the benchmark (SPY) trading calendar once, as a
+dates x symbols close-price matrix, and computes the IBD-style returns, RS
+scores and percentile ranks for the whole universe with array operations.
+
+Results match the original per-stock calculate_aligned_returns() /
+calculate_ibd_rs_score(), frozen in tests/baseline.py and checked by
+tests/test_rs_engine.py: lookbacks are counted in bars the stock and the benchmark
+both have (the inner join), not in calendar rows.
+"""
+import numpy as np
+
+# IBD periods in trading days and their weights in the RS score
+PERIODS = {
+    '3m': 63,
+    '6m': 126,
+    '9m': 189,
+    '12m': 252
+}
+RS_WEIGHTS = {
+    '3m': 2,
+    '6m': 1,
+    '9m': 1,
+    '12m': 1
+}
+MIN_BARS = 252     # Need at least 1 year
+VOLUME_DAYS = 20   # Average volume window
+
+def align_bars(calendar, bars):
+    """Place one symbol's bars on the calendar (sorted bar timestamps in ms)
+
+    Returns (closes, volumes) arrays of len(calendar); days without a bar are
+    NaN close / 0 volume. Bars on days outside the calendar are dropped, as
+    the inner join in calculate_aligned_returns does.
+    """
+    closes = np.full(len(calendar), np.nan)
+    volumes = np.zeros(len(calendar))
+    if not bars:
+        return closes, volumes
+
+    t = np.fromiter((bar['t'] for bar in bars), dtype=np.int64, count=len(bars))
+    c = np.fromiter((bar['c'] for bar in bars), dtype=np.float64, count=len(bars))
+    v = np.fromiter((bar.get('v', 0) for bar in bars), dtype=np.float64, count=len(bars))
+
+    pos = np.searchsorted(calendar, t)
+    pos[pos == len(calendar)] = 0
+    hit = calendar[pos] == t
+    closes[pos[hit]] = c[hit]
+    volumes[pos[hit]] = v[hit]
+    return closes, volumes
+
+def benchmark_series(benchmark_bars):
+    """Sorted benchmark bars as (calendar timestamps, closes) arrays"""
+    benchmark_bars = sorted(benchmark_bars, key=lambda x: x['t'])
+    calendar = np.array([bar['t'] for bar in benchmark_bars], dtype=np.int64)
+    benchmark = np.array([bar['c'] for bar in benchmark_bars], dtype=np.float64)
+    return calendar, benchmark
+
+def matrix_from_columns(calendar, benchmark, symbols, columns, bar_counts):
+    """Stack align_bars() columns into the dict used by score_universe()"""
+    n_dates = len(calendar)
+    return {
+        'calendar': calendar,
+        'benchmark': benchmark,
+        'symbols': list(symbols),
+        'bar_counts': np.array(bar_counts, dtype=np.int64),
+        'closes': np.column_stack([c for c, _ in columns]) if columns else np.empty((n_dates, 0)),
+        'volumes': np.column_stack([v for _, v in columns]) if columns else np.empty((n_dates, 0))
+    }
+
+def build_price_matrix(benchmark_bars, bars_by_symbol):
+    """Build the aligned matrices for a list of (symbol, bars) pairs"""
+    calendar, benchmark = benchmark_series(benchmark_bars)
+    symbols = [symbol for symbol, _ in bars_by_symbol]
+    columns = [align_bars(calendar, bars) for _, bars in bars_by_symbol]
+    bar_counts = [len(bars) if bars else 0 for _, bars in bars_by_symbol]
+    return matrix_from_columns(calendar, benchmark, symbols, columns, bar_counts)
+
+def valid_row_order(closes):
+    """Row indices of each column's valid (non-NaN) closes, oldest first
+
+    Column j's k-th aligned bar is closes[order[k, j], j]; rows past the
+    column's bar count point at NaN rows and must be masked by the caller.
+    """
+    return np.argsort(np.isnan(closes), axis=0, kind='stable')
+
+def period_return(current, old):
+    """(current - old) / old, or 0 where the old price is not positive"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(old > 0, (current - old) / old, 0.0)
+
+def calculate_returns(closes, volumes, benchmark, bar_counts=None, periods=PERIODS):
+    """Stock, benchmark-relative returns and average volume for every column
+
+    Returns a dict of arrays with one entry per column: 'valid' (enough
+    aligned history), 'relative' and 'stock' (dicts keyed by period) and
+    'avg_volume'. Columns that are not valid hold zeros.
+    """
+    return calculate_benchmark_returns(closes, volumes, {None: benchmark}, bar_counts, periods)[None]
+
+def calculate_benchmark_returns(closes, volumes, benchmarks, bar_counts=None, periods=PERIODS):
+    """calculate_returns() against several benchmark series in one pass
+
+    benchmarks maps a name to closes on the same calendar as the matrix. The
+    stock side (aligned rows, stock returns, volume) is computed once and
+    shared by every result; only the relative returns differ. Returns
+    {name: result}.
+    """
+    n_dates, n_symbols = closes.shape
+    cols = np.arange(n_symbols)
+
+    aligned_count = (~np.isnan(closes)).sum(axis=0)
+    valid = aligned_count >= MIN_BARS
+    if bar_counts is not None:
+        valid &= bar_counts >= MIN_BARS
+    if n_dates < MIN_BARS:
+        valid[:] = False
+
+    order = valid_row_order(closes)
+    last_row = order[np.maximum(aligned_count - 1, 0), cols]
+    current = closes[last_row, cols]
+
+    relative = {name: {} for name in benchmarks}
+    stock = {}
+    for period, days in periods.items():
+        has_period = valid & (aligned_count > days)
+        old_row = order[np.clip(aligned_count - 1 - days, 0, n_dates - 1), cols]
+        stock_return = period_return(current, closes[old_row, cols])
+        stock[period] = np.where(has_period, stock_return, 0.0)
+        for name, benchmark in benchmarks.items():
+            benchmark_return = period_return(benchmark[last_row], benchmark[old_row])
+            relative[name][period] = np.where(has_period, stock_return - benchmark_return, 0.0)
+
+    # Average of the last 20 positive volumes
+    offsets = aligned_count[None, :] - VOLUME_DAYS + np.arange(VOLUME_DAYS)[:, None]
+    rows = order[np.clip(offsets, 0, n_dates - 1), cols[None, :]]
+    recent = volumes[rows, cols[None, :]]
+    use = (offsets >= 0) & (recent > 0)
+    count = use.sum(axis=0)
+    total = np.where(use, recent, 0.0).sum(axis=0)
+    avg_volume = np.where(valid, np.where(count > 0, total / np.maximum(count, 1), 0.0), 0.0)
+
+    return {name: {'valid': valid, 'relative': relative[name], 'stock': stock, 'avg_volume': avg_volume}
+            for name in benchmarks}
+
+def fill_forward(closes):
+    """Carry the last close over NaN days (leading NaNs stay NaN)"""
+    rows = np.arange(len(closes))
+    last = np.maximum.accumulate(np.where(np.isnan(closes), -1, rows))
+    return np.where(last >= 0, closes[np.maximum(last, 0)], np.nan)
+
+def align_benchmark(calendar, bars):
+    """A secondary benchmark's closes on the (primary benchmark's) calendar,
+    carrying the last close over days it has no bar"""
+    return fill_forward(align_bars(calendar, bars)[0])
+
+def calculate_rs_scores(relative):
+    """Vectorized calculate_ibd_rs_score: 2x 3m relative + 6m + 9m + 12m"""
+    return (
+        RS_WEIGHTS['3m'] * relative['3m'] +
+        RS_WEIGHTS['6m'] * relative['6m'] +
+        RS_WEIGHTS['9m'] * relative['9m'] +
+        RS_WEIGHTS['12m'] * relative['12m']
+    )
+
+def percentile_ranks(scores):
+    """1-99 RS ranks, identical to sorting by score (stable, descending)"""
+    total = len(scores)
+    ranks = np.zeros(total, dtype=np.int64)
+    if total == 0:
+        return ranks
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    position = np.arange(total)
+    ranks[order] = np.minimum(((total - position) / total * 99).astype(np.int64) + 1, 99)
+    return ranks
+
+def score_universe(matrix):
+    """Score every symbol of a build_price_matrix() result
+
+    Returns the calculate_returns() dict plus 'symbols' and 'rs_score'.
+    """
+    result = calculate_returns(matrix['closes'], matrix['volumes'], matrix['benchmark'],
+                               matrix.get('bar_counts'))
+    result['symbols'] = matrix['symbols']
+    result['rs_score'] = calculate_rs_scores(result['relative'])
+    return result
+
+def benchmark_fields(name):
+    """rankings.json (rank, score) column names for a secondary benchmark"""
+    return f"rs_rank_{name.lower()}", f"rs_score_{name.lower()}"
+
+def add_benchmark_ranks(records, results):
+    """Add each secondary benchmark's score and 1-99 rank to to_stock_records() output
+
+    results maps a benchmark name to its score_universe()-shaped result for
+    the same matrix; ranks are among the same records as rs_rank.
+    """
+    for name, result in results.items():
+        rank_field, score_field = benchmark_fields(name)
+        scores = result['rs_score'][np.flatnonzero(result['valid'])]
+        for record, score, rank in zip(records, scores, percentile_ranks(scores)):
+            record[rank_field] = int(rank)
+            record[score_field] = float(score)
+    return records
+
+def to_stock_records(result):
+    """Per-symbol dicts in the shape main() collects into all_stock_data"""
+    records = []
+    for col in np.flatnonzero(result['valid']):
+        records.append({
+            'symbol': result['symbols'][col],
+            'rs_score': float(result['rs_score'][col]),
+            'avg_volume': int(result['avg_volume'][col]),
+            'relative_3m': float(result['relative']['3m'][col]),
+            'relative_6m': float(result['relative']['6m'][col]),
+            'relative_9m': float(result['relative']['9m'][col]),
+            'relative_12m': float(result['relative']['12m'][col]),
+            'stock_return_3m': float(result['stock']['3m'][col]),
+            'stock_return_12m': float(result['stock']['12m'][col])
+        })
+    return records
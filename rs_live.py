@@ -0,0 +1,230 @@
+"""Intraday RS: rescore the whole universe on live prices every few seconds
+
+    python rs_live.py [--interval 60] [--store price_store] [--output rankings_live.json]
+                      [--top 10] [--once]
+
+Between closes, every symbol's RS inputs only depend on one unknown: today's
+price. The anchor closes 63/126/189/252 bars back, SPY's closes on the same
+days and the 20-day average volume are fixed, so they are read once from
+the rolling RS state (rs_state.py) as if the live price were the next bar.
+Each refresh then polls Polygon's all-tickers snapshot
+(/v2/snapshot/locale/us/markets/stocks/tickers) and rescores and re-ranks
+every symbol with a few array operations: score(prices) is the rolling
+state's score() with the live prices applied as one more day.
+
+Symbols that have not traded yet today score on their last close. Average
+volume stays the one of the last 20 completed sessions, and only the SPY
+columns are live (no --benchmarks columns). The anchors are reloaded when
+the daily update appends a day to the store.
+
+rankings_live.json has the rankings.json layout (update_type
+"intraday_live"), so rankings_server.py can serve it:
+
+    python rankings_server.py --rankings rankings_live.json
+
+Try it offline against benchmarks/mock_polygon.py, whose snapshot prices
+drift a little on every request.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import json_stream
+import price_store
+import rs_engine
+import rs_state
+from polygon_client import API_KEY, BASE_URL, PolygonClient
+from process_stocks_daily import format_ranking
+
+SNAPSHOT_PATH = '/v2/snapshot/locale/us/markets/stocks/tickers'
+DEFAULT_OUTPUT = 'rankings_live.json'
+MARKET_TZ = ZoneInfo('America/New_York')
+
+class LiveAnchors:
+    """Fixed RS inputs of every symbol for scoring a live price as the next bar"""
+
+    def __init__(self, state):
+        n = len(state.symbols)
+        rows = np.arange(n)
+        self.symbols = state.symbols
+        self.index = state.index
+        self.last_timestamp = state.last_timestamp
+
+        last = (state.n_bars - 1) % rs_state.ANCHOR_BARS
+        self.last_close = np.where(state.n_bars > 0, state.closes[rows, last], np.nan).astype(np.float64)
+
+        # The live bar is bar number n_bars and enters the calendar window as day + 1
+        slot = (state.day + 1) % state.history_days
+        window = state.window_count - state.present[:, slot] + 1
+        self.valid = (state.n_bars > 0) & (window >= rs_engine.MIN_BARS)
+
+        self.periods = list(rs_engine.PERIODS)
+        days = np.array([rs_engine.PERIODS[p] for p in self.periods])[:, None]
+        anchor = (state.n_bars[None, :] - days) % rs_state.ANCHOR_BARS
+        self.has_period = self.valid[None, :] & (window[None, :] > days)
+        self.anchor_close = state.closes[rows, anchor].astype(np.float64)
+        self.anchor_benchmark = state.benchmark[state.bar_day[rows, anchor] % state.history_days]
+        self.benchmark_close = float(state.benchmark[state.day % state.history_days])
+
+        avg_volume = np.where(state.volume_count > 0, state.volume_sum / np.maximum(state.volume_count, 1), 0.0)
+        self.avg_volume = np.where(self.valid, avg_volume, 0.0)
+
+    def prices(self, quotes):
+        """Live price per symbol column ({symbol: price}); NaN where there is no quote"""
+        prices = np.full(len(self.symbols), np.nan)
+        index = self.index
+        for symbol, price in quotes.items():
+            col = index.get(symbol)
+            if col is not None:
+                prices[col] = price
+        return prices
+
+    def score(self, prices, benchmark_price):
+        """Scores with the live prices as the newest bar, in score_universe() shape"""
+        current = np.where(np.isnan(prices), self.last_close, prices)
+        stock_return = rs_engine.period_return(current[None, :], self.anchor_close)
+        benchmark_return = rs_engine.period_return(benchmark_price, self.anchor_benchmark)
+        stock = np.where(self.has_period, stock_return, 0.0)
+        relative = np.where(self.has_period, stock_return - benchmark_return, 0.0)
+        relative = dict(zip(self.periods, relative))
+        return {
+            'symbols': self.symbols,
+            'valid': self.valid,
+            'relative': relative,
+            'stock': dict(zip(self.periods, stock)),
+            'avg_volume': self.avg_volume,
+            'rs_score': rs_engine.calculate_rs_scores(relative)
+        }
+
+def load_anchors(store_path):
+    """(LiveAnchors, store last date, scores at that close) from the store's RS state"""
+    store = price_store.PriceStore(store_path)
+    state = rs_state.load_for_store(store, rs_state.HISTORY_DAYS)
+    if state is None:
+        print("🔄 Rebuilding rolling RS state from price store...")
+        state = rs_state.RollingState.from_store(store, rs_state.HISTORY_DAYS)
+    anchors = LiveAnchors(state)
+    print(f"✅ Anchors for {int(anchors.valid.sum())} of {len(anchors.symbols)} symbols "
+          f"after {store.last_date()}")
+    return anchors, store.last_date(), state.score()
+
+def ranked(result):
+    """(symbol columns in rank order, their 1-99 ranks) of a score dict"""
+    cols = np.flatnonzero(result['valid'])
+    order = cols[np.argsort(-result['rs_score'][cols], kind='stable')]
+    return order, rs_engine.percentile_ranks(result['rs_score'][order])
+
+def fetch_snapshot(client, base_url=BASE_URL):
+    """({symbol: last price}, SPY's last price, feed time in ns) from the all-tickers snapshot
+
+    Symbols without a trade today are left out.
+    """
+    response = client.get(f"{base_url}{SNAPSHOT_PATH}")
+    if response.status_code != 200:
+        raise RuntimeError(f"Snapshot API error: {response.status_code} - {response.text[:200]}")
+    quotes = {}
+    updated = 0
+    for ticker in response.json().get('tickers', []):
+        price = ((ticker.get('lastTrade') or {}).get('p') or (ticker.get('min') or {}).get('c')
+                 or (ticker.get('day') or {}).get('c'))
+        if price:
+            quotes[ticker['ticker']] = price
+            updated = max(updated, ticker.get('updated') or 0)
+    return quotes, quotes.get('SPY'), updated
+
+def live_rows(result, order, ranks):
+    """rankings.json rows of a live score dict, best first"""
+    rows = []
+    for col, rank in zip(order, ranks):
+        rows.append(format_ranking({
+            'symbol': result['symbols'][col],
+            'rs_rank': int(rank),
+            'rs_score': float(result['rs_score'][col]),
+            'avg_volume': int(result['avg_volume'][col]),
+            'relative_3m': float(result['relative']['3m'][col]),
+            'relative_12m': float(result['relative']['12m'][col]),
+            'stock_return_3m': float(result['stock']['3m'][col]),
+            'stock_return_12m': float(result['stock']['12m'][col])
+        }))
+    return rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Intraday RS rankings from live snapshot prices")
+    parser.add_argument('--store', default=price_store.DEFAULT_PATH,
+                        help="Price store the anchors come from (default: price_store)")
+    parser.add_argument('--interval', type=float, default=60.0, help="Seconds between refreshes")
+    parser.add_argument('--once', action='store_true', help="Refresh once and exit")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f"Live rankings file (default: {DEFAULT_OUTPUT}; '' to skip)")
+    parser.add_argument('--top', type=int, default=10, help="Rows printed per refresh")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not API_KEY:
+        raise SystemExit("❌ ERROR: POLYGON_API_KEY not found!")
+
+    client = PolygonClient(API_KEY, BASE_URL)
+    meta_path = os.path.join(args.store, 'meta.json')
+    stamp = None
+    try:
+        while True:
+            started = time.perf_counter()
+            if os.stat(meta_path).st_mtime_ns != stamp:
+                # First refresh, or the daily update appended a day
+                stamp = os.stat(meta_path).st_mtime_ns
+                anchors, last_date, close_result = load_anchors(args.store)
+                close_order, close_ranks = ranked(close_result)
+                close_rank = dict(zip(close_order.tolist(), close_ranks.tolist()))
+
+            quotes, spy, updated = fetch_snapshot(client)
+            fetched = time.perf_counter()
+            session = datetime.fromtimestamp(updated / 1e9, MARKET_TZ) if updated else None
+            if not spy or session is None:
+                print("⚠️  No SPY price in the snapshot - skipping this refresh")
+            elif session.strftime('%Y-%m-%d') <= last_date:
+                print(f"⚠️  Snapshot is from {session:%Y-%m-%d}, already in the store - "
+                      f"waiting for the next session")
+            else:
+                prices = anchors.prices(quotes)
+                result = anchors.score(prices, spy)
+                order, ranks = ranked(result)
+                scored = time.perf_counter()
+
+                if args.output:
+                    header = {
+                        'last_updated': datetime.now().isoformat(),
+                        'formula_used': 'RS = 2×(3m relative vs S&P500) + 6m + 9m + 12m relative performance',
+                        'total_stocks': len(order),
+                        'benchmark': 'S&P 500 (SPY)',
+                        'update_type': 'intraday_live',
+                        'data_date': session.strftime('%Y-%m-%d'),
+                        'as_of': session.isoformat(timespec='seconds'),
+                        'version': f"live-{session:%Y%m%d%H%M%S}"
+                    }
+                    json_stream.write_json(args.output, header, 'data', live_rows(result, order, ranks))
+                written = time.perf_counter()
+
+                quoted = int(np.count_nonzero(result['valid'] & ~np.isnan(prices)))
+                print(f"\n🔴 {session:%H:%M:%S} ET: {len(order)} ranked ({quoted} traded today), "
+                      f"SPY {spy / anchors.benchmark_close - 1:+.2%} | fetch {(fetched - started) * 1000:.0f} ms, "
+                      f"score+rank {(scored - fetched) * 1000:.1f} ms, write {(written - scored) * 1000:.0f} ms")
+                for col, rank in list(zip(order, ranks))[:args.top]:
+                    change = int(rank) - close_rank.get(int(col), int(rank))
+                    print(f"   {anchors.symbols[col]:6s} RS {int(rank):2d} ({change:+d}) "
+                          f"score {result['rs_score'][col]:7.3f}  3m rel {result['relative']['3m'][col]:+7.1%}")
+
+            if args.once:
+                break
+            time.sleep(max(args.interval - (time.perf_counter() - started), 0))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""rs_engine scoring sharded across a process pool over shared memory
+
+The close/volume matrices and benchmark series are copied once into
+multiprocessing shared memory; each worker attaches to them by name and
+scores a contiguous block of symbol columns against every benchmark with
+rs_engine.calculate_benchmark_returns, writing into a shared output array.
+Nothing per symbol is pickled.
+
+Columns are scored independently, so results are identical to
+rs_engine.score_universe. The pool is opt-in only: without an explicit
+workers count above 1 everything is scored in-process. Starting the pool
+and copying the matrices costs about 0.1s, while one core scores 5000-10000
+symbols x 300 days (the production universe) in 30-55 ms, so the pool only
+pays off on much larger universes with several cores
+(benchmarks/bench_rs_parallel.py measures the crossover on a given machine).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import rs_engine
+
+# Rows of the shared output array per benchmark
+OUTPUTS = (['valid', 'avg_volume', 'rs_score'] + [f"relative_{p}" for p in rs_engine.PERIODS]
+           + [f"stock_{p}" for p in rs_engine.PERIODS])
+
+class SharedArrays:
+    """NumPy arrays in named shared memory blocks, unlinked on close()"""
+
+    def __init__(self):
+        self.blocks = []
+        self.arrays = {}
+        self.specs = {}
+
+    def empty(self, name, shape, dtype):
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        self.blocks.append(block)
+        self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        self.specs[name] = (block.name, tuple(shape), dtype.str)
+        return self.arrays[name]
+
+    def put(self, name, array):
+        array = np.asarray(array)
+        view = self.empty(name, array.shape, array.dtype)
+        view[...] = array
+        return view
+
+    def close(self):
+        self.arrays.clear()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+# Worker-side views, set up once per process by _attach
+_blocks = []
+_arrays = {}
+
+def _attach(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        # Workers share the parent's resource tracker, which forgets the block on unlink
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def _score_columns(arrays, start, stop, n_benchmarks):
+    closes = arrays['closes'][:, start:stop]
+    volumes = arrays['volumes'][:, start:stop]
+    bar_counts = arrays['bar_counts'][start:stop] if 'bar_counts' in arrays else None
+    out = arrays['out']
+    results = rs_engine.calculate_benchmark_returns(
+        closes, volumes, dict(enumerate(arrays['benchmarks'][:n_benchmarks])), bar_counts)
+    for b, result in results.items():
+        rows = out[b]
+        rows[0, start:stop] = result['valid']
+        rows[1, start:stop] = result['avg_volume']
+        rows[2, start:stop] = rs_engine.calculate_rs_scores(result['relative'])
+        for i, period in enumerate(rs_engine.PERIODS):
+            rows[3 + i, start:stop] = result['relative'][period]
+            rows[3 + len(rs_engine.PERIODS) + i, start:stop] = result['stock'][period]
+
+def _score_shard(shard):
+    start, stop, n_benchmarks = shard
+    _score_columns(_arrays, start, stop, n_benchmarks)
+    return stop - start
+
+def _unpack(rows, symbols):
+    periods = list(rs_engine.PERIODS)
+    return {
+        'valid': rows[0].astype(bool),
+        'avg_volume': rows[1].copy(),
+        'rs_score': rows[2].copy(),
+        'relative': {p: rows[3 + i].copy() for i, p in enumerate(periods)},
+        'stock': {p: rows[3 + len(periods) + i].copy() for i, p in enumerate(periods)},
+        'symbols': symbols
+    }
+
+def score_benchmarks(matrix, benchmarks, workers=None):
+    """score_universe() of a price matrix against each benchmark series
+
+    benchmarks maps a name to closes on the matrix calendar. Returns
+    {name: result} in the shape of rs_engine.score_universe. Scored in-process
+    unless workers > 1 is passed.
+    """
+    names = list(benchmarks)
+    closes = matrix['closes']
+    n_symbols = closes.shape[1]
+    workers = min(workers or 1, max(n_symbols, 1))
+    if workers <= 1:
+        results = rs_engine.calculate_benchmark_returns(closes, matrix['volumes'], benchmarks,
+                                                        matrix.get('bar_counts'))
+        for result in results.values():
+            result['symbols'] = matrix['symbols']
+            result['rs_score'] = rs_engine.calculate_rs_scores(result['relative'])
+        return results
+
+    shared = SharedArrays()
+    try:
+        arrays = {
+            'closes': shared.put('closes', closes),
+            'volumes': shared.put('volumes', matrix['volumes']),
+            'benchmarks': shared.put('benchmarks', np.array([benchmarks[name] for name in names],
+                                                            dtype=np.float64).reshape(len(names), -1)),
+            'out': shared.empty('out', (len(names), len(OUTPUTS), n_symbols), np.float64)
+        }
+        if matrix.get('bar_counts') is not None:
+            arrays['bar_counts'] = shared.put('bar_counts', matrix['bar_counts'])
+        bounds = np.linspace(0, n_symbols, workers + 1).astype(int)
+        shards = [(int(start), int(stop), len(names)) for start, stop in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(shared.specs,)) as pool:
+            list(pool.map(_score_shard, shards))
+        return {name: _unpack(arrays['out'][b], matrix['symbols']) for b, name in enumerate(names)}
+    finally:
+        arrays = None
+        shared.close()
+
+def score_universe(matrix, workers=None):
+    """rs_engine.score_universe, sharded across `workers` processes when workers > 1"""
+    return score_benchmarks(matrix, {'benchmark': matrix['benchmark']}, workers)['benchmark']
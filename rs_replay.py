@@ -0,0 +1,311 @@
+"""Historical replay: every day's RS scores and ranks in one vectorized pass
+
+    python rs_replay.py [--store price_store] [--days 252] [--output rank_replay]
+                        [--window 300] [--verify 5] [--fetch]
+
+Day d of the replay is what the daily update would have ranked that day:
+rs_engine.score_universe() on the `window` price store rows ending at d
+(score_day() is that per-day path). Instead of re-aligning each day, the
+whole dates x symbols result is computed at once:
+
+    - cumulative bar counts give each day's aligned bar count per symbol,
+      and valid_row_order() maps a bar number to its row, so the current
+      and 63/126/189/252-bars-back closes (and SPY's on the same rows) are
+      gathered for every day with one fancy index per period
+    - the 20-bar average volume is a difference of cumulative sums over
+      each symbol's bars
+    - the 1-99 ranks come from one row-wise stable argsort
+
+Columns are processed in chunks, so memory stays at a few arrays of
+days x CHUNK. The output directory has the rank_history.py layout, so its
+queries work on it, plus one float32 file per period of relative returns:
+
+    python rank_history.py --path rank_replay cross NVDA --threshold 90
+    relative_3m.f4 ... relative_12m.f4   rows x capacity, NaN where not ranked
+
+Each replayed day needs its full `window` of rows, so --days 252 needs
+days + window - 1 rows. The store only holds the rows the daily update
+keeps (HISTORY_DAYS plus the catch-up margin, about 310-400), so the
+replay stops with an error when it is shorter. --fetch requests the
+missing earlier sessions from Polygon's grouped daily bars (one request
+per session) for this replay only; the store is not changed.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import polygon_client
+import price_store
+import rank_history
+import rs_engine
+import rs_state
+import splits
+
+DEFAULT_OUTPUT = 'rank_replay'
+CHUNK = 4096                     # Symbol columns per pass
+
+def window_rows(matrix, row, window=rs_state.HISTORY_DAYS):
+    """The matrix restricted to the `window` rows ending at `row`"""
+    start = max(row + 1 - window, 0)
+    closes = matrix['closes'][start:row + 1]
+    return {
+        'calendar': matrix['calendar'][start:row + 1],
+        'benchmark': matrix['benchmark'][start:row + 1],
+        'symbols': matrix['symbols'],
+        'bar_counts': (~np.isnan(closes)).sum(axis=0),
+        'closes': closes,
+        'volumes': matrix['volumes'][start:row + 1]
+    }
+
+def score_day(matrix, row, window=rs_state.HISTORY_DAYS):
+    """The per-day path: score_universe() on the window ending at `row`"""
+    return rs_engine.score_universe(window_rows(matrix, row, window))
+
+def replay_columns(closes, volumes, benchmark, rows, window):
+    """Returns for a block of symbol columns on the output `rows`, in calculate_returns() shape
+    with (len(rows), columns) arrays"""
+    n_dates, n_symbols = closes.shape
+    cols = np.arange(n_symbols)[None, :]
+    has_bar = ~np.isnan(closes)
+
+    # Bars up to and including each row, and the ones before each row's window
+    bars = np.cumsum(has_bar, axis=0)
+    before = np.where((rows - window >= 0)[:, None], bars[np.maximum(rows - window, 0)], 0)
+    last_bar = bars[rows] - 1
+    aligned_count = last_bar + 1 - before
+
+    valid = aligned_count >= rs_engine.MIN_BARS
+    valid &= (np.minimum(rows + 1, window) >= rs_engine.MIN_BARS)[:, None]
+
+    order = rs_engine.valid_row_order(closes)
+    last_row = order[np.maximum(last_bar, 0), cols]
+    current = closes[last_row, cols]
+
+    relative = {}
+    stock = {}
+    for period, days in rs_engine.PERIODS.items():
+        has_period = valid & (aligned_count > days)
+        old_row = order[np.maximum(last_bar - days, 0), cols]
+        stock_return = rs_engine.period_return(current, closes[old_row, cols])
+        benchmark_return = rs_engine.period_return(benchmark[last_row], benchmark[old_row])
+        stock[period] = np.where(has_period, stock_return, 0.0)
+        relative[period] = np.where(has_period, stock_return - benchmark_return, 0.0)
+
+    # Positive volumes in bar order, summed cumulatively (integer volumes sum exactly)
+    bar_volumes = np.take_along_axis(volumes, order, axis=0)
+    positive = (bar_volumes > 0) & (np.arange(n_dates)[:, None] < bars[-1][None, :])
+    zero = np.zeros((1, n_symbols))
+    volume_sums = np.vstack([zero, np.cumsum(np.where(positive, bar_volumes, 0.0), axis=0)])
+    volume_counts = np.vstack([zero, np.cumsum(positive, axis=0)])
+    first = np.maximum(last_bar + 1 - rs_engine.VOLUME_DAYS, before)
+    total = np.take_along_axis(volume_sums, last_bar + 1, axis=0) - np.take_along_axis(volume_sums, first, axis=0)
+    count = np.take_along_axis(volume_counts, last_bar + 1, axis=0) - np.take_along_axis(volume_counts, first, axis=0)
+    avg_volume = np.where(valid, np.where(count > 0, total / np.maximum(count, 1), 0.0), 0.0)
+
+    return {'valid': valid, 'relative': relative, 'stock': stock, 'avg_volume': avg_volume}
+
+def row_ranks(scores, valid):
+    """percentile_ranks() of each row's valid scores (0 where not valid)"""
+    order = np.argsort(np.where(valid, -scores, np.inf), axis=1, kind='stable')
+    total = valid.sum(axis=1, keepdims=True)
+    position = np.arange(scores.shape[1])[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranked = np.minimum(((total - position) / total * 99).astype(np.int64) + 1, 99)
+    ranks = np.zeros(scores.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, np.where(position < total, ranked, 0), axis=1)
+    return ranks
+
+def replay(matrix, days=None, window=rs_state.HISTORY_DAYS, chunk=CHUNK):
+    """score_day() for each of the newest `days` rows of a matrix (all rows by default)
+
+    The matrix is PriceStore.matrix()-shaped: the benchmark has a close on
+    every row. Returns a score_universe()-shaped dict of (days, symbols)
+    arrays plus 'calendar' (the replayed rows' timestamps) and 'rank' (1-99,
+    0 where not valid).
+    """
+    n_dates, n_symbols = matrix['closes'].shape
+    rows = np.arange(n_dates if days is None else max(n_dates - days, 0), n_dates)
+    result = {
+        'calendar': np.asarray(matrix['calendar'])[rows],
+        'symbols': matrix['symbols'],
+        'valid': np.zeros((len(rows), n_symbols), dtype=bool),
+        'relative': {period: np.zeros((len(rows), n_symbols)) for period in rs_engine.PERIODS},
+        'stock': {period: np.zeros((len(rows), n_symbols)) for period in rs_engine.PERIODS},
+        'avg_volume': np.zeros((len(rows), n_symbols))
+    }
+    for start in range(0, n_symbols, chunk):
+        block = slice(start, start + chunk)
+        part = replay_columns(matrix['closes'][:, block], matrix['volumes'][:, block],
+                              matrix['benchmark'], rows, window)
+        result['valid'][:, block] = part['valid']
+        result['avg_volume'][:, block] = part['avg_volume']
+        for period in rs_engine.PERIODS:
+            result['relative'][period][:, block] = part['relative'][period]
+            result['stock'][period][:, block] = part['stock'][period]
+    result['rs_score'] = rs_engine.calculate_rs_scores(result['relative'])
+    result['rank'] = row_ranks(result['rs_score'], result['valid'])
+    return result
+
+def rows_needed(days, window=rs_state.HISTORY_DAYS):
+    """Matrix rows for `days` replayed days that each have their full window"""
+    return days + window - 1
+
+def trading_dates_before(client, date, count, base_url=polygon_client.BASE_URL):
+    """The `count` trading dates before `date` (YYYY-MM-DD), from SPY's daily bars"""
+    end = datetime.strptime(date, '%Y-%m-%d') - timedelta(days=1)
+    # About 252 sessions a year, plus holidays
+    start = end - timedelta(days=int(count * 365 / 250) + 15)
+    url = f"{base_url}/v2/aggs/ticker/SPY/range/1/day/{start:%Y-%m-%d}/{end:%Y-%m-%d}"
+    response = client.get(url, params={'adjusted': 'true', 'limit': 50000})
+    if response.status_code != 200:
+        raise SystemExit(f"❌ SPY bars before {date}: HTTP {response.status_code}")
+    dates = sorted({rank_history.ms_to_date(bar['t']) for bar in response.json().get('results', [])})
+    return dates[-count:]
+
+def fetch_earlier(matrix, count, client, base_url=polygon_client.BASE_URL):
+    """The matrix with `count` earlier sessions prepended from grouped daily bars
+
+    The bars are adjusted as of today; the store's are as of the day they
+    were fetched, with confirmed splits applied since. Jumps where the two
+    meet are listed (a split not applied to the store shows up there).
+    """
+    first = rank_history.ms_to_date(matrix['calendar'][0])
+    dates = trading_dates_before(client, first, count, base_url)
+    if len(dates) < count:
+        raise SystemExit(f"❌ Only {len(dates)} trading days before {first} available, {count} needed")
+    index = {symbol: col for col, symbol in enumerate(matrix['symbols'])}
+    calendar = np.zeros(len(dates), dtype=np.int64)
+    benchmark = np.full(len(dates), np.nan)
+    closes = np.full((len(dates), len(index)), np.nan)
+    volumes = np.zeros((len(dates), len(index)))
+
+    def fetch(date):
+        url = f"{base_url}/v2/aggs/grouped/locale/us/market/stocks/{date}"
+        response = client.get(url, params={'adjusted': 'true'})
+        if response.status_code != 200:
+            raise SystemExit(f"❌ Grouped daily bars for {date}: HTTP {response.status_code}")
+        return response.json().get('results', [])
+
+    print(f"📡 Fetching {len(dates)} earlier sessions: {dates[0]} .. {dates[-1]}")
+    for row, results in enumerate(client.map(fetch, dates)):
+        for bar in results:
+            if 'c' not in bar:
+                continue
+            if bar.get('T') == 'SPY':
+                calendar[row] = bar['t']
+                benchmark[row] = bar['c']
+            col = index.get(bar.get('T'))
+            if col is not None:
+                closes[row, col] = bar['c']
+                volumes[row, col] = bar.get('v', 0)
+        if np.isnan(benchmark[row]):
+            raise SystemExit(f"❌ No SPY bar in the grouped daily bars for {dates[row]}")
+
+    extended = dict(matrix,
+                    calendar=np.concatenate([calendar, matrix['calendar']]),
+                    benchmark=np.concatenate([benchmark, matrix['benchmark']]),
+                    closes=np.vstack([closes, matrix['closes']]),
+                    volumes=np.vstack([volumes, matrix['volumes']]))
+    extended['bar_counts'] = (~np.isnan(extended['closes'])).sum(axis=0)
+    seam = len(dates)
+    events = splits.find_events(extended['closes'][:seam + 1], extended['volumes'][:seam + 1],
+                                extended['symbols'], extended['calendar'][:seam + 1], since=seam)
+    splits.report(splits.confirm(events), "Jumps where the fetched sessions meet the store")
+    return extended
+
+def compare_day(result, i, expected):
+    """rs_state.compare_results() of replayed day i against a score_universe() result"""
+    day = {'symbols': result['symbols'], 'valid': result['valid'][i], 'rs_score': result['rs_score'][i],
+           'avg_volume': result['avg_volume'][i],
+           'relative': {period: values[i] for period, values in result['relative'].items()},
+           'stock': {period: values[i] for period, values in result['stock'].items()}}
+    divergences = rs_state.compare_results(expected, day, tolerance=0.0)
+    ranks = rs_engine.percentile_ranks(expected['rs_score'][expected['valid']])
+    if not np.array_equal(result['rank'][i][result['valid'][i]], ranks):
+        divergences.append(('*', 'rank', None, None))
+    return divergences
+
+def save(path, result, start=0):
+    """Write a replay (from day `start` on) as a rank_history directory plus relative_<period>.f4 files"""
+    valid = result['valid'][start:]
+    dates = (np.asarray(result['calendar'][start:], dtype=np.int64) // 86400000) * 86400000
+    scores = np.where(valid, result['rs_score'][start:], np.nan).astype(np.float32)
+    history = rank_history.RankHistory.create(path, result['symbols'], dates,
+                                              result['rank'][start:].astype(np.uint8), scores)
+    capacity = history.meta['capacity']
+    width = len(result['symbols'])
+    for period, values in result['relative'].items():
+        padded = np.full((len(dates), capacity), np.nan, dtype=np.float32)
+        padded[:, :width] = np.where(valid, values[start:], np.nan)
+        padded.tofile(os.path.join(path, f"relative_{period}.f4"))
+    history.meta['replay'] = {'relative': [f"relative_{period}.f4" for period in result['relative']]}
+    rank_history.RankHistory._write_meta(path, history.meta)
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay RS scores and ranks for every stored day")
+    parser.add_argument('--store', default=price_store.DEFAULT_PATH, help="Price store (default: price_store)")
+    parser.add_argument('--days', type=int, default=252, help="Newest trading days to replay (default: 252)")
+    parser.add_argument('--window', type=int, default=rs_state.HISTORY_DAYS,
+                        help=f"Rows each day is scored on, as in the daily update (default: {rs_state.HISTORY_DAYS})")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"Output directory (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--verify', type=int, default=0, metavar='N',
+                        help="Check N evenly spaced days against the per-day score_universe() path")
+    parser.add_argument('--fetch', action='store_true',
+                        help="Fetch the sessions missing before the store from Polygon ($POLYGON_API_KEY)")
+    parser.add_argument('--rps', type=float, default=float(os.environ.get('POLYGON_RPS', 5)),
+                        help="Request rate limit for --fetch (default: $POLYGON_RPS or 5)")
+    args = parser.parse_args()
+
+    store = price_store.PriceStore(args.store)
+    matrix = store.matrix()
+    print(f"✅ Opened price store for {len(matrix['symbols'])} symbols x {store.rows} days")
+    missing = rows_needed(args.days, args.window) - store.rows
+    if missing > 0 and not args.fetch:
+        raise SystemExit(f"❌ {args.days} days with a {args.window}-row window need "
+                         f"{rows_needed(args.days, args.window)} rows, the store has {store.rows}: "
+                         f"pass --fetch to request the {missing} earlier sessions, or fewer --days "
+                         f"(at most {max(store.rows - args.window + 1, 0)})")
+    if missing > 0:
+        if not polygon_client.API_KEY:
+            raise SystemExit("❌ ERROR: POLYGON_API_KEY not found!")
+        client = polygon_client.PolygonClient(requests_per_second=args.rps)
+        try:
+            matrix = fetch_earlier(matrix, missing, client)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    result = replay(matrix, args.days, args.window)
+    elapsed = time.perf_counter() - start
+    ranked = result['valid'].sum(axis=1)
+    scored_days = np.flatnonzero(ranked)
+    print(f"⚡ Replayed {len(result['calendar'])} days in {elapsed:.2f}s: {len(scored_days)} with ranks, "
+          f"{int(ranked.max(initial=0))} symbols on the fullest day")
+    if len(scored_days) < len(result['calendar']):
+        raise SystemExit(f"❌ {len(result['calendar']) - len(scored_days)} of {len(result['calendar'])} "
+                         f"replayed days have no ranked symbols")
+
+    failed = 0
+    if args.verify and len(scored_days):
+        picks = scored_days[np.linspace(0, len(scored_days) - 1, min(args.verify, len(scored_days))).astype(int)]
+        first_row = len(matrix['calendar']) - len(result['calendar'])
+        for i in picks:
+            divergences = compare_day(result, i, score_day(matrix, first_row + i, args.window))
+            date = rank_history.ms_to_date(result['calendar'][i])
+            print(f"   {date}: {'✅ identical' if not divergences else f'❌ {len(divergences)} divergences'}")
+            for divergence in divergences[:5]:
+                print(f"      {divergence}")
+            failed += bool(divergences)
+
+    history = save(args.output, result)
+    print(f"✅ Wrote {args.output}: {history.rows} days x {len(history.symbols)} symbols "
+          f"({history.meta['capacity']} columns allocated)")
+    if failed:
+        raise SystemExit(f"❌ {failed} verified days diverge from the per-day path")
+
+if __name__ == "__main__":
+    main()
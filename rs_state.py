@@ -0,0 +1,193 @@
+"""Rolling per-symbol RS state for O(1) daily updates
+
+Instead of re-aligning and re-scoring the full history every day, the state
+keeps, for every symbol:
+
+    - a ring of its last 253 aligned closes (so the 63/126/189/252-bar
+      anchors are fixed offsets from the newest bar) and their day numbers
+    - a ring of its last 20 volumes with a rolling sum / positive count
+    - which of the last HISTORY_DAYS trading days it has a bar on
+
+plus a ring of benchmark closes by day. Applying a trading day touches a
+constant number of cells per symbol, and scoring reads a constant number.
+Results match rs_engine.score_universe() on the newest HISTORY_DAYS rows of
+the price store.
+"""
+import os
+
+import numpy as np
+
+import rs_engine
+
+STATE_FILE = 'rs_state.npz'
+HISTORY_DAYS = 300                            # Scoring window in trading days
+ANCHOR_BARS = max(rs_engine.PERIODS.values()) + 1
+VOLUME_BARS = rs_engine.VOLUME_DAYS
+
+class RollingState:
+    """Rolling RS inputs for every symbol of a price store"""
+
+    def __init__(self, symbols, history_days=HISTORY_DAYS):
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self.index = {symbol: col for col, symbol in enumerate(self.symbols)}
+        self.history_days = history_days
+        self.day = -1                 # Day number of the newest applied day
+        self.last_timestamp = 0       # Its bar timestamp (ms)
+
+        self.closes = np.full((n, ANCHOR_BARS), np.nan, dtype=np.float32)
+        self.bar_day = np.zeros((n, ANCHOR_BARS), dtype=np.int64)
+        self.n_bars = np.zeros(n, dtype=np.int64)
+        self.volumes = np.zeros((n, VOLUME_BARS), dtype=np.float64)
+        self.volume_sum = np.zeros(n, dtype=np.float64)
+        self.volume_count = np.zeros(n, dtype=np.int64)
+        self.present = np.zeros((n, history_days), dtype=bool)
+        self.window_count = np.zeros(n, dtype=np.int64)
+        self.benchmark = np.full(history_days, np.nan)
+
+    def apply_day(self, timestamp, benchmark_close, closes, volumes):
+        """Advance one trading day (closes NaN where a symbol has no bar)"""
+        self.day += 1
+        self.last_timestamp = int(timestamp)
+        slot = self.day % self.history_days
+        self.benchmark[slot] = benchmark_close
+
+        closes = np.asarray(closes, dtype=np.float32)
+        has_bar = ~np.isnan(closes)
+        if np.isnan(benchmark_close):
+            has_bar[:] = False
+
+        # Slide the calendar window: the row falling out is replaced by today
+        self.window_count -= self.present[:, slot]
+        self.present[:, slot] = has_bar
+        self.window_count += has_bar
+
+        idx = np.flatnonzero(has_bar)
+        ring = self.n_bars[idx] % ANCHOR_BARS
+        self.closes[idx, ring] = closes[idx]
+        self.bar_day[idx, ring] = self.day
+
+        volume = np.asarray(volumes, dtype=np.float64)[idx]
+        vring = self.n_bars[idx] % VOLUME_BARS
+        dropped = self.volumes[idx, vring]
+        self.volume_sum[idx] += np.where(volume > 0, volume, 0.0) - np.where(dropped > 0, dropped, 0.0)
+        self.volume_count[idx] += (volume > 0).astype(np.int64) - (dropped > 0)
+        self.volumes[idx, vring] = volume
+
+        self.n_bars[idx] += 1
+
+    def score(self):
+        """Scores for symbols with a bar on the newest day, in score_universe() shape"""
+        n = len(self.symbols)
+        rows = np.arange(n)
+        traded = self.window_count > 0
+        traded &= self.n_bars > 0
+        last = (self.n_bars - 1) % ANCHOR_BARS
+        traded &= self.bar_day[rows, last] == self.day
+
+        valid = traded & (self.window_count >= rs_engine.MIN_BARS)
+        current = self.closes[rows, last].astype(np.float64)
+        current_benchmark = self.benchmark[self.day % self.history_days]
+
+        relative = {}
+        stock = {}
+        for period, days in rs_engine.PERIODS.items():
+            has_period = valid & (self.window_count > days)
+            anchor = (self.n_bars - 1 - days) % ANCHOR_BARS
+            old = self.closes[rows, anchor].astype(np.float64)
+            old_benchmark = self.benchmark[self.bar_day[rows, anchor] % self.history_days]
+            stock_return = rs_engine.period_return(current, old)
+            benchmark_return = rs_engine.period_return(current_benchmark, old_benchmark)
+            stock[period] = np.where(has_period, stock_return, 0.0)
+            relative[period] = np.where(has_period, stock_return - benchmark_return, 0.0)
+
+        avg_volume = np.where(self.volume_count > 0,
+                              self.volume_sum / np.maximum(self.volume_count, 1), 0.0)
+        return {
+            'symbols': self.symbols,
+            'valid': valid,
+            'relative': relative,
+            'stock': stock,
+            'avg_volume': np.where(valid, avg_volume, 0.0),
+            'rs_score': rs_engine.calculate_rs_scores(relative)
+        }
+
+    @classmethod
+    def from_matrix(cls, matrix, history_days=HISTORY_DAYS):
+        """Build the state by replaying an rs_engine matrix (newest history_days rows)"""
+        state = cls(matrix['symbols'], history_days)
+        start = max(len(matrix['calendar']) - history_days, 0)
+        for row in range(start, len(matrix['calendar'])):
+            state.apply_day(matrix['calendar'][row], matrix['benchmark'][row],
+                            matrix['closes'][row], matrix['volumes'][row])
+        return state
+
+    @classmethod
+    def from_store(cls, store, history_days=HISTORY_DAYS):
+        return cls.from_matrix(store.matrix(history_days), history_days)
+
+    def save(self, path):
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp,
+            symbols=np.array(self.symbols),
+            scalars=np.array([self.day, self.last_timestamp, self.history_days], dtype=np.int64),
+            closes=self.closes, bar_day=self.bar_day, n_bars=self.n_bars,
+            volumes=self.volumes, volume_sum=self.volume_sum, volume_count=self.volume_count,
+            present=self.present, window_count=self.window_count, benchmark=self.benchmark
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            day, last_timestamp, history_days = (int(x) for x in data['scalars'])
+            state = cls(data['symbols'].tolist(), history_days)
+            state.day = day
+            state.last_timestamp = last_timestamp
+            for name in ('closes', 'bar_day', 'n_bars', 'volumes', 'volume_sum', 'volume_count',
+                         'present', 'window_count', 'benchmark'):
+                setattr(state, name, data[name])
+        return state
+
+def load_for_store(store, history_days=HISTORY_DAYS):
+    """The saved state if it matches the store's symbols and newest day, else None"""
+    path = os.path.join(store.path, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        state = RollingState.load(path)
+    except Exception as e:
+        print(f"⚠️  Could not load RS state: {e}")
+        return None
+    if (state.history_days != history_days or store.rows == 0 or
+            state.last_timestamp != int(store.dates[-1]) or
+            state.symbols != store.matrix(1)['symbols']):
+        return None
+    return state
+
+def save_for_store(state, store):
+    state.save(os.path.join(store.path, STATE_FILE))
+
+def compare_results(expected, actual, tolerance=1e-9):
+    """Divergences between two score dicts: list of (symbol, field, expected, actual)"""
+    divergences = []
+    expected_cols = {symbol: col for col, symbol in enumerate(expected['symbols'])}
+    fields = [('rs_score', lambda r, c: r['rs_score'][c]),
+              ('avg_volume', lambda r, c: r['avg_volume'][c])]
+    fields += [(f"relative_{p}", lambda r, c, p=p: r['relative'][p][c]) for p in rs_engine.PERIODS]
+    fields += [(f"stock_return_{p}", lambda r, c, p=p: r['stock'][p][c]) for p in rs_engine.PERIODS]
+
+    for col, symbol in enumerate(actual['symbols']):
+        exp_col = expected_cols.get(symbol)
+        exp_valid = exp_col is not None and bool(expected['valid'][exp_col])
+        if exp_valid != bool(actual['valid'][col]):
+            divergences.append((symbol, 'valid', exp_valid, bool(actual['valid'][col])))
+            continue
+        if not exp_valid:
+            continue
+        for field, get in fields:
+            want, got = float(get(expected, exp_col)), float(get(actual, col))
+            if abs(want - got) > tolerance * max(1.0, abs(want)):
+                divergences.append((symbol, field, want, got))
+    return divergences
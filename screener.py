@@ -0,0 +1,261 @@
+"""Screener queries over the rankings table with sorted-column indexes
+
+Loads rankings.bin (or rankings.json) into typed arrays and keeps each
+numeric column's sort order, so a filter is a binary search over one index
+and the other conditions are checked only on the rows it returns:
+
+    python screener.py "rs_rank >= 90 and raw_volume > 500k order by relative_3m desc limit 25"
+    python screener.py --latest "relative_12m > 100% order by rs_score desc"
+
+Query grammar (keywords are case-insensitive):
+
+    [<field> <op> <value> [and <field> <op> <value> ...]]
+    [order by <field> [asc|desc]] [limit <n>]
+
+ops are >, >=, <, <=, = (== works too). Values take k/M/B suffixes
+(500k) and returns take % (25% is 0.25; plain returns are fractions).
+raw_volume and avg_volume are the same 20-day average volume column.
+Secondary benchmark columns (rs_rank_qqq, rs_score_qqq, ...) are indexed
+too when the rankings have them.
+"""
+import argparse
+import operator
+import re
+
+import numpy as np
+
+import json_stream
+import rankings_artifacts
+import rankings_delta
+
+INDEXED = ['rs_rank', 'rs_score', 'raw_volume', 'relative_3m', 'relative_6m',
+           'relative_9m', 'relative_12m', 'stock_return_3m', 'stock_return_12m']
+# Per-benchmark columns written with process_stocks.py --benchmarks
+BENCHMARK_PREFIXES = ('rs_rank_', 'rs_score_')
+ALIASES = {'avg_volume': 'raw_volume'}
+OPS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+       '=': operator.eq, '==': operator.eq}
+SUFFIXES = {'k': 1e3, 'm': 1e6, 'b': 1e9, '%': 0.01}
+
+CONDITION = re.compile(r'^\s*(\w+)\s*(>=|<=|==|=|>|<)\s*(-?[\d.]+)\s*([kKmMbB%]?)\s*$')
+ORDER = re.compile(r'\s+order\s+by\s+(\w+)(?:\s+(asc|desc))?', re.IGNORECASE)
+LIMIT = re.compile(r'\s+limit\s+(\d+)\s*$', re.IGNORECASE)
+
+def parse_percent(text):
+    return float(text.rstrip('%')) / 100
+
+def is_indexed(name):
+    return name in INDEXED or name.startswith(BENCHMARK_PREFIXES)
+
+def as_column_value(column, value):
+    # Compare float32 columns at float32 so index lookups and row checks agree
+    return column.dtype.type(value) if column.dtype.kind == 'f' else value
+
+class Screener:
+    """Typed columns of one rankings table plus a sorted index per numeric column"""
+
+    def __init__(self, symbols, columns):
+        self.symbols = list(symbols)
+        self.columns = {ALIASES.get(name, name): np.asarray(values) for name, values in columns.items()
+                        if is_indexed(ALIASES.get(name, name))}
+        # order[i] is the row with the i-th smallest value; ties keep rankings order
+        self.order = {name: np.argsort(values, kind='stable') for name, values in self.columns.items()}
+        self.sorted = {name: values[self.order[name]] for name, values in self.columns.items()}
+        self.order_desc = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_bin(cls, path=rankings_artifacts.BIN_PATH):
+        _, columns = rankings_artifacts.read_columns(path)
+        return cls(columns.pop('symbol'), columns)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From rankings.json-style records ("58.3%" returns, "83k" volumes)"""
+        rows = list(rows)
+        columns = {
+            'rs_rank': np.array([row['rs_rank'] for row in rows], dtype=np.uint8),
+            'rs_score': np.array([row['rs_score'] for row in rows], dtype=np.float64),
+            'raw_volume': np.array([row['raw_volume'] for row in rows], dtype=np.float64)
+        }
+        for name in ('relative_3m', 'relative_12m', 'stock_return_3m', 'stock_return_12m'):
+            columns[name] = np.array([parse_percent(row[name]) for row in rows], dtype=np.float32)
+        for name in (rows[0] if rows else {}):
+            if name.startswith(BENCHMARK_PREFIXES):
+                dtype = np.uint8 if name.startswith('rs_rank_') else np.float64
+                columns[name] = np.array([row[name] for row in rows], dtype=dtype)
+        return cls([row['symbol'] for row in rows], columns)
+
+    @classmethod
+    def from_json(cls, path='rankings.json'):
+        return cls.from_rows(json_stream.iter_array(path, 'data'))
+
+    @classmethod
+    def latest(cls, rankings_path='rankings.json', delta_dir=rankings_delta.DELTA_DIR):
+        """rankings.json with the daily deltas since it applied"""
+        rows, _, _, fields = rankings_delta.current_snapshot(rankings_path, delta_dir)
+        ordered = sorted(rows.values(), key=lambda values: (-values[2], values[0]))
+        return cls.from_rows(dict(zip(fields, values)) for values in ordered)
+
+    def _field(self, name):
+        field = ALIASES.get(name, name)
+        if field not in self.columns:
+            raise ValueError(f"Unknown or unavailable field '{name}' (available: {', '.join(self.columns)})")
+        return field
+
+    def _bounds(self, field, op, value):
+        """[lo, hi) positions in the field's sorted index that satisfy the condition"""
+        values = self.sorted[field]
+        value = as_column_value(values, value)
+        if op in ('>', '>='):
+            return np.searchsorted(values, value, side='right' if op == '>' else 'left'), len(values)
+        if op in ('<', '<='):
+            return 0, np.searchsorted(values, value, side='left' if op == '<' else 'right')
+        return np.searchsorted(values, value, side='left'), np.searchsorted(values, value, side='right')
+
+    def select(self, conditions=(), order_by=None, descending=False, limit=None):
+        """Row numbers (rankings order) matching every (field, op, value) condition
+
+        The narrowest condition's index range supplies the candidates; the
+        others are checked on those rows only. A broad filter with order by
+        and limit walks the order_by index instead and stops at `limit` rows.
+        """
+        conditions = [(self._field(name), op, value) for name, op, value in conditions]
+        ranges = [(field, op, value, *self._bounds(field, op, value)) for field, op, value in conditions]
+        ranges.sort(key=lambda r: r[4] - r[3])
+        selected = ranges[0][4] - ranges[0][3] if ranges else len(self)
+        if order_by is not None:
+            order_by = self._field(order_by)
+            if limit is not None and selected * 8 > len(self):
+                return self._ordered_scan(conditions, order_by, descending, limit)
+
+        if ranges:
+            field, _, _, lo, hi = ranges[0]
+            rows = self.order[field][lo:hi]
+            for field, op, value, _, _ in ranges[1:]:
+                rows = self._keep(rows, field, op, value)
+        else:
+            rows = np.arange(len(self))
+
+        # Ties keep rankings order in either direction
+        if order_by is None:
+            rows = np.sort(rows)
+        elif len(rows) * 8 > len(self):
+            # Many matches: walk the order_by index instead of sorting them
+            mask = np.zeros(len(self), dtype=bool)
+            mask[rows] = True
+            index = self._index(order_by, descending)
+            rows = index[mask[index]]
+        else:
+            rows = np.sort(rows)
+            values = self.columns[order_by][rows].astype(np.float64)
+            rows = rows[np.argsort(-values if descending else values, kind='stable')]
+        return rows[:limit] if limit is not None else rows
+
+    def _keep(self, rows, field, op, value):
+        column = self.columns[field]
+        return rows[OPS[op](column[rows], as_column_value(column, value))]
+
+    def _ordered_scan(self, conditions, order_by, descending, limit):
+        """First `limit` matches in order_by order, checking the index a chunk at a time"""
+        index = self._index(order_by, descending)
+        step = max(limit * 4, 1024)
+        found = []
+        remaining = limit
+        for start in range(0, len(index), step):
+            rows = index[start:start + step]
+            for field, op, value in conditions:
+                rows = self._keep(rows, field, op, value)
+            found.append(rows)
+            remaining -= len(rows)
+            if remaining <= 0:
+                break
+        return np.concatenate(found)[:limit] if found else np.empty(0, dtype=np.int64)
+
+    def _index(self, field, descending=False):
+        """Rows in field order; descending order also keeps ties in rankings order"""
+        if not descending:
+            return self.order[field]
+        if field not in self.order_desc:
+            self.order_desc[field] = np.argsort(-self.columns[field].astype(np.float64), kind='stable')
+        return self.order_desc[field]
+
+    def query(self, text):
+        """Run a query string; returns (rows, order_by field or None)"""
+        conditions, order_by, descending, limit = parse_query(text)
+        return self.select(conditions, order_by, descending, limit), order_by
+
+    def record(self, row):
+        return dict({'symbol': self.symbols[row]},
+                    **{name: values[row].item() for name, values in self.columns.items()})
+
+def parse_query(text):
+    """(conditions, order_by, descending, limit) from a query string"""
+    text = ' ' + text.strip()
+    limit = None
+    match = LIMIT.search(text)
+    if match:
+        limit = int(match.group(1))
+        text = text[:match.start()]
+    order_by, descending = None, False
+    match = ORDER.search(text)
+    if match:
+        if text[match.end():].strip():
+            raise ValueError(f"Unexpected text after order by: '{text[match.end():].strip()}'")
+        order_by = match.group(1)
+        descending = (match.group(2) or '').lower() == 'desc'
+        text = text[:match.start()]
+
+    conditions = []
+    if text.strip():
+        for part in re.split(r'\s+and\s+', text.strip(), flags=re.IGNORECASE):
+            match = CONDITION.match(part)
+            if not match:
+                raise ValueError(f"Cannot parse condition '{part.strip()}' (expected e.g. rs_rank >= 90)")
+            name, op, number, suffix = match.groups()
+            conditions.append((name, op, float(number) * SUFFIXES.get(suffix.lower(), 1)))
+    return conditions, order_by, descending, limit
+
+def format_row(record, order_by=None):
+    line = (f"{record['symbol']:6s} | {record['rs_rank']:2d} | {record['rs_score']:8.4f} | "
+            f"{record['raw_volume'] / 1000:9.0f}k | {record['relative_3m'] * 100:7.1f}% | "
+            f"{record['relative_12m'] * 100:8.1f}%")
+    if order_by and order_by not in ('rs_rank', 'rs_score', 'raw_volume', 'relative_3m', 'relative_12m'):
+        line += f" | {order_by} {record[order_by]:.4f}"
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen the RS rankings table")
+    parser.add_argument('query', nargs='?', default='order by rs_score desc limit 20',
+                        help="e.g. \"rs_rank >= 90 and raw_volume > 500k order by relative_3m desc\"")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--json', metavar='PATH', help="Read a rankings.json instead of rankings.bin")
+    source.add_argument('--latest', action='store_true',
+                        help="Read rankings.json with the daily deltas since it applied")
+    parser.add_argument('--bin', default=rankings_artifacts.BIN_PATH, help="rankings.bin path")
+    args = parser.parse_args()
+
+    if args.latest:
+        screener = Screener.latest()
+    elif args.json:
+        screener = Screener.from_json(args.json)
+    else:
+        screener = Screener.from_bin(args.bin)
+
+    try:
+        conditions, order_by, descending, limit = parse_query(args.query)
+        rows = screener.select(conditions, order_by, descending)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+    print(f"🔎 {len(rows)} of {len(screener)} stocks match")
+    print("Symbol | RS | Score    | Avg volume | 3M Rel   | 12M Rel")
+    print("-" * 60)
+    for row in rows[:limit]:
+        print(format_row(screener.record(row), order_by and screener._field(order_by)))
+
+if __name__ == "__main__":
+    main()
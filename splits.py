@@ -0,0 +1,309 @@
+"""Split detection and in-place adjustment of the price store
+
+Polygon serves split-adjusted bars, but only as of the day they are
+requested: the store keeps every bar on the basis it was fetched on. When a
+stock splits, the first post-split grouped bar lands next to pre-split
+history and every lookback across it sees a 2x, 10x, ... move (the 4724%
+relative_12m kind). A bad print shows up the same way for one day.
+
+find_events() scans every symbol's consecutive bars in one vectorized pass
+and returns the discontinuities:
+
+    split     the close jumps by close to a standard split ratio (2:1, 3:2,
+              1:10, ...) and stays there
+    bad_bar   one bar far off both neighbours, which agree with each other
+    jump      any other move of JUMP_REPORT x or more (listed, not changed)
+
+A split is only applied once Polygon's splits reference lists it for the
+day of the jump. The volume moving by the same factor over the following
+VOLUME_BARS bars is reported as supporting evidence but never applies a
+split on its own: a crash on heavy volume looks the same. Until the
+reference lists it a split candidate stays pending. apply() divides the
+closes before a confirmed split by its factor and multiplies the volumes by
+it, and drops bad bars, in place in the store, so the affected symbols are
+corrected without refetching them. The rolling RS state is deleted so it is
+rebuilt from the adjusted history.
+
+    python splits.py scan [--store price_store] [--reference] [--apply]
+    python splits.py log                      adjustments applied so far
+"""
+import argparse
+import os
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+import polygon_client
+import price_store
+import rs_engine
+import rs_state
+
+# Price factors of standard splits (previous close / new close), forward and reverse
+FACTORS = np.array(sorted({f for n in (1.5, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50, 100)
+                           for f in (n, 1 / n)}))
+MIN_JUMP = 1.4          # Smallest bar-to-bar move looked at (3:2 splits are 1.5)
+FACTOR_TOLERANCE = 0.10 # A split candidate's move is within 10% of its factor
+REVERT_TOLERANCE = 0.15 # A bad bar's neighbours agree within 15%
+BAD_BAR_JUMP = 1.8
+JUMP_REPORT = 2.0
+VOLUME_BARS = 10        # Bars either side compared for the volume test
+MIN_VOLUME_BARS = 5     # Bars after a split needed before volume alone confirms it
+RECHECK_ROWS = 10       # Newest rows the daily check scans (pending splits get confirmed later)
+REFERENCE_PATH = '/v3/reference/splits'
+
+def find_events(closes, volumes, symbols, calendar, since=0):
+    """Discontinuities whose new-basis bar is on row `since` or later
+
+    closes/volumes are dates x symbols (NaN close where there is no bar).
+    Returns dicts with symbol, col, row, date, kind, ratio (previous close /
+    close), factor (nearest standard split factor, or None), volume_ratio
+    (median volume after / before) and bars_after.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n_dates, n_symbols = closes.shape
+    if n_dates < 2:
+        return []
+    order = rs_engine.valid_row_order(closes)
+    counts = (~np.isnan(closes)).sum(axis=0)
+    bars = np.take_along_axis(closes, order, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.log(bars[:-1] / bars[1:])
+    log_ratio[~np.isfinite(log_ratio)] = 0.0
+    k, cols = np.nonzero(np.abs(log_ratio) >= np.log(MIN_JUMP))
+    k += 1                                   # Bar number of the first bar on the new level
+    rows = order[k, cols]
+    keep = rows >= since
+    k, cols, rows = k[keep], cols[keep], rows[keep]
+    if not len(k):
+        return []
+    ratio = np.exp(log_ratio[k - 1, cols])
+
+    # Bad bar: the next bar is back near the previous one
+    has_next = k + 1 < counts[cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        back = np.abs(np.log(bars[np.minimum(k + 1, n_dates - 1), cols] / bars[k - 1, cols]))
+    bad = has_next & (back < np.log(1 + REVERT_TOLERANCE)) & (np.abs(np.log(ratio)) >= np.log(BAD_BAR_JUMP))
+    # ... and the move back is part of the same bad bar, not an event of its own
+    bad_keys = set(zip((k[bad] + 1).tolist(), cols[bad].tolist()))
+    reverting = np.array([(a, b) in bad_keys for a, b in zip(k.tolist(), cols.tolist())], dtype=bool)
+
+    nearest = np.abs(np.log(ratio)[:, None] - np.log(FACTORS)[None, :]).argmin(axis=1)
+    factor = FACTORS[nearest]
+    is_split = ~bad & (np.abs(np.log(ratio / factor)) < np.log(1 + FACTOR_TOLERANCE))
+
+    # Median positive volume of the bars after the jump over the bars before it
+    volumes = np.asarray(volumes, dtype=np.float64)
+    bar_volumes = np.take_along_axis(volumes, order, axis=0)
+    offsets = np.arange(VOLUME_BARS)[None, :]
+    after = k[:, None] + offsets
+    before = k[:, None] - VOLUME_BARS + offsets
+    after_ok = after < counts[cols][:, None]
+    before_ok = before >= 0
+    after_v = np.where(after_ok, bar_volumes[np.minimum(after, n_dates - 1), cols[:, None]], np.nan)
+    before_v = np.where(before_ok, bar_volumes[np.maximum(before, 0), cols[:, None]], np.nan)
+    after_v[after_v <= 0] = np.nan
+    before_v[before_v <= 0] = np.nan
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        # Candidates without volume on one side get NaN (All-NaN slice warnings)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        volume_ratio = np.nanmedian(after_v, axis=1) / np.nanmedian(before_v, axis=1)
+    bars_after = after_ok.sum(axis=1)
+
+    events = []
+    for i in np.flatnonzero(~reverting):
+        kind = 'bad_bar' if bad[i] else 'split' if is_split[i] else 'jump'
+        if kind == 'jump' and abs(np.log(ratio[i])) < np.log(JUMP_REPORT):
+            continue
+        events.append({
+            'symbol': symbols[cols[i]],
+            'col': int(cols[i]),
+            'row': int(rows[i]),
+            'date': datetime.utcfromtimestamp(int(calendar[rows[i]]) / 1000).strftime('%Y-%m-%d'),
+            'kind': kind,
+            'ratio': float(ratio[i]),
+            'factor': float(factor[i]) if kind == 'split' else None,
+            'volume_ratio': float(volume_ratio[i]) if np.isfinite(volume_ratio[i]) else None,
+            'bars_after': int(bars_after[i])
+        })
+    return events
+
+def volume_agrees(event):
+    """The volume moved by at least half the split factor (in log terms) over MIN_VOLUME_BARS or more bars"""
+    ratio = event['volume_ratio']
+    return (ratio is not None and event['bars_after'] >= MIN_VOLUME_BARS and
+            np.log(ratio) / np.log(event['factor']) >= 0.5)
+
+def confirm(events, reference=None):
+    """Set each event's 'status': confirmed, pending (splits) or flagged (jumps)
+
+    reference is {date: {symbol: factor}} from Polygon's splits for the
+    event dates; only a split listed there is confirmed, with the listed
+    factor. Other split candidates stay pending (source 'volume' when the
+    volume agrees). Bad bars are confirmed by their neighbours.
+    """
+    reference = reference or {}
+    for event in events:
+        known = reference.get(event['date'], {}).get(event['symbol'])
+        if known and abs(np.log(event['ratio'] / known)) < np.log(1.5):
+            # The splits reference settles it, even when the day's move blurs the ratio
+            event.update(kind='split', factor=known, status='confirmed', source='reference')
+        elif event['kind'] == 'bad_bar':
+            event.update(status='confirmed', source='neighbours')
+        elif event['kind'] == 'split':
+            event.update(status='pending', source='volume' if volume_agrees(event) else None)
+        else:
+            event.update(status='flagged', source=None)
+    return events
+
+def apply(store, events):
+    """Adjust the store in place for the confirmed events; returns the ones applied"""
+    if store.mode != 'r+':
+        raise ValueError("Price store opened read-only")
+    applied = []
+    for event in events:
+        if event.get('status') != 'confirmed' or (event['kind'] == 'split' and event['source'] != 'reference'):
+            continue
+        col, row = event['col'], event['row']
+        if event['kind'] == 'split':
+            factor = event['factor']
+            store.closes[:row, col] = (store.closes[:row, col].astype(np.float64) / factor).astype(np.float32)
+            store.volumes[:row, col] = np.round(store.volumes[:row, col].astype(np.float64) * factor).astype(np.uint64)
+        else:
+            store.closes[row, col] = np.nan
+            store.volumes[row, col] = 0
+        applied.append(event)
+    if applied:
+        store._flush()
+        store.meta.setdefault('adjustments', []).extend(
+            {'symbol': event['symbol'], 'date': event['date'], 'kind': event['kind'],
+             'factor': event['factor'], 'source': event['source'], 'applied': datetime.now().isoformat()}
+            for event in applied)
+        store._write_meta(store.path, store.meta)
+        # The rolling state holds closes on the old basis
+        state_path = os.path.join(store.path, rs_state.STATE_FILE)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    return applied
+
+def describe(event):
+    text = f"{event['symbol']:6s} {event['date']} {event['kind']:7s} x{1 / event['ratio']:.4g}"
+    if event['kind'] == 'split':
+        text += f" (factor {event['factor']:g}"
+        if event['status'] == 'confirmed':
+            text += f", confirmed by {event['source']})"
+        else:
+            text += f", {event['status']}: not in the splits reference" + (
+                ", volume agrees)" if event['source'] == 'volume' else ")")
+    if event['volume_ratio'] is not None:
+        text += f"  volume x{event['volume_ratio']:.2f} over {event['bars_after']} bars"
+    return text
+
+def report(events, title="Price discontinuities"):
+    """Print the events, one line each"""
+    if not events:
+        return
+    print(f"⚠️  {title}: {len(events)}")
+    for event in events:
+        print(f"   {describe(event)}")
+
+def fetch_reference(client, date, base_url):
+    """{symbol: price factor} of the splits Polygon lists for an execution date"""
+    try:
+        response = client.get(f"{base_url}{REFERENCE_PATH}", params={'execution_date': date, 'limit': 1000})
+        if response.status_code == 200:
+            return {split['ticker']: split['split_to'] / split['split_from']
+                    for split in response.json().get('results', [])
+                    if split.get('split_from') and split.get('split_to')}
+        print(f"⚠️  Splits reference for {date}: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️  Splits reference for {date}: {e}")
+    return {}
+
+def reference_lookup(client, base_url, fetched_dates=()):
+    """lookup(date) -> {symbol: factor} of the splits that can explain a jump on `date`
+
+    Bars are adjusted as of the day they are fetched, so a bar fetched in
+    this run for a past day is already on the basis of any split executed
+    since: a catch-up that spans a split shows the jump on its first day.
+    The splits of `date` itself and of every later date in fetched_dates
+    (the days fetched in this run) count. Each date is fetched once.
+    """
+    cache = {}
+    def splits_on(date):
+        if date not in cache:
+            cache[date] = fetch_reference(client, date, base_url)
+        return cache[date]
+    def lookup(date):
+        reference = {}
+        for day in [date] + sorted(day for day in fetched_dates if day > date):
+            reference.update(splits_on(day))
+        return reference
+    return lookup
+
+def references_for(events, lookup):
+    """{date: {symbol: factor}} for the dates of the split candidates (lookup(date) -> {symbol: factor})"""
+    if lookup is None:
+        return {}
+    return {date: lookup(date) for date in sorted({event['date'] for event in events if event['kind'] != 'jump'})}
+
+def check_recent(store, lookup=None, rows=RECHECK_ROWS):
+    """Scan the newest rows of the store, apply confirmed events and list the rest
+
+    lookup(date) returns Polygon's splits for a date (see reference_lookup());
+    it is only called for the dates of split candidates. Returns the applied
+    events.
+    """
+    # Enough rows before the scanned ones for each symbol's previous bar and the volume test
+    start = max(store.rows - rows - 2 * VOLUME_BARS - 30, 0)
+    events = find_events(store.closes[start:], store.volumes[start:], store.symbols,
+                         store.dates[start:], since=store.rows - rows - start)
+    events = confirm(events, references_for(events, lookup))
+    for event in events:
+        event['row'] += start
+    applied = apply(store, events)
+    report(applied, "Adjusted in place")
+    report([event for event in events if event not in applied], "Not adjusted")
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description="Split detection for the price store")
+    parser.add_argument('--store', default=price_store.DEFAULT_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan = commands.add_parser('scan', help="List discontinuities in the whole history")
+    scan.add_argument('--reference', action='store_true',
+                      help="Look the split candidates up in Polygon's splits reference ($POLYGON_API_KEY)")
+    scan.add_argument('--apply', action='store_true', help="Adjust the store for confirmed ones")
+    commands.add_parser('log', help="Adjustments applied to the store")
+    args = parser.parse_args()
+
+    if args.command == 'log':
+        store = price_store.PriceStore(args.store)
+        for entry in store.meta.get('adjustments', []):
+            factor = f" factor {entry['factor']:g}" if entry['factor'] else ''
+            print(f"{entry['applied'][:19]}  {entry['symbol']:6s} {entry['date']} {entry['kind']}{factor} "
+                  f"({entry['source']})")
+        return
+
+    store = price_store.PriceStore(args.store, mode='r+' if args.apply else 'r')
+    events = find_events(store.closes, store.volumes, store.symbols, store.dates)
+    if args.reference:
+        client = polygon_client.PolygonClient()
+        try:
+            events = confirm(events, references_for(events, reference_lookup(client, polygon_client.BASE_URL)))
+        finally:
+            client.close()
+    else:
+        events = confirm(events)
+    print(f"Scanned {len(store.symbols)} symbols x {store.rows} days")
+    if not events:
+        print("✅ No discontinuities")
+    elif args.apply:
+        applied = apply(store, events)
+        report(applied, "Adjusted in place")
+        report([event for event in events if event not in applied], "Not adjusted")
+    else:
+        report(events)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""rs_engine against the frozen per-stock baseline (tests/baseline.py)"""
+import numpy as np
+import pytest
+
+pytest.importorskip('pandas')
+
+import rs_engine
+from tests import baseline
+
+DAY_MS = 86400000
+START_MS = 1_672_722_000_000  # 2023-01-03 05:00 UTC
+
+def weekdays(n_days):
+    stamps = []
+    t = START_MS
+    while len(stamps) < n_days:
+        if (t // DAY_MS + 3) % 7 < 5:
+            stamps.append(t)
+        t += DAY_MS
+    return stamps
+
+def make_universe(n_symbols=300, n_days=300, seed=0):
+    """SPY bars and (symbol, bars) pairs covering the cases the rebuild sees"""
+    rng = np.random.default_rng(seed)
+    stamps = weekdays(n_days + 5)
+    closes = rng.uniform(2, 300, n_symbols + 1) * np.exp(
+        np.cumsum(rng.normal(0.0003, 0.02, (len(stamps), n_symbols + 1)), axis=0))
+    volumes = rng.integers(0, 5_000_000, (len(stamps), n_symbols + 1))
+    volumes[rng.random(volumes.shape) < 0.05] = 0
+
+    # SPY misses a few sessions and the last five days, which some stocks have
+    spy_rows = np.setdiff1d(np.arange(n_days), rng.choice(n_days, 3, replace=False))
+    spy_bars = [{'t': stamps[i], 'c': float(closes[i, 0]), 'v': int(volumes[i, 0])} for i in spy_rows]
+
+    universe = []
+    for j in range(1, n_symbols + 1):
+        rows = np.arange(n_days)
+        kind = j % 6
+        if kind == 1:    # A handful of missing bars
+            rows = np.setdiff1d(rows, rng.choice(n_days, rng.integers(1, 10), replace=False))
+        elif kind == 2:  # Listed recently: around the 252-bar minimum
+            rows = rows[-int(rng.integers(240, 265)):]
+        elif kind == 3:  # Bars after the benchmark's last session
+            rows = np.arange(n_days + int(rng.integers(1, 6)))
+        bars = [{'t': stamps[i], 'c': float(closes[i, j]), 'v': int(volumes[i, j])} for i in rows]
+        if kind == 4:    # Unsorted, with a non-positive close 63 bars back
+            bars[-64]['c'] = 0.0
+            rng.shuffle(bars)
+        universe.append((f"S{j:04d}", bars))
+    return spy_bars, universe
+
+def baseline_records(spy_bars, universe):
+    records = {}
+    for symbol, bars in universe:
+        relative, stock, avg_volume = baseline.calculate_aligned_returns(bars, spy_bars)
+        if relative is not None:
+            records[symbol] = {
+                'symbol': symbol,
+                'rs_score': baseline.calculate_ibd_rs_score(relative),
+                'avg_volume': int(avg_volume),
+                **{f"relative_{p}": relative[p] for p in rs_engine.PERIODS},
+                'stock_return_3m': stock['3m'],
+                'stock_return_12m': stock['12m']
+            }
+    return records
+
+def engine_records(spy_bars, universe):
+    result = rs_engine.score_universe(rs_engine.build_price_matrix(spy_bars, universe))
+    return {record['symbol']: record for record in rs_engine.to_stock_records(result)}
+
+def test_scores_match_baseline():
+    spy_bars, universe = make_universe()
+    # Bars past the benchmark's last session count toward the baseline's
+    # 20-bar volume average but not toward rs_engine's calendar-aligned one
+    # (the rebuild fetches SPY for the same range, so this does not occur there)
+    off_calendar = {symbol for j, (symbol, _) in enumerate(universe, start=1) if j % 6 == 3}
+    expected = baseline_records(spy_bars, universe)
+    actual = engine_records(spy_bars, universe)
+
+    assert set(actual) == set(expected)
+    assert len(expected) > 200
+    for symbol, want in expected.items():
+        got = actual[symbol]
+        for field in want:
+            if field == 'avg_volume' and symbol in off_calendar:
+                continue
+            assert got[field] == want[field], (symbol, field)
+
+def test_ranks_match_sorted_loop():
+    spy_bars, universe = make_universe(seed=1)
+    records = list(engine_records(spy_bars, universe).values())
+    ranks = rs_engine.percentile_ranks(np.array([record['rs_score'] for record in records]))
+    # The rank loop in process_stocks.main()
+    by_score = sorted(records, key=lambda x: x['rs_score'], reverse=True)
+    expected = {record['symbol']: min(int(((len(by_score) - i) / len(by_score)) * 99) + 1, 99)
+                for i, record in enumerate(by_score)}
+    assert [expected[record['symbol']] for record in records] == ranks.tolist()
+
+def test_short_history_is_skipped_like_baseline():
+    spy_bars, universe = make_universe(n_symbols=6, n_days=260)
+    short = [(symbol, bars[-251:]) for symbol, bars in universe]
+    assert baseline_records(spy_bars, short) == {}
+    assert engine_records(spy_bars, short) == {}
@@ -0,0 +1,245 @@
+"""Persisted index of the ticker universe with security metadata
+
+universe.json keeps one entry per symbol ever listed:
+
+    type        Polygon security type (CS, ADRC, ETF, WARRANT, RIGHT, UNIT, PFD, ...)
+    exchange    primary exchange MIC
+    name
+    active      false once Polygon reports the symbol delisted (or a full
+                refresh no longer lists it)
+    first_seen, last_seen   dates of the refreshes that first/last listed it
+    delisted    delisting date, or null
+    updated     Polygon's last_updated_utc for the entry
+
+A refresh normally pages /v3/reference/tickers sorted by last_updated_utc
+(then inactive tickers by delisted_utc), newest first, and stops at the
+first entry older than the previous refresh, so it costs a request or two.
+Every FULL_REFRESH_DAYS (or with --full) it lists every active ticker again
+and marks whatever is missing inactive.
+
+The rebuild ranks tradable(): active symbols of RANKED_TYPES, so warrants,
+rights, units, preferreds and funds never take a fetch slot.
+
+    python universe.py refresh [--full]
+    python universe.py info
+    python universe.py show ABVEW
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+DEFAULT_PATH = 'universe.json'
+VERSION = 1
+RANKED_TYPES = ('CS', 'ADRC', 'OS')     # Common stock, ADRs of common stock, ordinary shares
+FULL_REFRESH_DAYS = 7
+PAGE_LIMIT = 1000
+FIELDS = ['type', 'exchange', 'name', 'active', 'first_seen', 'last_seen', 'delisted', 'updated']
+TICKERS_PATH = '/v3/reference/tickers'
+
+def valid_symbol(symbol):
+    """US share symbols the rankings can carry (BRK.B yes, ABC.WS / ABC- no)"""
+    return (0 < len(symbol) <= 6 and not symbol.endswith('.')
+            and symbol.replace('.', '').isalnum())
+
+def parse_types(text):
+    return tuple(t.strip().upper() for t in text.split(',') if t.strip())
+
+def iter_ticker_pages(client, params, base_url):
+    """Result lists of /v3/reference/tickers, following next_url"""
+    url = f"{base_url}{TICKERS_PATH}"
+    params = dict(params, market='stocks', limit=PAGE_LIMIT)
+    while url:
+        response = client.get(url, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Tickers API error: {response.status_code} - {response.text[:200]}")
+        data = response.json()
+        yield data.get('results', [])
+        # next_url already carries the cursor and query; the client adds the API key
+        url = data.get('next_url')
+        params = None
+
+class Universe:
+    """Symbol -> metadata dict, loaded from and saved to universe.json"""
+
+    def __init__(self, path=DEFAULT_PATH, symbols=None, meta=None):
+        self.path = path
+        self.symbols = symbols or {}
+        self.meta = meta or {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        fields = data.get('fields', FIELDS)
+        symbols = {symbol: dict(zip(fields, values)) for symbol, values in data['symbols'].items()}
+        return cls(path, symbols, {key: value for key, value in data.items() if key not in ('fields', 'symbols')})
+
+    def save(self):
+        data = dict(self.meta, version=VERSION, fields=FIELDS,
+                    symbols={symbol: [entry.get(field) for field in FIELDS]
+                             for symbol, entry in sorted(self.symbols.items())})
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+    def __contains__(self, symbol):
+        return symbol in self.symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def get(self, symbol):
+        return self.symbols.get(symbol)
+
+    def tradable(self, types=RANKED_TYPES):
+        """Active symbols of the given security types, sorted"""
+        return sorted(symbol for symbol, entry in self.symbols.items()
+                      if entry['active'] and entry['type'] in types and valid_symbol(symbol))
+
+    def needs_full_refresh(self, now=None):
+        last = self.meta.get('full_refresh')
+        if not self.symbols or not last:
+            return True
+        return (now or datetime.now()) - datetime.fromisoformat(last) >= timedelta(days=FULL_REFRESH_DAYS)
+
+    def _merge(self, ticker, today):
+        """Add or update one API record; returns 'added', 'changed' or None"""
+        if ticker.get('locale', 'us') != 'us':
+            return None
+        symbol = ticker.get('ticker', '')
+        entry = self.symbols.get(symbol)
+        new = {
+            'type': ticker.get('type'),
+            'exchange': ticker.get('primary_exchange'),
+            'name': ticker.get('name'),
+            'active': bool(ticker.get('active', True)),
+            'delisted': (ticker.get('delisted_utc') or '')[:10] or None,
+            'updated': ticker.get('last_updated_utc')
+        }
+        if entry is None:
+            self.symbols[symbol] = dict(new, first_seen=today, last_seen=today if new['active'] else None)
+            return 'added'
+        if not new['active'] and entry['active'] and (entry['last_seen'] or '') > (new['delisted'] or ''):
+            # An old listing of a symbol that has since been reused
+            return None
+        changed = any(entry.get(field) != value for field, value in new.items() if field != 'updated')
+        entry.update(new)
+        if new['active']:
+            entry['last_seen'] = today
+            entry['delisted'] = None
+        return 'changed' if changed else None
+
+    def refresh(self, client, base_url, full=None, now=None):
+        """Update the index from the API; returns {'added', 'changed', 'delisted', 'requests', 'full'}"""
+        now = now or datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        full = self.needs_full_refresh(now) if full is None else full
+        stats = {'added': 0, 'changed': 0, 'delisted': 0, 'requests': 0, 'full': full}
+        listed = set()
+
+        def merge_pages(params, stop_field=None, since=None):
+            newest = since
+            for page in iter_ticker_pages(client, params, base_url):
+                stats['requests'] += 1
+                older = False
+                for ticker in page:
+                    stamp = ticker.get(stop_field) if stop_field else None
+                    if since and stamp and stamp < since:
+                        older = True
+                        continue
+                    result = self._merge(ticker, today)
+                    listed.add(ticker.get('ticker'))
+                    if result:
+                        stats[result] += 1
+                    if stamp and (newest is None or stamp > newest):
+                        newest = stamp
+                if older:
+                    break
+            return newest
+
+        if full:
+            seen_before = {symbol for symbol, entry in self.symbols.items() if entry['active']}
+            merge_pages({'active': 'true', 'sort': 'ticker', 'order': 'asc'})
+            for symbol in seen_before - listed:
+                entry = self.symbols[symbol]
+                entry['active'] = False
+                entry['delisted'] = entry['delisted'] or today
+                stats['delisted'] += 1
+            self.meta['full_refresh'] = now.isoformat(timespec='seconds')
+            self.meta['updated_cursor'] = max((entry['updated'] or '' for entry in self.symbols.values()),
+                                              default='') or None
+        else:
+            self.meta['updated_cursor'] = merge_pages(
+                {'active': 'true', 'sort': 'last_updated_utc', 'order': 'desc'},
+                'last_updated_utc', self.meta.get('updated_cursor'))
+            before = sum(1 for entry in self.symbols.values() if not entry['active'])
+            self.meta['delisted_cursor'] = merge_pages(
+                {'active': 'false', 'sort': 'delisted_utc', 'order': 'desc'},
+                'delisted_utc', self.meta.get('delisted_cursor') or self.meta.get('full_refresh'))
+            stats['delisted'] = sum(1 for entry in self.symbols.values() if not entry['active']) - before
+        self.meta['refreshed'] = now.isoformat(timespec='seconds')
+        return stats
+
+def load_tradable(client, base_url, path=DEFAULT_PATH, types=RANKED_TYPES, full=None):
+    """Refresh the index at path and return its tradable symbols"""
+    universe = Universe.load(path)
+    try:
+        stats = universe.refresh(client, base_url, full)
+    except Exception as e:
+        if not universe.symbols:
+            raise
+        # A stale index beats no universe; the next run refreshes it
+        print(f"⚠️  Universe refresh failed ({e}) - using the index from {universe.meta.get('refreshed')}")
+        return universe.tradable(types)
+    universe.save()
+    symbols = universe.tradable(types)
+    print(f"Universe {'listed in full' if stats['full'] else 'refreshed'} in {stats['requests']} requests: "
+          f"{stats['added']} added, {stats['changed']} changed, {stats['delisted']} delisted; "
+          f"{len(symbols)} of {len(universe)} symbols are {'/'.join(types)}")
+    return symbols
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticker universe index")
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh = commands.add_parser('refresh', help="Update the index from the tickers API")
+    refresh.add_argument('--full', action='store_true', help="List every active ticker again")
+    refresh.add_argument('--types', default=','.join(RANKED_TYPES))
+    commands.add_parser('info', help="Counts by security type")
+    show = commands.add_parser('show', help="One symbol's entry")
+    show.add_argument('symbol')
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        from polygon_client import API_KEY, BASE_URL, PolygonClient
+        client = PolygonClient(API_KEY, BASE_URL)
+        try:
+            load_tradable(client, BASE_URL, args.path, parse_types(args.types), True if args.full else None)
+        finally:
+            client.close()
+        return
+
+    universe = Universe.load(args.path)
+    if args.command == 'info':
+        print(f"{len(universe)} symbols, refreshed {universe.meta.get('refreshed')}, "
+              f"last full listing {universe.meta.get('full_refresh')}")
+        counts = {}
+        for entry in universe.symbols.values():
+            key = entry['type'] or '?'
+            active, inactive = counts.get(key, (0, 0))
+            counts[key] = (active + 1, inactive) if entry['active'] else (active, inactive + 1)
+        for kind, (active, inactive) in sorted(counts.items(), key=lambda item: -sum(item[1])):
+            print(f"  {kind:8s} {active:6d} active {inactive:6d} inactive"
+                  f"{'  (ranked)' if kind in RANKED_TYPES else ''}")
+    else:
+        entry = universe.get(args.symbol.upper())
+        if entry is None:
+            raise SystemExit(f"❌ {args.symbol.upper()} is not in {args.path}")
+        print(json.dumps(dict(entry, symbol=args.symbol.upper()), indent=2))
+
+if __name__ == "__main__":
+    main()